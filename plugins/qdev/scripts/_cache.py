@@ -0,0 +1,25 @@
+"""Disposable cache location shared by the qdev research-KB scripts.
+
+Derived data (MinHash signatures, search indexes) lives in
+`<research-dir>/.cache/`, never beside the reports themselves. The directory
+carries its own `.gitignore` matching everything (the pytest-cache
+convention), so it is never committed alongside the reports in a consuming
+project, and deleting it only costs a rebuild on the next run.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+CACHE_DIR = ".cache"
+_GITIGNORE = "# Disposable qdev research-KB cache; safe to delete.\n*\n"
+
+
+def cache_file(research_dir: Path, name: str) -> Path:
+    """Path of `name` in the research dir's cache directory, creating the
+    directory (and its ignore-everything `.gitignore`) on first use."""
+    directory = Path(research_dir) / CACHE_DIR
+    directory.mkdir(exist_ok=True)
+    ignore = directory / ".gitignore"
+    if not ignore.exists():
+        ignore.write_text(_GITIGNORE, encoding="utf-8")
+    return directory / name
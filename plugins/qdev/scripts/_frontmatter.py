@@ -44,6 +44,13 @@ def extract_frontmatter(text: str) -> dict | None:
     return _coerce_dates(data) if isinstance(data, dict) else None
 
 
+def strip_frontmatter(text: str) -> str:
+    """The document body: `text` minus a leading frontmatter block (if any).
+    Never parses the YAML, so malformed frontmatter cannot hide the body."""
+    match = _FM_RE.match(text)
+    return text[match.end():] if match else text
+
+
 def read_frontmatter(path: Path) -> dict | None:
     """Read a file and return its frontmatter mapping (or None)."""
     return extract_frontmatter(Path(path).read_text(encoding="utf-8"))
@@ -12,10 +12,24 @@ never appends, so the index cannot drift from the reports.
 The index's own created/updated derive from report content (min/max), so
 re-running with unchanged reports yields an identical file (idempotent).
 
-Usage: uv run build_research_index.py <research-dir>      # e.g. docs/research
+Large KBs can opt into a sharded layout (`--shard-by year|tag`): index.md
+becomes a small table of per-shard counts linking to <research-dir>/index/
+<shard>.md pages, one per `created` year or per primary (first) tag. Every
+page keeps the same id-preservation and idempotency rules as the single
+index, and a page is only rewritten when its content changes - a new report
+touches its own shard and the root, not the other shards.
+
+The root records the layout (`project.shard_by`), so a plain regeneration
+keeps it; `--shard-by none` returns to a single index. Generated shard pages
+that are no longer produced are removed either way.
+
+Usage: uv run build_research_index.py <research-dir> [--shard-by year|tag|none]
+       # e.g. docs/research
 """
 from __future__ import annotations
 
+import argparse
+import hashlib
 import re
 import sys
 from pathlib import Path
@@ -25,6 +39,8 @@ import yaml
 from _frontmatter import read_frontmatter
 
 INDEX_NAME = "index.md"
+SHARD_DIR = "index"  # subdirectory, so the non-recursive report glob skips it
+SHARD_MODES = ("year", "tag")
 
 
 class _IndentedDumper(yaml.SafeDumper):
@@ -82,7 +98,13 @@ def _cell(value) -> str:
 _ID_RE = r"index-[0-9a-z]{6}-[a-z0-9][a-z0-9-]*"
 
 
-def render_index(rows: list[dict], existing: dict | None = None) -> str:
+def _render_page(rows: list[dict], existing: dict | None, *, title: str,
+                 default_id: str, default_description: str,
+                 table: list[str], shard_by: str | None = None) -> str:
+    """Frontmatter + heading + `table` lines for one generated index page.
+
+    `shard_by` is recorded in the page's `project` namespace (the root of a
+    sharded index); other keys a consumer keeps there are preserved."""
     created = min((str(r.get("created", "")) for r in rows), default="")
     updated = max((str(r.get("updated", "")) for r in rows), default="")
     existing = existing or {}
@@ -92,13 +114,12 @@ def render_index(rows: list[dict], existing: dict | None = None) -> str:
     # FRESH index (project-standards v3 validate-id format; a fixed token —
     # never random — so back-to-back regens stay idempotent).
     existing_id = str(existing.get("id") or "")
-    doc_id = existing_id if re.fullmatch(_ID_RE, existing_id) else "index-7x8u66-research-index"
-    description = str(existing.get("description") or "") \
-        or "Generated index of qdev research reports. Do not edit by hand."
+    doc_id = existing_id if re.fullmatch(_ID_RE, existing_id) else default_id
+    description = str(existing.get("description") or "") or default_description
     fm = {
         "schema_version": "1.0",
         "id": doc_id,
-        "title": "Research Index",
+        "title": title,
         "description": description,
         "doc_type": "index",
         "status": "active",
@@ -108,41 +129,189 @@ def render_index(rows: list[dict], existing: dict | None = None) -> str:
         "aliases": [],
         "related": [],
     }
+    project = existing.get("project")
+    project = dict(project) if isinstance(project, dict) else {}
+    project.pop("shard_by", None)
+    if shard_by:
+        project["shard_by"] = shard_by
+    if project:
+        fm["project"] = project
     header = ("---\n"
               + yaml.dump(fm, Dumper=_IndentedDumper, sort_keys=False).strip()
               + "\n---\n")
+    lines = ["", f"# {title}", "", *table]
+    return header + "\n".join(lines) + "\n"
+
+
+def _report_table(rows: list[dict]) -> list[str]:
     lines = [
-        "",
-        "# Research Index",
-        "",
         "| " + " | ".join(_COLUMNS) + " |",
         "| " + " | ".join("---" for _ in _COLUMNS) + " |",
     ]
     for r in rows:
         lines.append("| " + " | ".join(_cell(r.get(c)) for c in _COLUMNS) + " |")
-    return header + "\n".join(lines) + "\n"
+    return lines
+
+
+def render_index(rows: list[dict], existing: dict | None = None) -> str:
+    return _render_page(
+        rows, existing, title="Research Index",
+        default_id="index-7x8u66-research-index",
+        default_description="Generated index of qdev research reports. Do not edit by hand.",
+        table=_report_table(rows))
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def shard_key(row: dict, shard_by: str) -> str:
+    """File-safe shard name for a report: its `created` year, or its primary
+    (first) tag slugified. Reports without one land in a catch-all shard."""
+    if shard_by == "year":
+        year = str(row.get("created", ""))[:4]
+        return year if re.fullmatch(r"\d{4}", year) else "undated"
+    tags = row.get("tags")
+    primary = tags[0] if isinstance(tags, list) and tags else ""
+    return _slug(str(primary)) or "untagged"
+
+
+def _shard_default_id(key: str) -> str:
+    # A v3-compliant id whose token is derived from the shard name, so it is
+    # fixed per shard (idempotent) yet distinct across shards.
+    n = int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+    token = ""
+    for _ in range(6):
+        n, r = divmod(n, 36)
+        token += "0123456789abcdefghijklmnopqrstuvwxyz"[r]
+    return f"index-{token}-research-index-{key}"
+
+
+def group_shards(rows: list[dict], shard_by: str) -> dict[str, list[dict]]:
+    """shard name -> its rows (still created desc), shards sorted by name
+    (years newest first)."""
+    shards: dict[str, list[dict]] = {}
+    for r in rows:
+        shards.setdefault(shard_key(r, shard_by), []).append(r)
+    return dict(sorted(shards.items(), reverse=shard_by == "year"))
+
+
+def render_shard(key: str, rows: list[dict], existing: dict | None = None) -> str:
+    return _render_page(
+        rows, existing, title=f"Research Index: {key}",
+        default_id=_shard_default_id(key),
+        default_description=f"Generated shard '{key}' of the qdev research index. "
+                            "Do not edit by hand.",
+        table=_report_table(rows))
+
+
+def recorded_shard_mode(existing: dict | None) -> str | None:
+    """The layout an existing root index.md records (None: a single index)."""
+    project = (existing or {}).get("project")
+    mode = project.get("shard_by") if isinstance(project, dict) else None
+    return mode if mode in SHARD_MODES else None
+
+
+def render_root_index(shards: dict[str, list[dict]], existing: dict | None = None,
+                      shard_by: str | None = None) -> str:
+    """The small root page of a sharded index: one row per shard."""
+    rows = [r for shard_rows in shards.values() for r in shard_rows]
+    table = ["| shard | reports | updated |", "| --- | --- | --- |"]
+    for key, shard_rows in shards.items():
+        updated = max(str(r.get("updated", "")) for r in shard_rows)
+        table.append(f"| [{key}]({SHARD_DIR}/{key}.md) | {len(shard_rows)} | {_cell(updated)} |")
+    return _render_page(
+        rows, existing, title="Research Index",
+        default_id="index-7x8u66-research-index",
+        default_description="Generated index of qdev research reports. Do not edit by hand.",
+        table=table, shard_by=shard_by)
+
+
+def _read_existing(path: Path) -> dict | None:
+    """Existing page frontmatter for id/description preservation; a missing or
+    unparseable page simply seeds the defaults."""
+    if not path.exists():
+        return None
+    try:
+        return read_frontmatter(path)
+    except (yaml.YAMLError, OSError, UnicodeDecodeError):
+        return None
+
+
+def _write_if_changed(path: Path, text: str) -> bool:
+    """Write only when the content differs, so unchanged pages keep their
+    mtime and never show up in diffs or incremental lint runs."""
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    path.write_text(text, encoding="utf-8")
+    return True
+
+
+def remove_stale_shards(research_dir: Path, keep: set[str]) -> list[Path]:
+    """Remove generated shard pages (doc_type: index) not named in `keep` -
+    never a hand-written file - and the shard dir once it is empty."""
+    shard_dir = research_dir / SHARD_DIR
+    if not shard_dir.is_dir():
+        return []
+    removed: list[Path] = []
+    for stale in sorted(shard_dir.glob("*.md")):
+        if stale.stem not in keep and (_read_existing(stale) or {}).get("doc_type") == "index":
+            stale.unlink()
+            removed.append(stale)
+    if not any(shard_dir.iterdir()):
+        shard_dir.rmdir()
+    return removed
+
+
+def write_sharded_index(research_dir: Path, rows: list[dict], shard_by: str) -> list[Path]:
+    """Regenerate the root page and every shard page; return the pages written.
+
+    Shard pages whose shard no longer has reports (or that an earlier layout
+    produced) are removed."""
+    shard_dir = research_dir / SHARD_DIR
+    shard_dir.mkdir(exist_ok=True)
+    shards = group_shards(rows, shard_by)
+    written: list[Path] = []
+    for key, shard_rows in shards.items():
+        path = shard_dir / f"{key}.md"
+        if _write_if_changed(path, render_shard(key, shard_rows, _read_existing(path))):
+            written.append(path)
+    remove_stale_shards(research_dir, set(shards))
+    root = research_dir / INDEX_NAME
+    if _write_if_changed(root, render_root_index(shards, _read_existing(root), shard_by)):
+        written.append(root)
+    return written
 
 
 def main(argv: list[str]) -> int:
-    if len(argv) != 2:
-        print("usage: build_research_index.py <research-dir>", file=sys.stderr)
-        return 2
-    research_dir = Path(argv[1])
+    parser = argparse.ArgumentParser(prog="build_research_index.py")
+    parser.add_argument("research_dir", type=Path)
+    parser.add_argument("--shard-by", choices=(*SHARD_MODES, "none"), default=None,
+                        help="shard by created year or primary tag; 'none' writes a single "
+                             "index (default: the layout the existing index.md records)")
+    try:
+        a = parser.parse_args(argv[1:])
+    except SystemExit as exc:  # usage errors return 2, like the checks below
+        return int(exc.code or 0)
+    research_dir = a.research_dir
     if not research_dir.is_dir():
         print(f"not a directory: {research_dir}", file=sys.stderr)
         return 2
-    rows = collect_reports(research_dir)
-    # Existing-index frontmatter feeds id/description preservation; a missing
-    # or unparseable index simply seeds the defaults.
-    existing = None
     index_path = research_dir / INDEX_NAME
-    if index_path.exists():
-        try:
-            existing = read_frontmatter(index_path)
-        except (yaml.YAMLError, OSError, UnicodeDecodeError):
-            existing = None
-    (research_dir / INDEX_NAME).write_text(render_index(rows, existing), encoding="utf-8")
-    print(f"index: {len(rows)} report(s) -> {research_dir / INDEX_NAME}")
+    existing = _read_existing(index_path)
+    shard_by = a.shard_by or recorded_shard_mode(existing)
+    rows = collect_reports(research_dir)
+    if shard_by and shard_by != "none":
+        written = write_sharded_index(research_dir, rows, shard_by)
+        print(f"index: {len(rows)} report(s) sharded by {shard_by} -> "
+              f"{index_path} ({len(written)} page(s) rewritten)")
+        return 0
+    _write_if_changed(index_path, render_index(rows, existing))
+    remove_stale_shards(research_dir, set())
+    print(f"index: {len(rows)} report(s) -> {index_path}")
     return 0
 
 
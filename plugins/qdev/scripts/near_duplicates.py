@@ -0,0 +1,255 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["pyyaml>=6.0.2"]
+# ///
+"""Surface near-duplicate research reports by body content (MinHash + LSH).
+
+Tag overlap (the dedup preflight) misses reports that cover the same ground
+under different tags. This script shingles each report BODY (frontmatter
+stripped, so shared boilerplate fields never count as overlap), computes a
+MinHash signature per report, and buckets the signatures with LSH banding so
+only colliding pairs are compared - not all n^2 pairs.
+
+Signatures are cached by the SHA-256 of the report body, so adding one report
+costs one signature computation; unchanged reports are never re-shingled. The
+cache records the MinHash parameters and is discarded wholesale if they change.
+It lives in the research dir's git-ignored `.cache/` (see _cache.py).
+
+Output is JSON: `pairs` (newer/older id + estimated Jaccard, highest first)
+and `clusters` (connected components of those pairs). A pair maps directly
+onto the dedup decision's link fields: `related: [<older>]` on the newer
+report, or `supersedes: [<older>]` when dedup.py says supersede.
+
+`--draft FILE` (`-` for stdin) compares a report that is not written yet
+against every report in the KB instead; each pair's `newer` is the draft.
+This is the dedup preflight's body check: an `older` it returns is a match
+even when its tags differ.
+
+Usage: uv run near_duplicates.py <research-dir> [--threshold 0.5] [--cache PATH]
+                                 [--draft FILE|-]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+from pathlib import Path
+
+import yaml
+
+from _cache import cache_file
+from _frontmatter import extract_frontmatter, strip_frontmatter
+from build_research_index import INDEX_NAME
+
+CACHE_NAME = "near-duplicates.json"
+DRAFT_ID = "<draft>"  # `newer` of --draft pairs when the draft has no id yet
+SHINGLE_SIZE = 5  # words per shingle
+NUM_PERM = 128
+# 32 bands x 4 rows: pairs with Jaccard ~0.42+ collide in at least one band
+# with high probability, comfortably below the default reporting threshold.
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+DEFAULT_THRESHOLD = 0.5
+_SEED = 20260719  # fixed: signatures must be stable across runs for the cache
+_PRIME = (1 << 61) - 1
+_rng = random.Random(_SEED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(NUM_PERM)]
+_PARAMS = {"shingle_size": SHINGLE_SIZE, "num_perm": NUM_PERM, "seed": _SEED}
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(body: str, k: int = SHINGLE_SIZE) -> set[int]:
+    """64-bit hashes of the body's k-word shingles (case-folded). A body
+    shorter than k words yields one shingle; an empty body yields none."""
+    words = _WORD_RE.findall(body.lower())
+    if not words:
+        return set()
+    grams = (" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1)))
+    return {int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big")
+            for g in grams}
+
+
+def signature(hashes: set[int]) -> list[int]:
+    """MinHash signature: per permutation, the minimum permuted shingle hash."""
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimate_jaccard(sig_a: list[int], sig_b: list[int]) -> float:
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def lsh_candidates(signatures: dict[str, list[int]]) -> set[tuple[str, str]]:
+    """Pairs of ids whose signatures agree on every row of at least one band."""
+    candidates: set[tuple[str, str]] = set()
+    for band in range(BANDS):
+        buckets: dict[tuple[int, ...], list[str]] = {}
+        lo = band * ROWS
+        for doc_id, sig in signatures.items():
+            buckets.setdefault(tuple(sig[lo:lo + ROWS]), []).append(doc_id)
+        for members in buckets.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    candidates.add((a, b) if a < b else (b, a))
+    return candidates
+
+
+def collect_bodies(research_dir: Path) -> list[dict]:
+    """id, created and body of every top-level research report. Unreadable or
+    unparseable reports are skipped with a warning (same per-file resilience
+    as build_research_index)."""
+    reports: list[dict] = []
+    for md in sorted(Path(research_dir).glob("*.md")):
+        if md.name == INDEX_NAME:
+            continue
+        try:
+            text = md.read_text(encoding="utf-8")
+            fm = extract_frontmatter(text)
+        except (yaml.YAMLError, OSError, UnicodeDecodeError) as exc:
+            print(f"warning: skipping {md.name}: {exc}", file=sys.stderr)
+            continue
+        if fm is None or fm.get("doc_type") != "research":
+            continue
+        reports.append({
+            "id": str(fm.get("id") or md.stem),
+            "created": str(fm.get("created", "")),
+            "body": strip_frontmatter(text),
+        })
+    return reports
+
+
+def load_cache(path: Path) -> dict[str, list[int]]:
+    """body-sha256 -> signature; empty when absent, unreadable, or built with
+    different MinHash parameters (stale signatures would be silently wrong)."""
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("params") != _PARAMS:
+        return {}
+    sigs = data.get("signatures")
+    return sigs if isinstance(sigs, dict) else {}
+
+
+def save_cache(path: Path, signatures: dict[str, list[int]]) -> None:
+    Path(path).write_text(
+        json.dumps({"params": _PARAMS, "signatures": signatures}, sort_keys=True),
+        encoding="utf-8")
+
+
+def report_signatures(reports: list[dict], cache: dict[str, list[int]]
+                      ) -> tuple[dict[str, list[int]], dict[str, list[int]]]:
+    """(id -> signature, the cache entries used this run).
+
+    The returned cache holds only live reports' signatures, so deleted or
+    edited reports do not accumulate in the cache file."""
+    signatures: dict[str, list[int]] = {}
+    used: dict[str, list[int]] = {}
+    for report in reports:
+        digest = hashlib.sha256(report["body"].encode("utf-8")).hexdigest()
+        sig = cache.get(digest)
+        if sig is None:
+            hashes = shingles(report["body"])
+            if not hashes:
+                continue  # an empty body has no content to compare
+            sig = signature(hashes)
+        used[digest] = sig
+        signatures[report["id"]] = sig
+    return signatures, used
+
+
+def find_near_duplicates(reports: list[dict], threshold: float,
+                         cache: dict[str, list[int]]) -> tuple[list[dict], dict[str, list[int]]]:
+    """(pairs at or above `threshold`, the cache entries used this run)."""
+    by_id = {report["id"]: report for report in reports}
+    signatures, used = report_signatures(reports, cache)
+    pairs: list[dict] = []
+    for a, b in lsh_candidates(signatures):
+        score = estimate_jaccard(signatures[a], signatures[b])
+        if score < threshold:
+            continue
+        # created desc, id as tie-break: "newer" is the report that would
+        # carry the related/supersedes link to "older".
+        newer, older = sorted((a, b), key=lambda i: (by_id[i]["created"], i), reverse=True)
+        pairs.append({"newer": newer, "older": older, "jaccard": round(score, 3)})
+    pairs.sort(key=lambda p: (-p["jaccard"], p["newer"], p["older"]))
+    return pairs, used
+
+
+def match_draft(draft: str, reports: list[dict], threshold: float,
+                cache: dict[str, list[int]]) -> tuple[list[dict], dict[str, list[int]]]:
+    """(pairs of the draft with each report at or above `threshold`, the cache
+    entries used this run). One draft against n reports is n signature
+    comparisons, so every report is compared - no LSH banding, no misses."""
+    fm = None
+    try:
+        fm = extract_frontmatter(draft)
+    except yaml.YAMLError:
+        pass  # a half-written block: the body is still comparable
+    draft_id = str((fm or {}).get("id") or DRAFT_ID)
+    signatures, used = report_signatures(reports, cache)
+    hashes = shingles(strip_frontmatter(draft))
+    if not hashes:
+        return [], used
+    sig = signature(hashes)
+    pairs: list[dict] = []
+    for doc_id, other in signatures.items():
+        score = estimate_jaccard(sig, other)
+        if doc_id != draft_id and score >= threshold:
+            pairs.append({"newer": draft_id, "older": doc_id, "jaccard": round(score, 3)})
+    pairs.sort(key=lambda p: (-p["jaccard"], p["older"]))
+    return pairs, used
+
+
+def clusters(pairs: list[dict]) -> list[list[str]]:
+    """Connected components of the near-duplicate graph (union-find)."""
+    parent: dict[str, str] = {}
+
+    def find(x: str) -> str:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for p in pairs:
+        parent[find(p["newer"])] = find(p["older"])
+    groups: dict[str, list[str]] = {}
+    for node in parent:
+        groups.setdefault(find(node), []).append(node)
+    return sorted(sorted(g) for g in groups.values())
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="near_duplicates.py")
+    parser.add_argument("research_dir", type=Path)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="minimum estimated Jaccard similarity to report")
+    parser.add_argument("--cache", type=Path, default=None,
+                        help=f"signature cache file (default: <research-dir>/.cache/{CACHE_NAME})")
+    parser.add_argument("--draft", default=None,
+                        help="compare this unwritten report (- for stdin) against the KB")
+    a = parser.parse_args(argv[1:])
+    if not a.research_dir.is_dir():
+        print(f"not a directory: {a.research_dir}", file=sys.stderr)
+        return 2
+    cache_path = a.cache or cache_file(a.research_dir, CACHE_NAME)
+    cache = load_cache(cache_path)
+    reports = collect_bodies(a.research_dir)
+    if a.draft is None:
+        pairs, used = find_near_duplicates(reports, a.threshold, cache)
+    else:
+        draft = (sys.stdin.read() if a.draft == "-"
+                 else Path(a.draft).read_text(encoding="utf-8"))
+        pairs, used = match_draft(draft, reports, a.threshold, cache)
+    if used != cache:
+        save_cache(cache_path, used)
+    print(json.dumps({"pairs": pairs, "clusters": clusters(pairs)}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,203 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = ["pyyaml>=6.0.2"]
+# ///
+"""Ranked full-text search over the qdev research KB (SQLite FTS5 + BM25).
+
+Keeps an on-disk FTS5 index (stdlib sqlite3, no server) of every top-level
+research report's title, tags and body, so finding prior research is a ranked
+lookup instead of an unranked grep over docs/research/*.md.
+
+The index is incremental: each file's (mtime, size) is checked first and only
+a changed stat triggers a read; only a changed SHA-256 triggers re-parsing and
+re-indexing. Deleted reports are dropped. `query` refreshes before searching
+(pass --no-refresh to skip even the stat pass), then returns report ids ranked
+by BM25 (title and tag hits weigh more than body hits) with a body snippet.
+
+Query terms are plain words, OR-ed together and ranked - FTS5 operators are
+not interpreted, so arbitrary agent input can never be a syntax error.
+
+Usage: uv run search_research.py <research-dir> index
+       uv run search_research.py <research-dir> query "<terms>" [--limit N] [--no-refresh]
+       (both accept --db PATH; default <research-dir>/.cache/search-index.sqlite,
+       the git-ignored cache dir of _cache.py - safe to delete, rebuilt on demand)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+from _cache import cache_file
+from _frontmatter import extract_frontmatter, strip_frontmatter
+from build_research_index import INDEX_NAME
+
+DB_NAME = "search-index.sqlite"
+SCHEMA_VERSION = "1"
+DEFAULT_LIMIT = 10
+# bm25() column weights, in `reports` column order: id (unindexed), title, tags, body.
+_WEIGHTS = (0.0, 10.0, 5.0, 1.0)
+_TERM_RE = re.compile(r"\w+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    indexed INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS reports USING fts5(
+    id UNINDEXED, title, tags, body, tokenize = 'porter unicode61'
+);
+"""
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Open (creating if needed) the index; a schema-version mismatch rebuilds
+    it from scratch rather than migrating - the index is a pure cache."""
+    conn = sqlite3.connect(db_path)
+    row = None
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+    except sqlite3.OperationalError:
+        pass
+    if row and row[0] != SCHEMA_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS reports;"
+                           "DROP TABLE IF EXISTS meta;")
+    conn.executescript(_SCHEMA)
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema', ?)", (SCHEMA_VERSION,))
+    conn.commit()
+    return conn
+
+
+def _parse(text: str, stem: str) -> tuple[str, str, str, str] | None:
+    """(id, title, tags, body) of a research report, or None if not one."""
+    fm = extract_frontmatter(text)
+    if fm is None or fm.get("doc_type") != "research":
+        return None
+    tags = fm.get("tags")
+    tags = " ".join(str(t) for t in tags) if isinstance(tags, list) else str(tags or "")
+    return (str(fm.get("id") or stem), str(fm.get("title") or ""), tags,
+            strip_frontmatter(text))
+
+
+def refresh(conn: sqlite3.Connection, research_dir: Path) -> dict[str, int]:
+    """Bring the index in line with <research-dir>; return per-outcome counts."""
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    known = {name: (mtime, size, sha) for name, mtime, size, sha
+             in conn.execute("SELECT name, mtime_ns, size, sha256 FROM files")}
+    seen: set[str] = set()
+    with conn:
+        for md in sorted(Path(research_dir).glob("*.md")):
+            if md.name == INDEX_NAME:
+                continue
+            seen.add(md.name)
+            try:
+                st = md.stat()
+                prev = known.get(md.name)
+                if prev and prev[:2] == (st.st_mtime_ns, st.st_size):
+                    counts["unchanged"] += 1
+                    continue
+                raw = md.read_bytes()
+                digest = hashlib.sha256(raw).hexdigest()
+                if prev and prev[2] == digest:
+                    conn.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE name = ?",
+                                 (st.st_mtime_ns, st.st_size, md.name))
+                    counts["unchanged"] += 1
+                    continue
+                doc = _parse(raw.decode("utf-8"), md.stem)
+            except (yaml.YAMLError, OSError, UnicodeDecodeError) as exc:
+                # Same per-file resilience as build_research_index: warn, and
+                # drop any stale entry so the index never serves old content.
+                print(f"warning: skipping {md.name}: {exc}", file=sys.stderr)
+                _remove(conn, md.name)
+                continue
+            _remove(conn, md.name)
+            cur = conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                               (md.name, st.st_mtime_ns, st.st_size, digest, doc is not None))
+            if doc is not None:
+                conn.execute("INSERT INTO reports (rowid, id, title, tags, body) "
+                             "VALUES (?, ?, ?, ?, ?)", (cur.lastrowid, *doc))
+            counts["updated" if prev else "added"] += 1
+        for name in known.keys() - seen:
+            _remove(conn, name)
+            counts["removed"] += 1
+    return counts
+
+
+def _remove(conn: sqlite3.Connection, name: str) -> None:
+    row = conn.execute("SELECT rowid FROM files WHERE name = ?", (name,)).fetchone()
+    if row:
+        conn.execute("DELETE FROM reports WHERE rowid = ?", row)
+        conn.execute("DELETE FROM files WHERE rowid = ?", row)
+
+
+def match_expression(terms: str) -> str:
+    """FTS5 MATCH string: each word quoted (operators become literals), OR-ed."""
+    return " OR ".join(f'"{w}"' for w in _TERM_RE.findall(terms))
+
+
+def search(conn: sqlite3.Connection, terms: str, limit: int = DEFAULT_LIMIT) -> list[dict]:
+    """Best-first results: id, title, BM25 score (lower is better) and snippet."""
+    expr = match_expression(terms)
+    if not expr:
+        return []
+    weights = ", ".join(str(w) for w in _WEIGHTS)
+    rows = conn.execute(
+        f"SELECT id, title, bm25(reports, {weights}) AS score, "
+        "snippet(reports, 3, '[', ']', '…', 12) "
+        "FROM reports WHERE reports MATCH ? ORDER BY score LIMIT ?",
+        (expr, limit))
+    return [{"id": i, "title": t, "score": round(s, 4), "snippet": sn}
+            for i, t, s, sn in rows]
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="search_research.py")
+    parser.add_argument("research_dir", type=Path)
+    parser.add_argument("--db", type=Path, default=None,
+                        help=f"index file (default: <research-dir>/.cache/{DB_NAME})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("index", help="refresh the index and report what changed")
+    q = sub.add_parser("query", help="ranked search for report ids")
+    q.add_argument("terms")
+    q.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    q.add_argument("--no-refresh", action="store_true",
+                   help="search the index as-is, without checking for changed reports")
+    a = parser.parse_args(argv[1:])
+    if not a.research_dir.is_dir():
+        print(f"not a directory: {a.research_dir}", file=sys.stderr)
+        return 2
+    try:
+        conn = connect(a.db or cache_file(a.research_dir, DB_NAME))
+    except sqlite3.OperationalError as exc:
+        # e.g. a Python whose bundled SQLite was built without FTS5
+        print(f"cannot open search index: {exc}", file=sys.stderr)
+        return 2
+    try:
+        if a.command == "index":
+            print(json.dumps(refresh(conn, a.research_dir)))
+            return 0
+        start = time.perf_counter()
+        if not a.no_refresh:
+            refresh(conn, a.research_dir)
+        results = search(conn, a.terms, a.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    finally:
+        conn.close()
+    print(json.dumps({"results": results, "elapsed_ms": round(elapsed_ms, 2)}, indent=2,
+                     ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -213,3 +213,85 @@ def test_invalid_existing_id_is_replaced_with_default(tmp_path):
     index = (tmp_path / "index.md").read_text(encoding="utf-8")
     assert "id: index-7x8u66-research-index" in index
     assert "keep me" in index
+
+
+def test_shard_by_year_writes_root_counts_and_year_pages(tmp_path):
+    _report(tmp_path, "2025-06-01-old", "2025-06-01")
+    _report(tmp_path, "2026-01-01-alpha", "2026-01-01")
+    _report(tmp_path, "2026-02-01-beta", "2026-02-01")
+    assert gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "year"]) == 0
+    root = (tmp_path / "index.md").read_text(encoding="utf-8")
+    assert "| [2026](index/2026.md) | 2 |" in root
+    assert "| [2025](index/2025.md) | 1 |" in root
+    assert "2026-01-01-alpha" not in root  # rows live in the shards only
+    shard = (tmp_path / "index" / "2026.md").read_text(encoding="utf-8")
+    assert "2026-02-01-beta" in shard and "2025-06-01-old" not in shard
+    m = re.search(r"^id: (\S+)$", shard, re.M)
+    assert re.fullmatch(gen._ID_RE, m.group(1)), m.group(1)
+    # shard pages are not mistaken for reports on the next run
+    assert len(gen.collect_reports(tmp_path)) == 3
+
+
+def test_shard_by_tag_uses_primary_tag(tmp_path):
+    _report(tmp_path, "2026-01-01-alpha", "2026-01-01", tags=("Qt Pilot", "perf"))
+    _report(tmp_path, "2026-02-01-beta", "2026-02-01", tags=())
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by=tag"])
+    assert "2026-01-01-alpha" in (tmp_path / "index" / "qt-pilot.md").read_text(encoding="utf-8")
+    assert "2026-02-01-beta" in (tmp_path / "index" / "untagged.md").read_text(encoding="utf-8")
+
+
+def test_sharded_regeneration_is_idempotent_and_untouched_shards_not_rewritten(tmp_path):
+    _report(tmp_path, "2025-06-01-old", "2025-06-01")
+    _report(tmp_path, "2026-01-01-alpha", "2026-01-01")
+    gen.write_sharded_index(tmp_path, gen.collect_reports(tmp_path), "year")
+    before = {p.name: p.read_text(encoding="utf-8") for p in (tmp_path / "index").glob("*.md")}
+    assert gen.write_sharded_index(tmp_path, gen.collect_reports(tmp_path), "year") == []
+    _report(tmp_path, "2026-03-01-gamma", "2026-03-01")
+    written = gen.write_sharded_index(tmp_path, gen.collect_reports(tmp_path), "year")
+    assert sorted(p.name for p in written) == ["2026.md", "index.md"]
+    assert (tmp_path / "index" / "2025.md").read_text(encoding="utf-8") == before["2025.md"]
+
+
+def test_shard_ids_preserved_and_stale_shards_removed(tmp_path):
+    _report(tmp_path, "2025-06-01-old", "2025-06-01")
+    _report(tmp_path, "2026-01-01-alpha", "2026-01-01")
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "year"])
+    shard = tmp_path / "index" / "2026.md"
+    shard.write_text(re.sub(r"^id: \S+$", "id: index-abc123-my-shard", shard.read_text(
+        encoding="utf-8"), flags=re.M), encoding="utf-8")
+    (tmp_path / "index" / "notes.md").write_text("# hand-written\n", encoding="utf-8")
+    (tmp_path / "2025-06-01-old.md").unlink()
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "year"])
+    assert "id: index-abc123-my-shard" in shard.read_text(encoding="utf-8")
+    assert not (tmp_path / "index" / "2025.md").exists()
+    assert (tmp_path / "index" / "notes.md").exists()  # never delete non-generated files
+
+
+def test_main_rejects_unknown_shard_mode(tmp_path):
+    assert gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "month"]) == 2
+
+
+def test_sharded_layout_persists_across_plain_regeneration(tmp_path):
+    _report(tmp_path, "2025-06-01-old", "2025-06-01")
+    _report(tmp_path, "2026-01-01-alpha", "2026-01-01")
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "year"])
+    root = (tmp_path / "index.md").read_text(encoding="utf-8")
+    assert "shard_by: year" in root
+    # The agent regenerates without --shard-by: the recorded layout is kept.
+    _report(tmp_path, "2026-02-01-beta", "2026-02-01")
+    assert gen.main(["build_research_index.py", str(tmp_path)]) == 0
+    assert "| [2026](index/2026.md) | 2 |" in (tmp_path / "index.md").read_text(encoding="utf-8")
+    assert "2026-02-01-beta" in (tmp_path / "index" / "2026.md").read_text(encoding="utf-8")
+
+
+def test_changing_layout_removes_shards_it_no_longer_produces(tmp_path):
+    _report(tmp_path, "2026-01-01-alpha", "2026-01-01", tags=("perf",))
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "year"])
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "tag"])
+    assert sorted(p.name for p in (tmp_path / "index").glob("*.md")) == ["perf.md"]
+    gen.main(["build_research_index.py", str(tmp_path), "--shard-by", "none"])
+    root = (tmp_path / "index.md").read_text(encoding="utf-8")
+    assert "2026-01-01-alpha" in root and "shard_by" not in root
+    assert not (tmp_path / "index").exists()
+    assert gen.main(["build_research_index.py", str(tmp_path)]) == 0  # stays flat
+    assert not (tmp_path / "index").exists()
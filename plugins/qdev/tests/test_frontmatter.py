@@ -1,7 +1,7 @@
 import pytest
 import yaml
 
-from _frontmatter import extract_frontmatter
+from _frontmatter import extract_frontmatter, strip_frontmatter
 
 
 def test_crlf_line_endings_are_handled():
@@ -58,3 +58,12 @@ def test_unquoted_dates_coerced_to_iso_strings():
     fm = extract_frontmatter("---\ncreated: 2026-06-03\nupdated: 2026-06-03\n---\n")
     assert fm == {"created": "2026-06-03", "updated": "2026-06-03"}
     assert isinstance(fm["created"], str)
+
+
+def test_strip_frontmatter_returns_body_only():
+    assert strip_frontmatter("---\nid: x\n---\n\n# Body\n") == "\n# Body\n"
+    assert strip_frontmatter("# No frontmatter\n") == "# No frontmatter\n"
+
+
+def test_strip_frontmatter_does_not_parse_malformed_yaml():
+    assert strip_frontmatter("---\nid: [unbalanced\n---\nbody\n") == "body\n"
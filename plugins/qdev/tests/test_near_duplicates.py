@@ -0,0 +1,151 @@
+import io
+import json
+import textwrap
+from pathlib import Path
+
+import near_duplicates as nd
+
+_LOREM = (
+    "the harness drains both pipes into bounded ring buffers so a chatty "
+    "application never blocks inside print while the gui is under test and "
+    "the agent can page through output incrementally by byte offset without "
+    "rereading everything it has already seen in earlier calls"
+)
+_OTHER = (
+    "sqlite full text search ranks documents with bm25 over an inverted index "
+    "that is refreshed by content hash whenever a report changes on disk so "
+    "queries return ranked identifiers with snippets in a few milliseconds"
+)
+
+
+def _report(d: Path, slug: str, created: str, body: str, *, tags=("a",), doc_type="research"):
+    fm = textwrap.dedent(f"""\
+        ---
+        id: "{slug}"
+        title: "T"
+        doc_type: "{doc_type}"
+        created: "{created}"
+        updated: "{created}"
+        tags: [{", ".join(tags)}]
+        ---
+
+        """)
+    (d / f"{slug}.md").write_text(fm + body + "\n", encoding="utf-8")
+
+
+def _run(tmp_path, capsys, *extra):
+    assert nd.main(["near_duplicates.py", str(tmp_path), *extra]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_near_duplicate_bodies_pair_newer_to_older(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-old", "2026-01-01", _LOREM, tags=("logs",))
+    # Different tags, same ground: exactly the case tag overlap misses.
+    _report(tmp_path, "2026-03-01-new", "2026-03-01", _LOREM + " today", tags=("pipes",))
+    out = _run(tmp_path, capsys)
+    assert len(out["pairs"]) == 1
+    pair = out["pairs"][0]
+    assert (pair["newer"], pair["older"]) == ("2026-03-01-new", "2026-01-01-old")
+    assert pair["jaccard"] >= 0.8
+    assert out["clusters"] == [["2026-01-01-old", "2026-03-01-new"]]
+
+
+def test_unrelated_bodies_are_not_paired(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-a", "2026-01-01", _LOREM)
+    _report(tmp_path, "2026-02-01-b", "2026-02-01", _OTHER)
+    assert _run(tmp_path, capsys) == {"pairs": [], "clusters": []}
+
+
+def test_frontmatter_is_excluded_from_shingles(tmp_path):
+    # Identical frontmatter boilerplate must not make different bodies similar.
+    _report(tmp_path, "2026-01-01-a", "2026-01-01", _LOREM)
+    _report(tmp_path, "2026-01-01-b", "2026-01-01", _OTHER)
+    bodies = {r["id"]: r["body"] for r in nd.collect_bodies(tmp_path)}
+    assert "doc_type" not in bodies["2026-01-01-a"]
+    assert bodies["2026-01-01-a"].strip() == _LOREM
+
+
+def test_collect_skips_index_non_research_and_malformed(tmp_path):
+    _report(tmp_path, "2026-01-01-a", "2026-01-01", _LOREM)
+    _report(tmp_path, "2026-01-02-note", "2026-01-02", _LOREM, doc_type="note")
+    (tmp_path / "index.md").write_text("---\ndoc_type: index\n---\n", encoding="utf-8")
+    (tmp_path / "2026-01-03-bad.md").write_text("---\nid: [unbalanced\n---\n", encoding="utf-8")
+    assert [r["id"] for r in nd.collect_bodies(tmp_path)] == ["2026-01-01-a"]
+
+
+def test_cache_means_one_new_report_costs_one_signature(tmp_path, capsys, monkeypatch):
+    _report(tmp_path, "2026-01-01-a", "2026-01-01", _LOREM)
+    _report(tmp_path, "2026-02-01-b", "2026-02-01", _OTHER)
+    _run(tmp_path, capsys)
+    assert (tmp_path / ".cache" / nd.CACHE_NAME).exists()
+
+    calls = []
+    real = nd.signature
+    monkeypatch.setattr(nd, "signature", lambda h: calls.append(h) or real(h))
+    _report(tmp_path, "2026-03-01-c", "2026-03-01", _LOREM + " again")
+    out = _run(tmp_path, capsys)
+    assert len(calls) == 1
+    assert [p["newer"] for p in out["pairs"]] == ["2026-03-01-c"]
+
+
+def test_cache_with_different_params_is_discarded(tmp_path):
+    cache = tmp_path / "c.json"
+    cache.write_text(json.dumps({"params": {"num_perm": 1}, "signatures": {"x": [1]}}),
+                     encoding="utf-8")
+    assert nd.load_cache(cache) == {}
+    assert nd.load_cache(tmp_path / "missing.json") == {}
+
+
+def test_cache_drops_signatures_of_removed_reports(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-a", "2026-01-01", _LOREM)
+    _report(tmp_path, "2026-02-01-b", "2026-02-01", _OTHER)
+    _run(tmp_path, capsys)
+    (tmp_path / "2026-02-01-b.md").unlink()
+    _run(tmp_path, capsys)
+    assert len(nd.load_cache(tmp_path / ".cache" / nd.CACHE_NAME)) == 1
+
+
+def test_cache_dir_ignores_itself(tmp_path, capsys):
+    # The cache must never be committed next to the reports.
+    _report(tmp_path, "2026-01-01-a", "2026-01-01", _LOREM)
+    _run(tmp_path, capsys)
+    assert not list(tmp_path.glob(".*.json"))
+    assert (tmp_path / ".cache" / ".gitignore").read_text(encoding="utf-8").endswith("*\n")
+
+
+def test_draft_is_compared_against_every_report(tmp_path, capsys, monkeypatch):
+    _report(tmp_path, "2026-01-01-old", "2026-01-01", _LOREM, tags=("logs",))
+    _report(tmp_path, "2026-02-01-other", "2026-02-01", _OTHER)
+    draft = tmp_path.parent / "draft.md"
+    draft.write_text('---\nid: "2026-03-01-new"\n---\n' + _LOREM + " today\n",
+                     encoding="utf-8")
+    out = _run(tmp_path, capsys, "--draft", str(draft))
+    assert [(p["newer"], p["older"]) for p in out["pairs"]] == [
+        ("2026-03-01-new", "2026-01-01-old")]
+
+    monkeypatch.setattr("sys.stdin", io.StringIO(_OTHER))
+    out = _run(tmp_path, capsys, "--draft", "-")
+    assert [(p["newer"], p["older"]) for p in out["pairs"]] == [
+        (nd.DRAFT_ID, "2026-02-01-other")]
+
+
+def test_estimate_tracks_true_jaccard():
+    a, b = nd.shingles(_LOREM), nd.shingles(_LOREM + " " + _OTHER)
+    true = len(a & b) / len(a | b)
+    est = nd.estimate_jaccard(nd.signature(a), nd.signature(b))
+    assert abs(est - true) < 0.15
+
+
+def test_short_and_empty_bodies():
+    assert len(nd.shingles("two words")) == 1
+    assert nd.shingles("  \n") == set()
+
+
+def test_clusters_join_transitive_pairs():
+    pairs = [{"newer": "b", "older": "a"}, {"newer": "c", "older": "b"},
+             {"newer": "e", "older": "d"}]
+    assert nd.clusters(pairs) == [["a", "b", "c"], ["d", "e"]]
+
+
+def test_main_non_directory_returns_2(tmp_path):
+    assert nd.main(["near_duplicates.py", str(tmp_path / "nope")]) == 2
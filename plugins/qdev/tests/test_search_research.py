@@ -0,0 +1,102 @@
+import json
+import os
+import textwrap
+from pathlib import Path
+
+import search_research as sr
+
+
+def _report(d: Path, slug: str, *, title="T", tags=("a",), body="", doc_type="research"):
+    fm = textwrap.dedent(f"""\
+        ---
+        id: "{slug}"
+        title: "{title}"
+        doc_type: "{doc_type}"
+        created: "2026-01-01"
+        tags: [{", ".join(tags)}]
+        ---
+
+        """)
+    path = d / f"{slug}.md"
+    path.write_text(fm + body + "\n", encoding="utf-8")
+    return path
+
+
+def _query(tmp_path, capsys, *args):
+    assert sr.main(["search_research.py", str(tmp_path), "query", *args]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_query_ranks_title_hits_above_body_hits(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-body", title="Logging", body="mentions sqlite once")
+    _report(tmp_path, "2026-01-02-title", title="SQLite FTS5 ranking", body="search engines")
+    _report(tmp_path, "2026-01-03-none", title="Qt", body="widgets")
+    out = _query(tmp_path, capsys, "sqlite")
+    assert [r["id"] for r in out["results"]] == ["2026-01-02-title", "2026-01-01-body"]
+    assert "elapsed_ms" in out
+
+
+def test_snippet_highlights_body_match(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-a", body="the harness drains pipes into a ring buffer")
+    res = _query(tmp_path, capsys, "ring")["results"][0]
+    assert "[ring]" in res["snippet"]
+
+
+def test_tags_are_searchable(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-a", tags=("minhash", "dedup"), body="x")
+    assert [r["id"] for r in _query(tmp_path, capsys, "minhash")["results"]] == ["2026-01-01-a"]
+
+
+def test_operator_characters_are_not_fts_syntax(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-a", body="near duplicate detection")
+    out = _query(tmp_path, capsys, 'near* AND "duplicate" OR (NOT')
+    assert [r["id"] for r in out["results"]] == ["2026-01-01-a"]
+    assert sr.match_expression("  ") == ""
+
+
+def test_refresh_is_incremental_by_stat_and_hash(tmp_path):
+    a = _report(tmp_path, "2026-01-01-a", body="alpha")
+    _report(tmp_path, "2026-01-02-b", body="beta")
+    (tmp_path / "index.md").write_text("---\ndoc_type: index\n---\n", encoding="utf-8")
+    conn = sr.connect(tmp_path / "db.sqlite")
+    assert sr.refresh(conn, tmp_path) == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    assert sr.refresh(conn, tmp_path)["unchanged"] == 2
+
+    # Same bytes, new mtime: hash matches, nothing is re-indexed.
+    os.utime(a, ns=(1, 1))
+    assert sr.refresh(conn, tmp_path) == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2}
+
+    _report(tmp_path, "2026-01-01-a", body="gamma")
+    (tmp_path / "2026-01-02-b.md").unlink()
+    assert sr.refresh(conn, tmp_path) == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0}
+    assert [r["id"] for r in sr.search(conn, "gamma")] == ["2026-01-01-a"]
+    assert sr.search(conn, "alpha beta") == []
+
+
+def test_non_research_and_malformed_reports_are_not_indexed(tmp_path):
+    _report(tmp_path, "2026-01-01-note", body="alpha", doc_type="note")
+    (tmp_path / "2026-01-02-bad.md").write_text("---\nid: [unbalanced\n---\nalpha\n",
+                                                encoding="utf-8")
+    conn = sr.connect(tmp_path / "db.sqlite")
+    sr.refresh(conn, tmp_path)
+    assert sr.search(conn, "alpha") == []
+
+
+def test_no_refresh_searches_index_as_is(tmp_path, capsys):
+    assert sr.main(["search_research.py", str(tmp_path), "index"]) == 0
+    capsys.readouterr()
+    _report(tmp_path, "2026-01-01-a", body="alpha")
+    assert _query(tmp_path, capsys, "alpha", "--no-refresh")["results"] == []
+    assert len(_query(tmp_path, capsys, "alpha")["results"]) == 1
+
+
+def test_default_index_lives_in_ignored_cache_dir(tmp_path, capsys):
+    _report(tmp_path, "2026-01-01-a", body="alpha")
+    assert len(_query(tmp_path, capsys, "alpha")["results"]) == 1
+    assert (tmp_path / ".cache" / sr.DB_NAME).exists()
+    assert (tmp_path / ".cache" / ".gitignore").exists()
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ["2026-01-01-a.md"]
+
+
+def test_main_non_directory_returns_2(tmp_path):
+    assert sr.main(["search_research.py", str(tmp_path / "nope"), "index"]) == 2
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Backend benchmark: launch latency, memory and screenshot cost per backend.
+
+Launches a small widget app through main.launch_app() with each backend
+(`xvfb` only when the Xvfb binary is on PATH) and measures:
+
+- launch latency (launch_app's own launch_ms, median of --runs),
+- resident memory of the app process and, for xvfb, of the X server,
+- capture_screenshot latency and which capture method was used.
+
+Harnesses are cold-spawned (no zygote, no Xvfb pool) so the numbers show
+the backend itself.
+
+Usage: python benchmarks/bench_backends.py [--runs 5]
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main as qt_main  # noqa: E402
+
+APP = """\
+import sys
+from PySide6.QtWidgets import (QApplication, QComboBox, QLabel, QLineEdit,
+                               QPushButton, QTableWidget, QVBoxLayout, QWidget)
+app = QApplication(sys.argv)
+window = QWidget()
+window.setObjectName("main")
+layout = QVBoxLayout(window)
+for i in range(10):
+    button = QPushButton(f"Button {i}")
+    button.setObjectName(f"button_{i}")
+    layout.addWidget(button)
+layout.addWidget(QLabel("Status"))
+layout.addWidget(QLineEdit())
+combo = QComboBox()
+combo.addItems([f"Item {i}" for i in range(50)])
+layout.addWidget(combo)
+layout.addWidget(QTableWidget(50, 5))
+window.resize(640, 800)
+window.show()
+sys.exit(app.exec())
+"""
+
+
+def _rss_mb(pid: int) -> float:
+    """Resident set size of a process in MiB, from /proc."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def _measure(backend: str, script: str, runs: int) -> dict:
+    launches, app_rss, xvfb_rss, shots = [], [], [], []
+    method = None
+    for _ in range(runs):
+        result = qt_main.launch_app(script_path=script, timeout=30, backend=backend)
+        if not result.get("success"):
+            return {"error": result.get("message")}
+        state = qt_main._app_state
+        try:
+            launches.append(result["launch_ms"])
+            qt_main.wait_for_idle(timeout=5.0)
+            app_rss.append(_rss_mb(state.process.pid))
+            if state.xvfb_process:
+                xvfb_rss.append(_rss_mb(state.xvfb_process.pid))
+            with tempfile.NamedTemporaryFile(suffix=".png") as png:
+                start = time.perf_counter()
+                shot = qt_main.capture_screenshot(output_path=png.name)
+                shots.append((time.perf_counter() - start) * 1000)
+            method = shot.get("method")
+        finally:
+            qt_main.close_app()
+    return {
+        "launch_ms_median": round(statistics.median(launches), 1),
+        "launch_ms_min": round(min(launches), 1),
+        "app_rss_mb": round(statistics.median(app_rss), 1),
+        "xvfb_rss_mb": round(statistics.median(xvfb_rss), 1) if xvfb_rss else 0.0,
+        "screenshot_ms_median": round(statistics.median(shots), 1),
+        "screenshot_method": method,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    qt_main.logger.setLevel("WARNING")
+    backends = [b for b in qt_main._BACKENDS if b != "xvfb" or shutil.which("Xvfb")]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        script = str(Path(tmp) / "bench_app.py")
+        Path(script).write_text(APP)
+        for backend in backends:
+            results[backend] = _measure(backend, script, args.runs)
+    if "xvfb" not in results:
+        results["xvfb"] = {"skipped": "Xvfb not found on PATH"}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
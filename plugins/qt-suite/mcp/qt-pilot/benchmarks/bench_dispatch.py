@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Dispatcher latency benchmark: queued-signal wakeups vs the old 10 ms poll.
+
+Runs a real QApplication (offscreen platform, no Xvfb needed) with the
+harness CommandHandler, and from a background thread measures:
+
+- round-trip latency of sequential `ping` dispatches (p50/p95/max),
+- throughput of a burst of concurrent dispatches,
+- main-thread wakeups per second while idle.
+
+`PollingDispatcher` below reproduces the pre-signal design (one command per
+10 ms QTimer tick) so both can be measured side by side on the same machine.
+
+Usage: python benchmarks/bench_dispatch.py [--count 200] [--burst 500]
+"""
+
+import argparse
+import collections
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PySide6.QtCore import QObject, QTimer  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+import harness  # noqa: E402
+
+
+class PollingDispatcher(QObject):
+    """The original design: a 10 ms QTimer that runs one command per tick."""
+
+    def __init__(self, handler: harness.CommandHandler) -> None:
+        super().__init__()
+        self._handler = handler
+        self._pending: collections.deque = collections.deque()
+        self.wakeups = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(10)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start()
+
+    def submit(self, command, on_result) -> None:
+        self._pending.append((command, on_result))
+
+    def _tick(self) -> None:
+        self.wakeups += 1
+        if self._pending:
+            command, on_result = self._pending.popleft()
+            on_result(self._handler.handle(command))
+
+
+class CountingDispatcher(harness.CommandDispatcher):
+    """The current dispatcher, counting main-thread wakeups."""
+
+    wakeups = 0
+
+    def _drain(self) -> None:
+        self.wakeups += 1
+        super()._drain()
+
+
+def _dispatch(dispatcher, command: dict) -> dict:
+    done = threading.Event()
+    slot = []
+    dispatcher.submit(command, lambda r: (slot.append(r), done.set()))
+    done.wait(10)
+    return slot[0]
+
+
+def _measure(dispatcher, count: int, burst: int) -> dict:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        _dispatch(dispatcher, {"cmd": "ping"})
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    remaining = threading.Semaphore(0)
+    start = time.perf_counter()
+    for _ in range(burst):
+        dispatcher.submit({"cmd": "ping"}, lambda r: remaining.release())
+    for _ in range(burst):
+        remaining.acquire()
+    burst_secs = time.perf_counter() - start
+
+    before = dispatcher.wakeups
+    time.sleep(1.0)
+    idle_wakeups = dispatcher.wakeups - before
+
+    latencies.sort()
+    return {
+        "latency_ms_p50": round(statistics.median(latencies), 3),
+        "latency_ms_p95": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "latency_ms_max": round(latencies[-1], 3),
+        "burst_commands_per_sec": round(burst / burst_secs),
+        "idle_wakeups_per_sec": idle_wakeups,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=500)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    results = {}
+    keep_alive = []  # dispatchers must die on the main thread, after exec()
+
+    def run() -> None:
+        for name, factory in (
+            ("poll_10ms", PollingDispatcher),
+            ("queued_signal", CountingDispatcher),
+        ):
+            created = threading.Event()
+            holder = []
+
+            def build(factory=factory) -> None:
+                holder.append(factory(harness.CommandHandler(app)))
+                created.set()
+
+            QTimer.singleShot(0, app, build)  # QObjects must be created on the main thread
+            created.wait()
+            keep_alive.extend(holder)
+            results[name] = _measure(holder[0], args.count, args.burst)
+        app.quit()
+
+    threading.Thread(target=run, daemon=True).start()
+    app.exec()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
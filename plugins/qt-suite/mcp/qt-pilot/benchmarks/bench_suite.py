@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""qt-pilot benchmark suite: the MCP server -> harness path, end to end.
+
+Drives main.py's tool functions against real apps, per backend (`xvfb`
+only when the Xvfb binary is on PATH, and `offscreen`), and measures:
+
+- launch latency (launch_app's launch_ms, median/min of --runs cold launches),
+- per-command round-trip latency percentiles on a calculator app (the
+  CalculatorWidget of references/qtest-patterns, with the same widget names),
+  plus the harness-side handler time of each from get_harness_metrics,
+- screenshot cost: full PNG to a file, 400 px JPEG inline, unchanged check,
+- wait_for_idle: on a quiet app, and the settle time after a click that
+  starts a chain of timers,
+- find/list cost against widget count on a synthetic app with thousands of
+  widgets and a 100,000-row model (list_all_widgets, find_widgets, a
+  filtered page, get_model_data).
+
+Results are JSON (stdout, or --output). With --compare, every timing is
+checked against a previous results file; the comparison is printed and
+the exit status is 1 when a median/p50/p95 is more than --tolerance worse
+(and, for timings, at least --min-delta-ms worse).
+
+Usage: python benchmarks/bench_suite.py [--backends offscreen xvfb] [--runs 5]
+       [--count 200] [--widgets 100 1000 5000] [--output results.json]
+       [--compare baseline.json] [--tolerance 0.25] [--min-delta-ms 1.0]
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main as qt_main  # noqa: E402
+
+CALCULATOR_APP = """\
+import sys
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import (QApplication, QGridLayout, QLineEdit, QPushButton,
+                               QVBoxLayout, QWidget)
+
+
+class CalculatorWidget(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.setObjectName("calculator")
+        self.pending = None
+        layout = QVBoxLayout(self)
+        self.display = QLineEdit("0")
+        self.display.setObjectName("display")
+        layout.addWidget(self.display)
+        grid = QGridLayout()
+        layout.addLayout(grid)
+        for digit in range(10):
+            button = self._button(f"btn_{digit}", str(digit), grid, digit // 3, digit % 3)
+            button.clicked.connect(lambda _=False, d=digit: self.press_digit(d))
+        for row, (name, text) in enumerate([("btn_add", "+"), ("btn_divide", "/"),
+                                            ("btn_equals", "="), ("btn_clear", "C")]):
+            self._button(name, text, grid, row, 3).clicked.connect(
+                lambda _=False, n=name: self.press_operator(n))
+        # Starts a chain of 10 x 20 ms timers, for wait_for_idle's settle time.
+        self._button("busy_btn", "Busy", grid, 4, 0).clicked.connect(lambda: self.busy(10))
+
+    def _button(self, name, text, grid, row, column):
+        button = QPushButton(text)
+        button.setObjectName(name)
+        grid.addWidget(button, row, column)
+        return button
+
+    def press_digit(self, digit):
+        text = self.display.text()
+        self.display.setText(str(digit) if text == "0" else text + str(digit))
+
+    def press_operator(self, name):
+        if name == "btn_clear":
+            self.pending = None
+            self.display.setText("0")
+        elif name == "btn_equals" and self.pending:
+            left, operator = self.pending
+            right = float(self.display.text() or 0)
+            result = left + right if operator == "btn_add" else left / (right or 1)
+            self.display.setText(str(result))
+            self.pending = None
+        else:
+            self.pending = (float(self.display.text() or 0), name)
+            self.display.setText("0")
+
+    def busy(self, steps):
+        self.display.setText(str(steps))
+        if steps:
+            QTimer.singleShot(20, lambda: self.busy(steps - 1))
+
+
+app = QApplication(sys.argv)
+window = CalculatorWidget()
+window.resize(320, 400)
+window.show()
+sys.exit(app.exec())
+"""
+
+SYNTHETIC_APP = """\
+import sys
+from PySide6.QtCore import QAbstractTableModel, Qt
+from PySide6.QtWidgets import (QApplication, QGridLayout, QPushButton, QScrollArea,
+                               QTableView, QVBoxLayout, QWidget)
+
+WIDGETS = __WIDGETS__
+ROWS = 100_000
+
+
+class BigModel(QAbstractTableModel):
+    def rowCount(self, parent=None):
+        return 0 if parent is not None and parent.isValid() else ROWS
+
+    def columnCount(self, parent=None):
+        return 5
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"r{index.row()}c{index.column()}"
+        return None
+
+
+app = QApplication(sys.argv)
+window = QWidget()
+window.setObjectName("main")
+layout = QVBoxLayout(window)
+grid_host = QWidget()
+grid = QGridLayout(grid_host)
+for i in range(WIDGETS):
+    button = QPushButton(f"Button {i}")
+    button.setObjectName(f"button_{i}")
+    grid.addWidget(button, i // 50, i % 50)
+scroll = QScrollArea()
+scroll.setWidget(grid_host)
+layout.addWidget(scroll)
+table = QTableView()
+table.setObjectName("big_table")
+table.setModel(BigModel())
+layout.addWidget(table)
+window.resize(1024, 768)
+window.show()
+sys.exit(app.exec())
+"""
+
+
+def _percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1], 3)}
+
+
+def _time_ms(call, count: int, warmup: int = 5) -> list[float]:
+    """Wall time of `count` calls, after `warmup` untimed ones; each must succeed."""
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        result = call()
+        samples.append((time.perf_counter() - start) * 1000)
+        if not result.get("success"):
+            raise RuntimeError(f"benchmark call failed: {result}")
+    return samples
+
+
+def _launch(script: str, backend: str) -> dict:
+    result = qt_main.launch_app(script_path=script, timeout=60, backend=backend)
+    if not result.get("success"):
+        raise RuntimeError(f"launch failed: {result.get('message')}")
+    qt_main.wait_for_idle(timeout=10)
+    return result
+
+
+def _bench_launch(script: str, backend: str, runs: int) -> dict:
+    launches = []
+    for _ in range(runs):
+        try:
+            launches.append(_launch(script, backend)["launch_ms"])
+        finally:
+            qt_main.close_app()
+    return {"median": round(statistics.median(launches), 1), "min": round(min(launches), 1)}
+
+
+def _bench_calculator(script: str, backend: str, count: int, runs: int) -> dict:
+    _launch(script, backend)
+    try:
+        state = qt_main._running_session(qt_main._DEFAULT_SESSION)
+        qt_main.get_harness_metrics(reset=True)
+        commands = {
+            "ping": lambda: qt_main._send_command({"cmd": "ping"}, state=state),
+            "get_widget_info": lambda: qt_main.get_widget_info("display"),
+            "find_widgets": lambda: qt_main.find_widgets("btn_*"),
+            "click_widget": lambda: qt_main.click_widget("btn_5"),
+            "type_text": lambda: qt_main.type_text("7", widget_name="display"),
+        }
+        latency = {name: _percentiles(_time_ms(call, count)) for name, call in commands.items()}
+        metrics = qt_main.get_harness_metrics()["commands"]
+        handler_ms = {name: metrics[name]["handler_ms"]["p50"]
+                      for name in ("ping", "get_widget_info", "find_widgets", "click", "type_text")
+                      if name in metrics}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            png = str(Path(tmp) / "shot.png")
+            screenshots = {
+                "png_file": _time_ms(lambda: qt_main.capture_screenshot(output_path=png), 20),
+                "jpeg_400_base64": _time_ms(lambda: qt_main.capture_screenshot(
+                    max_size=400, format="jpeg", output="base64"), 20),
+                "unchanged_check": _time_ms(lambda: qt_main.capture_screenshot(
+                    output="base64", if_changed=True), 20),
+            }
+
+        idle, settle, settle_elapsed = [], [], []
+        for _ in range(runs):
+            idle.append(qt_main.wait_for_idle(timeout=5)["elapsed"] * 1000)
+            qt_main.click_widget("busy_btn")
+            waited = qt_main.wait_for_idle(timeout=5)
+            settle.append((waited["settle_time"] or 0) * 1000)
+            settle_elapsed.append(waited["elapsed"] * 1000)
+    finally:
+        qt_main.close_app()
+    return {
+        "latency_ms": latency,
+        "harness_handler_ms_p50": handler_ms,
+        "screenshot_ms": {name: _percentiles(samples) for name, samples in screenshots.items()},
+        "wait_for_idle_ms": {
+            "quiet_app": round(statistics.median(idle), 1),
+            "timer_chain_settle": round(statistics.median(settle), 1),
+            "timer_chain_elapsed": round(statistics.median(settle_elapsed), 1),
+        },
+    }
+
+
+def _bench_scaling(tmp: str, backend: str, widget_counts: list[int]) -> dict:
+    scaling = {}
+    for widgets in widget_counts:
+        script = str(Path(tmp) / f"synthetic_{widgets}.py")
+        Path(script).write_text(SYNTHETIC_APP.replace("__WIDGETS__", str(widgets)))
+        _launch(script, backend)
+        try:
+            listed = qt_main.list_all_widgets()
+            list_ms = statistics.median(_time_ms(qt_main.list_all_widgets, 5, warmup=1))
+            find_ms = statistics.median(_time_ms(lambda: qt_main.find_widgets("*"), 5, warmup=1))
+            page_ms = statistics.median(_time_ms(
+                lambda: qt_main.find_widgets("button_*", types=["QPushButton"], limit=50), 5))
+            model_ms = statistics.median(_time_ms(
+                lambda: qt_main.get_model_data("big_table", row=50_000, row_count=100), 5))
+        finally:
+            qt_main.close_app()
+        listed_count = listed.get("count", len(listed.get("widgets", ())))
+        scaling[str(widgets)] = {
+            "listed_widgets": listed_count,
+            "list_all_widgets_ms": round(list_ms, 2),
+            "find_widgets_all_ms": round(find_ms, 2),
+            "find_widgets_page_ms": round(page_ms, 2),
+            "get_model_data_100_rows_ms": round(model_ms, 2),
+            "list_widgets_per_sec": round(listed_count / (list_ms / 1000)),
+        }
+    return scaling
+
+
+def _metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=Path(__file__).parent, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    try:
+        import PySide6
+        pyside = PySide6.__version__
+    except ImportError:
+        pyside = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "pyside6": pyside,
+        "platform": platform.platform(),
+    }
+
+
+def _flatten(tree: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict, tolerance: float, min_delta_ms: float) -> dict:
+    """Ratio of every metric present in both runs; worse beyond tolerance is a regression.
+
+    Rates (keys ending in _per_sec) are better higher, everything else lower.
+    Tails (p99, max) are too noisy to gate on and are skipped, as are timing
+    changes smaller than min_delta_ms.
+    """
+    old = _flatten(baseline.get("backends", {}))
+    new = _flatten(current.get("backends", {}))
+    regressions, improvements = {}, {}
+    for path in sorted(old.keys() & new.keys()):
+        before, after = old[path], new[path]
+        if path.endswith((".p99", ".max", "listed_widgets")) or not before or not after:
+            continue
+        rate = path.endswith("_per_sec")
+        if not rate and abs(after - before) < min_delta_ms:
+            continue
+        ratio = after / before
+        slower, faster = ratio > 1 + tolerance, ratio < 1 / (1 + tolerance)
+        entry = {"baseline": before, "current": after, "ratio": round(ratio, 3)}
+        if faster if rate else slower:
+            regressions[path] = entry
+        elif slower if rate else faster:
+            improvements[path] = entry
+    return {
+        "baseline": baseline.get("meta", {}),
+        "tolerance": tolerance,
+        "min_delta_ms": min_delta_ms,
+        "regressions": regressions,
+        "improvements": improvements,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["xvfb", "offscreen"],
+                        choices=qt_main._BACKENDS)
+    parser.add_argument("--runs", type=int, default=5, help="cold launches / idle waits")
+    parser.add_argument("--count", type=int, default=200, help="calls per command latency")
+    parser.add_argument("--widgets", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--output", help="write the results JSON here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown tolerated before a metric is a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="timing changes smaller than this are never a regression")
+    args = parser.parse_args()
+
+    qt_main.logger.setLevel("WARNING")
+    results = {
+        "meta": _metadata(),
+        "config": {"runs": args.runs, "count": args.count, "widgets": args.widgets},
+        "backends": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        calculator = str(Path(tmp) / "calculator_app.py")
+        Path(calculator).write_text(CALCULATOR_APP)
+        for backend in args.backends:
+            if backend == "xvfb" and not shutil.which("Xvfb"):
+                results["backends"][backend] = {"skipped": "Xvfb not found on PATH"}
+                continue
+            results["backends"][backend] = {
+                "launch_ms": _bench_launch(calculator, backend, args.runs),
+                **_bench_calculator(calculator, backend, args.count, args.runs),
+                "scaling": _bench_scaling(tmp, backend, args.widgets),
+            }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        comparison = compare(json.loads(Path(args.compare).read_text()), results,
+                             args.tolerance, args.min_delta_ms)
+        print(json.dumps({"comparison": comparison}, indent=2))
+        if comparison["regressions"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,21 +12,40 @@ inside an xvfb virtual display.
 """
 
 import argparse
+import base64
+import bisect
+import collections
+import enum
 import fnmatch
+import functools
+import gc
+import hashlib
 import importlib.util
+import itertools
 import json
 import os
 import queue as queue_mod
+import re
+import resource
+import select
+import signal
 import socket
+import struct
 import sys
 import threading
 import time
 import traceback
+import tracemalloc
+import weakref
+import zlib
 from pathlib import Path
+from typing import Callable, Iterator
 
 # Must import Qt before creating QApplication
-from PySide6.QtCore import QCoreApplication, QObject, QPoint, QTimer, Qt, Slot
-from PySide6.QtGui import QAction, QGuiApplication
+from PySide6 import QtWidgets
+from PySide6.QtCore import (QBuffer, QCoreApplication, QEvent, QIODevice, QModelIndex, QObject,
+                            QPoint, QRect, QTimer, Qt, Signal, Slot)
+from PySide6.QtGui import QAction, QGuiApplication, QImage, QImageWriter, QPainter, QPixmap
 from PySide6.QtTest import QTest
 from PySide6.QtWidgets import QApplication, QMenu, QMenuBar, QWidget
 
@@ -131,11 +150,1081 @@ _KEY_MAP: dict[str, Qt.Key] = {
 }
 
 
+# Max commands the dispatcher runs per main-thread wakeup before yielding to
+# the app's own events (override with --dispatch-budget).
+_DISPATCH_BUDGET: int = 32
+
+# Commands that only read UI state. While a blocking handler (wait_idle) is
+# pumping the event loop, the dispatcher may run these re-entrantly so they
+# pipeline behind the long command instead of queueing after it.
+_READ_ONLY_COMMANDS = frozenset({
+    "ping",
+    "find_widgets",
+    "list_all_widgets",
+    "get_widget_info",
+    "list_actions",
+})
+
+# Commands that only read state unless given one of these options (which
+# reset or redirect it); with any of them they queue like a mutating command.
+_READ_ONLY_UNLESS: dict[str, tuple[str, ...]] = {
+    "get_metrics": ("reset", "stream_to"),
+}
+
+
+def _is_read_only(command: dict) -> bool:
+    """Whether the dispatcher may run `command` re-entrantly (see _READ_ONLY_COMMANDS)."""
+    name = command.get("cmd")
+    if name in _READ_ONLY_COMMANDS:
+        return True
+    options = _READ_ONLY_UNLESS.get(name)
+    return options is not None and all(command.get(o) in (None, False) for o in options)
+
+
+# Upper bounds (ms) of the latency histogram buckets (get_metrics per-command
+# timings, responsiveness lag and paint times); one more bucket counts
+# everything slower.
+_METRIC_BUCKETS_MS: tuple[float, ...] = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000,
+    2500, 10000,
+)
+
+# Timings recorded per command, in the order they happen: JSON decode on the
+# connection's reader thread, wait for the main thread to pick up the queue,
+# wait behind commands ahead of it in the same pickup, the handler (which
+# includes its processEvents calls, also reported on their own), then
+# encoding and writing the reply.
+_METRIC_TIMINGS: tuple[str, ...] = (
+    "decode_ms", "dispatch_ms", "queue_ms", "handler_ms", "process_events_ms", "reply_ms",
+)
+_METRIC_SIZES: tuple[str, ...] = ("request_bytes", "reply_bytes")
+
+# Responsiveness profiler (--profile, the responsiveness command): heartbeat
+# period, default stall threshold, innermost frames kept per stall stack,
+# stalls kept, and heartbeats between scans for new top-level windows.
+_HEARTBEAT_MS: int = 5
+_STALL_MS: float = 100.0
+_STALL_STACK_DEPTH: int = 20
+_MAX_STALLS: int = 100
+_WINDOW_SCAN_BEATS: int = 100
+
+# Memory reports (the memory command): stack frames kept per traced Python
+# allocation (1 = the allocating line), RSS samples kept between reports,
+# and the growth figures a max_growth limit can be set on.
+_TRACE_FRAMES: int = 1
+_RSS_SAMPLES: int = 600
+_MEMORY_GROWTH_KEYS: tuple[str, ...] = ("rss_bytes", "python_bytes", "qobjects", "widgets")
+
+
+def _expectation_mismatch(result: dict, expect: dict | None) -> str | None:
+    """Describe the first `expect` key the result doesn't match, or None."""
+    if not expect or not result.get("success"):
+        return None
+    if not isinstance(expect, dict):
+        return "expect must be an object"
+    actual = result.get("info", result)
+    for key, expected in expect.items():
+        if key not in actual:
+            return f"Expectation failed: {key} missing from result"
+        if actual[key] != expected:
+            return f"Expectation failed: {key} is {actual[key]!r}, expected {expected!r}"
+    return None
+
+
+def _json_value(value):
+    """A Qt property value as something json.dumps can carry."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    return str(value)
+
+
+def _item_value(value, role: int | None = None):
+    """A model data() value as JSON: enums (CheckState, ...) by name."""
+    if role == Qt.ItemDataRole.CheckStateRole and type(value) is int:
+        value = Qt.CheckState(value)  # QStandardItemModel stores a plain int
+    if isinstance(value, enum.Enum):
+        return value.name
+    return _json_value(value)
+
+
+def _fingerprint(image: QImage) -> dict:
+    """Tile checksums and difference hash of a captured image."""
+    width, height = image.width(), image.height()
+    tile = _FINGERPRINT_TILE
+    image = image.convertToFormat(QImage.Format.Format_RGB32)
+    tiles = [[zlib.crc32(image.copy(x, y, min(tile, width - x), min(tile, height - y))
+                         .constBits())
+              for x in range(0, width, tile)]
+             for y in range(0, height, tile)]
+    thumb = image.scaled(9, 8, Qt.AspectRatioMode.IgnoreAspectRatio,
+                         Qt.TransformationMode.SmoothTransformation)
+    thumb = thumb.convertToFormat(QImage.Format.Format_Grayscale8)
+    bits, stride = thumb.constBits(), thumb.bytesPerLine()
+    dhash = 0
+    for y in range(8):
+        for x in range(8):
+            dhash = (dhash << 1) | (bits[y * stride + x] > bits[y * stride + x + 1])
+    return {"width": width, "height": height, "tiles": tiles, "dhash": dhash}
+
+
+def _compare_fingerprints(old: dict, new: dict) -> dict:
+    """Changed tile rectangles (merged), the changed share of the area, hash distance."""
+    width, height, tile = new["width"], new["height"], _FINGERPRINT_TILE
+    if (old["width"], old["height"]) != (width, height):
+        return {"changed": True, "size_changed": True, "diff_ratio": 1.0,
+                "changed_tiles": sum(map(len, new["tiles"])),
+                "rects": [{"x": 0, "y": 0, "width": width, "height": height}],
+                "hash_distance": bin(old["dhash"] ^ new["dhash"]).count("1")}
+
+    # Runs of changed tiles per tile row, then runs stacked on the row above
+    # with the same horizontal extent grow downwards.
+    rects: list[dict] = []
+    open_runs: dict[tuple[int, int], dict] = {}
+    changed_area = changed_tiles = 0
+    for row, (old_row, new_row) in enumerate(zip(old["tiles"], new["tiles"])):
+        y = row * tile
+        tile_height = min(tile, height - y)
+        runs = []
+        col = 0
+        while col < len(new_row):
+            if old_row[col] == new_row[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(new_row) and old_row[col] != new_row[col]:
+                col += 1
+            runs.append((start * tile, min(col * tile, width)))
+            changed_tiles += col - start
+        next_runs = {}
+        for x0, x1 in runs:
+            changed_area += (x1 - x0) * tile_height
+            rect = open_runs.get((x0, x1))
+            if rect is not None:
+                rect["height"] += tile_height
+            else:
+                rect = {"x": x0, "y": y, "width": x1 - x0, "height": tile_height}
+                rects.append(rect)
+            next_runs[(x0, x1)] = rect
+        open_runs = next_runs
+    return {
+        "changed": bool(rects),
+        "diff_ratio": round(changed_area / (width * height), 4) if width and height else 0.0,
+        "changed_tiles": changed_tiles,
+        "rects": rects,
+        "hash_distance": bin(old["dhash"] ^ new["dhash"]).count("1"),
+    }
+
+
+def _mro_matches(cls: type, names: frozenset[str], cache: dict[type, bool]) -> bool:
+    """Whether any class in cls's MRO is named in `names`, memoized in `cache`."""
+    matched = cache.get(cls)
+    if matched is None:
+        matched = any(base.__name__ in names for base in cls.__mro__)
+        cache[cls] = matched
+    return matched
+
+
+# Events after which the child they carry is (re-)indexed by name.
+_INDEX_ADD_EVENTS = (QEvent.Type.ChildAdded, QEvent.Type.ChildPolished)
+
+# Events that can change what list_all_widgets reports. Text changes show up
+# as Paint/LayoutRequest on visible widgets.
+_TREE_CHANGE_EVENTS = frozenset({
+    QEvent.Type.ChildAdded,
+    QEvent.Type.ChildRemoved,
+    QEvent.Type.Show,
+    QEvent.Type.Hide,
+    QEvent.Type.Move,
+    QEvent.Type.Resize,
+    QEvent.Type.EnabledChange,
+    QEvent.Type.LayoutRequest,
+    QEvent.Type.Paint,
+})
+
+# wait_idle: the app counts as idle once no event has been delivered to it
+# for this long. Timers shorter than this window fire inside it, so they
+# count as pending work; a QLineEdit cursor blink (500 ms) does not.
+_IDLE_QUIET_MS: int = 100
+
+# wait_idle poll interval while the app is quiet.
+_IDLE_POLL_SECS: float = 0.005
+
+# wait_for_widget / wait_for_property re-check their condition after every
+# batch of app events, and at least this often even if no events arrive.
+_CONDITION_RECHECK_SECS: float = 0.05
+
+# Widget states wait_for_widget accepts.
+_WIDGET_STATES = frozenset({"exists", "visible", "enabled", "gone"})
+
+# Widget-tree snapshots kept for list_all_widgets(changes_since=...); older
+# versions get a full listing instead of a diff.
+_SNAPSHOT_HISTORY: int = 8
+
+# Widget record fields, in reply order. find_widgets / list_all_widgets take a
+# `fields` subset; find_widgets defaults to the short form.
+_WIDGET_FIELDS = ("id", "name", "type", "visible", "enabled", "x", "y", "width", "height",
+                  "global_x", "global_y", "depth", "text")
+_FIND_WIDGET_FIELDS = ("name", "type", "visible", "enabled")
+_ALL_WIDGET_FIELDS = frozenset(_WIDGET_FIELDS)
+
+# find_widgets / list_all_widgets arguments that switch to a filtered,
+# paged walk (see _WidgetQuery).
+_WIDGET_QUERY_KEYS = ("types", "region", "max_depth", "visible", "enabled", "root",
+                      "limit", "cursor")
+
+# Selector syntax, a CSS subset: compounds joined by whitespace (descendant)
+# or ">" (child). A compound is an optional class name ("*" for any) followed
+# by any of #objectName, [property], [property<op>value] and :pseudo, where
+# <op> is = != ^= $= *= or ~= (regular expression search).
+_SELECTOR_TOKEN = re.compile(r"""
+    \s*(?P<child>>)\s*
+  | (?P<descendant>\s+)
+  | (?P<type>\*|[A-Za-z_]\w*)
+  | \#(?P<name>[\w-]+)
+  | \[\s*(?P<prop>[A-Za-z_]\w*)\s*
+    (?:(?P<op>[!^$*~]?=)\s*(?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|[^\]\s"']+)\s*)?\]
+  | :(?P<pseudo>[\w-]+)
+""", re.VERBOSE)
+
+_SELECTOR_PSEUDOS: dict[str, Callable[[QWidget], bool]] = {
+    "visible": lambda widget: widget.isVisible(),
+    "hidden": lambda widget: not widget.isVisible(),
+    "enabled": lambda widget: widget.isEnabled(),
+    "disabled": lambda widget: not widget.isEnabled(),
+    "focused": lambda widget: widget.hasFocus(),
+    "checked": lambda widget: bool(widget.property("checked")),
+}
+
+# get_model_data roles by name; integer roles (UserRole + n) are accepted too.
+_ITEM_ROLES: dict[str, Qt.ItemDataRole] = {
+    "display": Qt.ItemDataRole.DisplayRole,
+    "edit": Qt.ItemDataRole.EditRole,
+    "tooltip": Qt.ItemDataRole.ToolTipRole,
+    "check_state": Qt.ItemDataRole.CheckStateRole,
+    "user": Qt.ItemDataRole.UserRole,
+}
+
+# get_model_data rows per page: default, and the most one request may ask for.
+_MODEL_PAGE_ROWS: int = 100
+_MODEL_MAX_PAGE_ROWS: int = 10_000
+
+# Screenshot encodings (QImageWriter format names). WebP needs Qt's
+# imageformats plugin, so it is checked against the running build.
+_SCREENSHOT_FORMATS = ("png", "jpeg", "webp")
+
+# Screenshot fingerprints (capture_screenshot if_changed, visual_diff): the
+# image is cut into tiles this many pixels square and each tile checksummed;
+# a 64-bit difference hash of a 9x8 grayscale thumbnail rides along as a
+# measure of how different two frames look overall.
+_FINGERPRINT_TILE: int = 32
+
+# Capture targets whose last fingerprint is remembered.
+_FINGERPRINT_HISTORY: int = 32
+
+# Compiled selectors kept for reuse (wait tools re-evaluate one many times).
+_SELECTOR_CACHE_SIZE: int = 256
+
+# Wire protocol. Version 1 is newline-delimited JSON. A client that sends
+# {"cmd": "hello", "protocol": 2} as its first message (answered in version 1)
+# switches the connection to version 2: every message is a frame header
+# (payload length as big-endian uint32, then a flags byte) followed by compact
+# JSON, zlib-compressed when _FRAME_COMPRESSED is set. v1 clients never send
+# hello and v1 harnesses answer it with "Unknown command", so either side may
+# be the older one.
+_PROTOCOL_VERSION: int = 2
+_FRAME_HEADER = struct.Struct("!IB")
+_FRAME_COMPRESSED: int = 0x01
+_MAX_FRAME_BYTES: int = 256 * 1024 * 1024
+
+
+class _ObjectIndex(QObject):
+    """objectName -> weakref indexes of the app's widgets and QActions.
+
+    Installed as an application-wide event filter so entries are added as
+    children appear (ChildAdded, and ChildPolished for widgets whose name is
+    set after construction) and dropped as they leave (ChildRemoved). Qt has
+    no event for setObjectName, so every hit is verified (object alive, name
+    unchanged); a stale entry or a miss triggers one full rebuild walk.
+
+    Being the one app-wide filter, it also counts tree-changing events in
+    `changes`, which tells snapshot requests whether a re-walk is needed, and
+    every event not addressed to a harness object (`exempt`) in `activity`,
+    which wait_idle watches for a quiet window.
+    """
+
+    def __init__(self, app: QApplication):
+        super().__init__()
+        self._app = app
+        self._widgets: dict[str, weakref.ref] = {}
+        self._actions: dict[str, weakref.ref] = {}
+        self.changes = 0
+        self.activity = 0
+        self.exempt: set[int] = set()  # ids of harness QObjects
+        self.rebuild()
+        app.installEventFilter(self)
+
+    def widget(self, name: str, rebuild: bool = True) -> QWidget | None:
+        """Look up a widget; rebuild=False skips the full walk on a miss."""
+        if not rebuild:
+            return self._verified(self._widgets, name)
+        return self._get(self._widgets, name)
+
+    def action(self, name: str) -> QAction | None:
+        return self._get(self._actions, name)
+
+    def rebuild(self) -> None:
+        """Re-index every named widget and QAction under the top-levels."""
+        self._widgets.clear()
+        self._actions.clear()
+        for window in self._app.topLevelWidgets():
+            self._add(window)
+            for child in window.findChildren(QObject):
+                self._add(child)
+
+    def eventFilter(self, watched, event) -> bool:
+        if id(watched) not in self.exempt:
+            self.activity += 1
+        etype = event.type()
+        if etype in _TREE_CHANGE_EVENTS:
+            self.changes += 1
+        if etype in _INDEX_ADD_EVENTS:
+            self._add(event.child())
+        elif etype == QEvent.Type.ChildRemoved:
+            self._discard(event.child())
+        return False
+
+    def _get(self, table: dict[str, weakref.ref], name: str):
+        obj = self._verified(table, name)
+        if obj is None:
+            self.rebuild()
+            obj = self._verified(table, name)
+        return obj
+
+    @staticmethod
+    def _verified(table: dict[str, weakref.ref], name: str):
+        ref = table.get(name)
+        obj = ref() if ref else None
+        try:
+            if obj is not None and obj.objectName() == name:
+                return obj
+        except RuntimeError:
+            pass  # Python wrapper outlived its C++ object
+        return None
+
+    def _add(self, obj) -> None:
+        try:
+            name = obj.objectName()
+        except RuntimeError:
+            return
+        if not name:
+            return
+        if isinstance(obj, QWidget):
+            table = self._widgets
+        elif isinstance(obj, QAction):
+            table = self._actions
+        else:
+            return
+        # First one wins, as with findChild; only replace a dead entry.
+        if self._verified(table, name) is None:
+            try:
+                table[name] = weakref.ref(obj)
+            except TypeError:
+                pass
+
+    def _discard(self, obj) -> None:
+        try:
+            name = obj.objectName()
+        except RuntimeError:
+            return
+        for table in (self._widgets, self._actions):
+            ref = table.get(name)
+            if ref is not None and ref() is obj:
+                del table[name]
+
+
+class _WidgetQuery:
+    """Filters, field projection and paging for a widget-tree walk.
+
+    A widget that fails a filter which holds for its whole subtree prunes that
+    subtree: descendants of an invisible or disabled widget are invisible or
+    disabled too, children are clipped to their parent so nothing below a
+    widget outside `region` intersects it, and nothing below `max_depth` is
+    visited. `types` matches any class name in the widget's MRO, so
+    "QAbstractButton" matches every button.
+    """
+
+    def __init__(self, cmd: dict, default_fields: tuple[str, ...], include_invisible: bool):
+        types = cmd.get("types")
+        self.types = frozenset([types] if isinstance(types, str) else types) if types else None
+        self.region = self._parse_region(cmd.get("region"))
+        self.max_depth = cmd.get("max_depth")
+        if self.max_depth is not None and (not isinstance(self.max_depth, int)
+                                           or self.max_depth < 0):
+            raise ValueError("max_depth must be a non-negative integer")
+        # visible=None lists both; include_invisible=False is visible=True.
+        self.visible = cmd.get("visible")
+        if self.visible is None and not include_invisible:
+            self.visible = True
+        self.enabled = cmd.get("enabled")
+        self.root = cmd.get("root")
+
+        fields = cmd.get("fields") or default_fields
+        unknown = [f for f in fields if f not in _WIDGET_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)} "
+                             f"(expected any of: {', '.join(_WIDGET_FIELDS)})")
+        self.fields = frozenset(fields)
+
+        self.limit = cmd.get("limit")
+        if self.limit is not None and (not isinstance(self.limit, int) or self.limit < 1):
+            raise ValueError("limit must be a positive integer")
+        self.offset, self.changes = self._parse_cursor(cmd.get("cursor"))
+        self._type_matches: dict[type, bool] = {}
+
+    @staticmethod
+    def _parse_region(region: dict | None) -> tuple[int, int, int, int] | None:
+        if region is None:
+            return None
+        try:
+            x, y = int(region["x"]), int(region["y"])
+            return x, y, x + int(region["width"]), y + int(region["height"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("region must be {x, y, width, height}") from None
+
+    @staticmethod
+    def _parse_cursor(cursor: str | None) -> tuple[int, int | None]:
+        """A cursor is "<offset>:<tree change count when the first page was listed>"."""
+        if cursor is None:
+            return 0, None
+        try:
+            offset, changes = (int(part) for part in str(cursor).split(":"))
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {cursor}") from None
+        return offset, changes
+
+    def prunes(self, widget: QWidget, depth: int,
+               global_rect: tuple[int, int, int, int] | None) -> bool:
+        """True when neither `widget` nor anything below it can match."""
+        if self.max_depth is not None and depth > self.max_depth:
+            return True
+        if self.visible and not widget.isVisible():
+            return True
+        if self.enabled and not widget.isEnabled():
+            return True
+        if self.region is not None:
+            x, y, right, bottom = global_rect
+            rx, ry, rright, rbottom = self.region
+            if x >= rright or right <= rx or y >= rbottom or bottom <= ry:
+                return True
+        return False
+
+    def matches(self, widget: QWidget) -> bool:
+        """Filters that don't prune: visible=False, enabled=False and types."""
+        if self.visible is False and widget.isVisible():
+            return False
+        if self.enabled is False and widget.isEnabled():
+            return False
+        if self.types is not None:
+            return _mro_matches(widget.__class__, self.types, self._type_matches)
+        return True
+
+
+class _SelectorCompound:
+    """One compound of a selector: type, #name, [property] tests, :pseudos."""
+
+    def __init__(self):
+        self.type_names: frozenset[str] | None = None
+        self.cls: type = QWidget  # findChildren() filter; QWidget unless a Qt class
+        self.name: str | None = None
+        self.props: list[tuple[str, str | None, object]] = []
+        self.pseudos: list[Callable[[QWidget], bool]] = []
+        self._type_matches: dict[type, bool] = {}
+
+    def matches(self, widget: QWidget) -> bool:
+        if self.name is not None and widget.objectName() != self.name:
+            return False
+        if self.type_names is not None and not _mro_matches(
+                widget.__class__, self.type_names, self._type_matches):
+            return False
+        for pseudo in self.pseudos:
+            if not pseudo(widget):
+                return False
+        for prop, op, expected in self.props:
+            if not self._prop_matches(widget.property(prop), op, expected):
+                return False
+        return True
+
+    @staticmethod
+    def _prop_matches(value, op: str | None, expected) -> bool:
+        value = _json_value(value)
+        if op is None:
+            return bool(value)
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        if value is None:
+            return op == "!="
+        text = str(value)
+        if op == "=":
+            return text == expected
+        if op == "!=":
+            return text != expected
+        if op == "^=":
+            return text.startswith(expected)
+        if op == "$=":
+            return text.endswith(expected)
+        if op == "*=":
+            return expected in text
+        return expected.search(text) is not None  # ~=
+
+
+class _Selector:
+    """A compiled selector, evaluated lazily in tree order.
+
+    When a compound names an objectName, the last such compound is resolved
+    through the object index (first widget with that name, as with
+    widget_name) and the compounds before it are checked against its
+    ancestors, so only its subtree is searched. Class names that are Qt
+    widget classes are filtered by findChildren() on the C++ side.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.steps: list[tuple[str, _SelectorCompound]] = []
+        source = text.strip()
+        if not source:
+            raise ValueError("Empty selector")
+        combinator = " "
+        compound: _SelectorCompound | None = None
+        pos = 0
+        while pos < len(source):
+            m = _SELECTOR_TOKEN.match(source, pos)
+            if m is None:
+                raise ValueError(f"Invalid selector {text!r}: unexpected {source[pos:]!r}")
+            pos = m.end()
+            if m.group("child") is not None or m.group("descendant") is not None:
+                if compound is None:
+                    raise ValueError(f"Invalid selector {text!r}: misplaced combinator")
+                self.steps.append((combinator, compound))
+                compound = None
+                combinator = ">" if m.group("child") else " "
+                continue
+            if compound is None:
+                compound = _SelectorCompound()
+            if m.group("type") is not None:
+                if compound.name or compound.props or compound.pseudos:
+                    raise ValueError(f"Invalid selector {text!r}: "
+                                     f"class name {m.group('type')!r} must come first")
+                if m.group("type") != "*":
+                    compound.type_names = frozenset((m.group("type"),))
+                    qt_class = getattr(QtWidgets, m.group("type"), None)
+                    if isinstance(qt_class, type) and issubclass(qt_class, QWidget):
+                        compound.cls = qt_class
+            elif m.group("name") is not None:
+                compound.name = m.group("name")
+            elif m.group("prop") is not None:
+                compound.props.append(self._parse_prop(m.group("prop"), m.group("op"),
+                                                       m.group("value")))
+            else:
+                pseudo = _SELECTOR_PSEUDOS.get(m.group("pseudo"))
+                if pseudo is None:
+                    raise ValueError(f"Invalid selector {text!r}: unknown :{m.group('pseudo')} "
+                                     f"(expected one of {', '.join(_SELECTOR_PSEUDOS)})")
+                compound.pseudos.append(pseudo)
+        if compound is None:
+            raise ValueError(f"Invalid selector {text!r}: ends with a combinator")
+        self.steps.append((combinator, compound))
+        named = [i for i, (_, step) in enumerate(self.steps) if step.name is not None]
+        self._anchor = named[-1] if named else None
+
+    @staticmethod
+    def _parse_prop(prop: str, op: str | None, value: str | None) -> tuple:
+        if op is None:
+            return prop, None, None
+        if value[0] in "\"'":
+            value = re.sub(r"\\([\\\"'])", r"\1", value[1:-1])  # \" \' \\ only
+        if op == "~=":
+            try:
+                return prop, op, re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern in [{prop}~=...]: {e}") from None
+        return prop, op, value
+
+    def select(self, app: QApplication,
+               lookup: Callable[[str], QWidget | None]) -> Iterator[QWidget]:
+        """Matching widgets in tree order; stop iterating to stop the search."""
+        seen: set[int] = set()
+        for widget in self._candidates(app, lookup):
+            if id(widget) not in seen:
+                seen.add(id(widget))
+                yield widget
+
+    def _candidates(self, app: QApplication,
+                    lookup: Callable[[str], QWidget | None]) -> Iterator[QWidget]:
+        if self._anchor is not None:
+            widget = lookup(self.steps[self._anchor][1].name)
+            if (widget is not None and self.steps[self._anchor][1].matches(widget)
+                    and self._ancestors_match(widget, self._anchor)):
+                yield from self._descend(widget, self._anchor + 1)
+            return
+        first = self.steps[0][1]
+        for window in app.topLevelWidgets():
+            if window.parentWidget() is not None:
+                continue  # a dialog or popup: searched below its parent
+            for widget in [window, *window.findChildren(first.cls)]:
+                if first.matches(widget):
+                    yield from self._descend(widget, 1)
+
+    def _descend(self, widget: QWidget, step: int) -> Iterator[QWidget]:
+        """Matches of steps[step:] below `widget`, which matched steps[step - 1]."""
+        if step == len(self.steps):
+            yield widget
+            return
+        combinator, compound = self.steps[step]
+        if combinator == ">":
+            candidates = [child for child in widget.children() if isinstance(child, QWidget)]
+        else:
+            candidates = widget.findChildren(compound.cls)
+        for candidate in candidates:
+            if compound.matches(candidate):
+                yield from self._descend(candidate, step + 1)
+
+    def _ancestors_match(self, widget: QWidget, step: int) -> bool:
+        """Whether widget's ancestors satisfy steps[:step] (widget matched steps[step])."""
+        if step == 0:
+            return True
+        combinator = self.steps[step][0]
+        compound = self.steps[step - 1][1]
+        parent = widget.parentWidget()
+        while parent is not None:
+            if compound.matches(parent) and self._ancestors_match(parent, step - 1):
+                return True
+            if combinator == ">":
+                return False
+            parent = parent.parentWidget()
+        return False
+
+
+@functools.lru_cache(maxsize=_SELECTOR_CACHE_SIZE)
+def _compile_selector(text: str) -> _Selector:
+    return _Selector(text)
+
+
+def _histogram(buckets: bool = True) -> list:
+    """[count, total, max, bucket counts] - without buckets for sizes."""
+    return [0, 0, 0, [0] * (len(_METRIC_BUCKETS_MS) + 1) if buckets else None]
+
+
+def _histogram_add(stat: list, value: float) -> None:
+    stat[2] = max(stat[2], value) if stat[0] else value
+    stat[0] += 1
+    stat[1] += value
+    if stat[3] is not None:
+        stat[3][bisect.bisect_left(_METRIC_BUCKETS_MS, value)] += 1
+
+
+def _histogram_summary(stat: list, histograms: bool = False) -> dict:
+    """Mean and max, and with buckets p50/p95/p99 - each the upper bound of
+    the bucket it falls in (at most one bucket high, never above max)."""
+    count, total, maximum, buckets = stat
+    if not count:
+        return {"mean": None, "max": None, "total": 0}
+    summary = {"mean": round(total / count, 3), "max": round(maximum, 3),
+               "total": round(total, 3)}
+    if buckets is None:
+        return summary
+    for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        seen = 0
+        for i, n in enumerate(buckets):
+            seen += n
+            if seen >= q * count:
+                bound = _METRIC_BUCKETS_MS[i] if i < len(_METRIC_BUCKETS_MS) else maximum
+                summary[name] = round(min(bound, maximum), 3)
+                break
+    if histograms:
+        summary["histogram"] = buckets[:]
+    return summary
+
+
+class _CommandMetrics:
+    """Per-command-type timing histograms and payload sizes.
+
+    A command's timing dict is filled in by the connection (decode, sizes,
+    reply), the dispatcher (dispatch, queue, handler) and the handler
+    (processEvents) and recorded once, after its reply is written - so from
+    a connection's writer thread, hence the lock. Each record is also
+    appended as one JSON line to the stream file, when one is set.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stream = None
+        self.stream_path: str | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # cmd -> {"count", "errors", field -> [count, total, max, buckets]}
+            self._commands: dict[str, dict] = {}
+            self._since = time.monotonic()
+
+    def record(self, timing: dict) -> None:
+        with self._lock:
+            stats = self._commands.setdefault(timing.get("cmd") or "?", {"count": 0, "errors": 0})
+            stats["count"] += 1
+            stats["errors"] += not timing.get("success", True)
+            for field in _METRIC_TIMINGS + _METRIC_SIZES:
+                value = timing.get(field)
+                if value is None:
+                    continue
+                stat = stats.get(field)
+                if stat is None:
+                    stat = stats[field] = _histogram(buckets=field.endswith("_ms"))
+                _histogram_add(stat, value)
+            if self._stream is not None:
+                self._stream.write(json.dumps({"time": round(time.time(), 6), **timing},
+                                              separators=(",", ":")) + "\n")
+
+    def stream_to(self, path: str | None) -> None:
+        """Append records to the JSONL file at path from now on; None stops."""
+        stream = open(path, "a", buffering=1, encoding="utf-8") if path else None
+        with self._lock:
+            if self._stream is not None:
+                self._stream.close()
+            self._stream, self.stream_path = stream, path or None
+
+    def report(self, histograms: bool = False) -> dict:
+        with self._lock:
+            commands = {}
+            for cmd, stats in sorted(self._commands.items()):
+                entry = {"count": stats["count"], "errors": stats["errors"]}
+                for field in _METRIC_TIMINGS + _METRIC_SIZES:
+                    if field in stats:
+                        entry[field] = _histogram_summary(stats[field], histograms)
+                commands[cmd] = entry
+            return {"commands": commands, "seconds": round(time.monotonic() - self._since, 3)}
+
+
+class _ResponsivenessProfiler(QObject):
+    """Event-loop lag, main-thread stalls and window repaint times of the app.
+
+    A precise heartbeat timer fires every _HEARTBEAT_MS on the main thread;
+    how late each beat arrives is the event-loop lag, and a gap of stall_ms
+    or more is a stall. The main thread cannot report on itself while it is
+    stalled, so a watchdog thread samples its Python stack as soon as a beat
+    is stall_ms overdue, and the stall is recorded with that stack.
+
+    Top-level windows get an event filter that times each UpdateRequest,
+    which is Qt's repaint pass for a window: painting every dirty widget in
+    it and flushing the result. The filter only notes the start and lets the
+    event through untouched (the app's own filters and event handlers see it
+    as usual); a queued call posted from the filter ends the measurement,
+    since it can only run once that delivery has returned.
+    """
+
+    _paint_done = Signal()
+
+    def __init__(self, app: QApplication, exempt: set[int]):
+        super().__init__()
+        self._app = app
+        self.stall_ms = _STALL_MS
+        self._main_thread = threading.get_ident()
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(_HEARTBEAT_MS)
+        self._timer.timeout.connect(self._beat)
+        # The heartbeat is not app activity for wait_idle.
+        exempt.update((id(self), id(self._timer)))
+        self._windows: dict[int, weakref.ref] = {}
+        # id(window) -> (name, start) of repaints still being delivered
+        self._painting: dict[int, tuple[str, float]] = {}
+        self._paint_done.connect(self._end_paints, Qt.ConnectionType.QueuedConnection)
+        self._stop: threading.Event | None = None
+        self._last = time.perf_counter()
+        # (beat it was taken after, stack), set by the watchdog thread
+        self._sample: tuple[float, list[str]] | None = None
+        self.reset()
+
+    @property
+    def running(self) -> bool:
+        return self._stop is not None
+
+    def reset(self) -> None:
+        self._started = time.perf_counter()
+        self._beats = 0
+        self._lag = _histogram()
+        self._stalls: collections.deque[dict] = collections.deque(maxlen=_MAX_STALLS)
+        self._stall_count = 0
+        self._paints: dict[str, list] = {}
+
+    def start(self) -> None:
+        self._last = time.perf_counter()
+        self._stop = threading.Event()
+        self._scan_windows()
+        self._timer.start()
+        threading.Thread(target=self._watchdog, args=(self._stop,), daemon=True).start()
+
+    def stop(self) -> None:
+        self._timer.stop()
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+        for ref in self._windows.values():
+            window = ref()
+            if window is not None:
+                try:
+                    window.removeEventFilter(self)
+                except RuntimeError:
+                    pass
+        self._windows.clear()
+        self._painting.clear()
+
+    def report(self, histograms: bool = False) -> dict:
+        return {
+            "running": self.running,
+            "seconds": round(time.perf_counter() - self._started, 3),
+            "heartbeat_ms": _HEARTBEAT_MS,
+            "stall_ms": self.stall_ms,
+            "beats": self._beats,
+            "lag_ms": _histogram_summary(self._lag, histograms),
+            "stall_count": self._stall_count,
+            "stalls": list(self._stalls),
+            "windows": {name: {"paints": stat[0], "paint_ms": _histogram_summary(stat, histograms)}
+                        for name, stat in sorted(self._paints.items())},
+        }
+
+    @Slot()
+    def _beat(self) -> None:
+        now = time.perf_counter()
+        last, self._last = self._last, now
+        gap_ms = (now - last) * 1000
+        self._beats += 1
+        _histogram_add(self._lag, max(0.0, gap_ms - _HEARTBEAT_MS))
+        if gap_ms >= self.stall_ms:
+            self._stall_count += 1
+            sample = self._sample
+            self._stalls.append({
+                "at": round(last - self._started, 3),
+                "duration_ms": round(gap_ms, 1),
+                "stack": sample[1] if sample and sample[0] == last else None,
+            })
+        if self._beats % _WINDOW_SCAN_BEATS == 0:
+            self._scan_windows()
+
+    def _watchdog(self, stop: threading.Event) -> None:
+        """Sample the main thread's stack once per overdue heartbeat."""
+        sampled = None
+        while not stop.wait(self.stall_ms / 2000):
+            last = self._last
+            if last == sampled or (time.perf_counter() - last) * 1000 < self.stall_ms:
+                continue
+            frame = sys._current_frames().get(self._main_thread)
+            if frame is None:
+                continue
+            stack = [f"{f.filename}:{f.lineno} in {f.name}"
+                     for f in traceback.extract_stack(frame)[-_STALL_STACK_DEPTH:]]
+            self._sample = (last, stack)
+            sampled = last
+
+    def _scan_windows(self) -> None:
+        for window in self._app.topLevelWidgets():
+            key = id(window)
+            ref = self._windows.get(key)
+            if ref is not None and ref() is window:
+                continue
+            window.installEventFilter(self)
+            try:
+                self._windows[key] = weakref.ref(window)
+            except TypeError:
+                pass
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Type.UpdateRequest and id(watched) not in self._painting:
+            name = watched.objectName() or type(watched).__name__
+            self._painting[id(watched)] = (name, time.perf_counter())
+            self._paint_done.emit()
+        return False
+
+    @Slot()
+    def _end_paints(self) -> None:
+        now = time.perf_counter()
+        for name, start in self._painting.values():
+            stat = self._paints.get(name)
+            if stat is None:
+                stat = self._paints[name] = _histogram()
+            _histogram_add(stat, (now - start) * 1000)
+        self._painting.clear()
+
+
+class _MemoryTracker:
+    """Process RSS, Python allocations and live QObjects, against named baselines.
+
+    A baseline holds the RSS, a tracemalloc snapshot and QObject counts by
+    class. tracemalloc is started when the first baseline is taken, so
+    Python allocations are traced from then on only - enough to diff, and
+    no overhead until asked for. The harness's own allocations are filtered
+    out. Live QObjects are those reachable from the application or a
+    top-level widget; every widget is one of these.
+    """
+
+    def __init__(self, app: QApplication):
+        self._app = app
+        self._baselines: dict[str, dict] = {}
+        self._started = time.monotonic()
+        self._samples: collections.deque[tuple[float, int]] = collections.deque(
+            maxlen=_RSS_SAMPLES)
+        self._sampler: tuple[threading.Event, threading.Thread] | None = None
+
+    def report(self, baseline: str | None, update_baseline: bool, top: int,
+               max_growth: dict[str, int] | None) -> dict:
+        if baseline and not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACE_FRAMES)
+        now = self._measure()
+        result = {
+            "rss_bytes": now["rss_bytes"],
+            "peak_rss_bytes": self._peak_rss(),
+            "python_bytes": now["python_bytes"],
+            "qobjects": now["qobjects"],
+            "widgets": now["widgets"],
+            "classes": dict(now["classes"].most_common(top)),
+        }
+        if self._samples:
+            result["rss_samples"] = [[round(t, 3), rss] for t, rss in self._samples]
+            self._samples.clear()
+        if not baseline:
+            return result
+
+        reference = self._baselines.get(baseline)
+        if reference is None or update_baseline:
+            self._baselines[baseline] = now
+        if reference is None:
+            return {**result, "baseline_saved": baseline}
+
+        growth = {key: now[key] - reference[key]
+                  if now[key] is not None and reference[key] is not None else None
+                  for key in _MEMORY_GROWTH_KEYS}
+        classes = now["classes"].copy()
+        classes.subtract(reference["classes"])
+        changed = sorted((item for item in classes.items() if item[1]),
+                         key=lambda item: (-abs(item[1]), item[0]))
+        result.update(
+            baseline=baseline,
+            seconds=round(now["time"] - reference["time"], 3),
+            growth=growth,
+            classes_growth=dict(changed[:top]),
+        )
+        if now["snapshot"] is not None and reference["snapshot"] is not None:
+            stats = now["snapshot"].compare_to(reference["snapshot"], "lineno")
+            grown = sorted((stat for stat in stats if stat.size_diff > 0),
+                           key=lambda stat: -stat.size_diff)
+            result["allocation_sites"] = [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size_diff": stat.size_diff, "count_diff": stat.count_diff,
+                 "size": stat.size}
+                for stat in grown[:top]
+            ]
+        if max_growth:
+            exceeded = {key: growth[key] for key, limit in max_growth.items()
+                        if growth[key] is not None and growth[key] > limit}
+            result.update(bounded=not exceeded, exceeded=exceeded)
+        return result
+
+    def sample_every(self, interval_ms: float) -> None:
+        """Record RSS every interval_ms on a background thread; 0 stops."""
+        if self._sampler is not None:
+            stop, thread = self._sampler
+            stop.set()
+            thread.join()
+            self._sampler = None
+        if interval_ms > 0:
+            stop = threading.Event()
+            thread = threading.Thread(target=self._sample_loop, args=(stop, interval_ms / 1000),
+                                      daemon=True)
+            thread.start()
+            self._sampler = (stop, thread)
+
+    def _sample_loop(self, stop: threading.Event, interval: float) -> None:
+        while not stop.wait(interval):
+            rss = self._rss()
+            if rss is not None:
+                self._samples.append((time.monotonic() - self._started, rss))
+
+    def _measure(self) -> dict:
+        # Objects already released but not yet freed would read as leaks.
+        QCoreApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+        gc.collect()
+        snapshot = None
+        python_bytes = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ))
+            python_bytes = sum(stat.size for stat in snapshot.statistics("filename"))
+        classes: collections.Counter[str] = collections.Counter()
+        seen: set[int] = set()
+        objects = []  # keeps wrappers alive so their ids stay unique while counting
+        for root in (self._app, *self._app.topLevelWidgets()):
+            for obj in (root, *root.findChildren(QObject)):
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    objects.append(obj)
+                    classes[type(obj).__name__] += 1
+        return {
+            "time": time.monotonic(),
+            "rss_bytes": self._rss(),
+            "python_bytes": python_bytes,
+            "qobjects": len(objects),
+            "widgets": len(self._app.allWidgets()),
+            "classes": classes,
+            "snapshot": snapshot,
+        }
+
+    @staticmethod
+    def _rss() -> int | None:
+        """Current resident set size in bytes (None where /proc is missing)."""
+        try:
+            with open("/proc/self/statm", "rb") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    @staticmethod
+    def _peak_rss() -> int:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, else KiB
+
+
 class CommandHandler:
     """Handles commands from the MCP server."""
 
     def __init__(self, app: QApplication):
         self.app = app
+        self.index = _ObjectIndex(app)
+        # list_all_widgets snapshots: version -> (include_invisible, records by
+        # id), plus per include_invisible the latest (version, index.changes).
+        self._snapshots: collections.OrderedDict[int, tuple[bool, dict[str, dict]]] = (
+            collections.OrderedDict()
+        )
+        self._latest_snapshot: dict[bool, tuple[int, int]] = {}
+        self._snapshot_versions = itertools.count(1)
+        # Last screenshot fingerprint per capture target, and named baselines
+        # (capture_screenshot if_changed, visual_diff).
+        self._frames: collections.OrderedDict[str, dict] = collections.OrderedDict()
+        self._baselines: dict[str, dict] = {}
+        # Set by CommandDispatcher: serves queued read-only commands from
+        # inside a long-running handler, independent of whether the event
+        # loop happens to deliver a dispatcher wakeup mid-handler.
+        self.pipeline_hook: Callable[[], None] | None = None
+        self.metrics = _CommandMetrics()
+        # Created by the first responsiveness command (or --profile).
+        self.profiler: _ResponsivenessProfiler | None = None
+        # Created by the first memory command.
+        self.memory: _MemoryTracker | None = None
+        # Seconds spent in processEvents by the running handler (the
+        # dispatcher saves and restores it around re-entrant commands).
+        self.process_events_time = 0.0
 
     def handle(self, command: dict) -> dict:
         """Dispatch command to appropriate handler."""
@@ -144,6 +1233,7 @@ class CommandHandler:
         handlers = {
             "ping": self._handle_ping,
             "screenshot": self._handle_screenshot,
+            "visual_diff": self._handle_visual_diff,
             "click": self._handle_click,
             "click_at": self._handle_click_at,
             "hover": self._handle_hover,
@@ -152,9 +1242,16 @@ class CommandHandler:
             "find_widgets": self._handle_find_widgets,
             "list_all_widgets": self._handle_list_all_widgets,
             "get_widget_info": self._handle_get_widget_info,
+            "get_model_data": self._handle_get_model_data,
             "trigger_action": self._handle_trigger_action,
             "list_actions": self._handle_list_actions,
             "wait_idle": self._handle_wait_idle,
+            "wait_for_widget": self._handle_wait_for_widget,
+            "wait_for_property": self._handle_wait_for_property,
+            "run_sequence": self._handle_run_sequence,
+            "get_metrics": self._handle_get_metrics,
+            "responsiveness": self._handle_responsiveness,
+            "memory": self._handle_memory,
             "quit": self._handle_quit,
         }
 
@@ -171,61 +1268,312 @@ class CommandHandler:
         """Simple ping to check if harness is running."""
         return {"success": True, "message": "pong"}
 
+    def _handle_get_metrics(self, cmd: dict) -> dict:
+        """Per-command timings since start or the last reset.
+
+        `stream_to` starts appending one JSON line per command to that file
+        ("" stops); `reset` clears the histograms after reporting them.
+        """
+        if "stream_to" in cmd:
+            self.metrics.stream_to(cmd["stream_to"] or None)
+        report = self.metrics.report(histograms=bool(cmd.get("histograms")))
+        if cmd.get("histograms"):
+            report["bucket_bounds_ms"] = list(_METRIC_BUCKETS_MS)
+        if cmd.get("reset"):
+            self.metrics.reset()
+        return {"success": True, **report, "stream_to": self.metrics.stream_path}
+
+    def _handle_responsiveness(self, cmd: dict) -> dict:
+        """Report the app's event-loop lag, stalls and repaint times.
+
+        The profiler starts on the first call (reporting nothing yet) unless
+        `stop` is given; `stall_ms` sets the stall threshold, `stop` ends
+        profiling and `reset` clears the data, both after reporting.
+        """
+        if self.profiler is None:
+            self.profiler = _ResponsivenessProfiler(self.app, self.index.exempt)
+        profiler = self.profiler
+        if cmd.get("stall_ms") is not None:
+            stall_ms = float(cmd["stall_ms"])
+            if stall_ms <= _HEARTBEAT_MS:
+                return {"success": False,
+                        "error": f"stall_ms must exceed the {_HEARTBEAT_MS} ms heartbeat"}
+            profiler.stall_ms = stall_ms
+        started = not profiler.running and not cmd.get("stop")
+        if started:
+            profiler.reset()
+            profiler.start()
+        report = profiler.report(histograms=bool(cmd.get("histograms")))
+        if cmd.get("histograms"):
+            report["bucket_bounds_ms"] = list(_METRIC_BUCKETS_MS)
+        if cmd.get("stop"):
+            profiler.stop()
+        if cmd.get("reset"):
+            profiler.reset()
+        return {"success": True, "started": started, **report}
+
+    def _handle_memory(self, cmd: dict) -> dict:
+        """Report memory use, and its growth since a named baseline.
+
+        The first call with a new `baseline` name stores the current state
+        under it (`update_baseline` replaces it after comparing). `top` caps
+        each list; `max_growth` maps growth keys to limits and adds
+        "bounded"; `sample_ms` starts (0 stops) background RSS sampling.
+        """
+        max_growth = cmd.get("max_growth") or None
+        unknown = sorted(set(max_growth or ()) - set(_MEMORY_GROWTH_KEYS))
+        if unknown:
+            return {"success": False,
+                    "error": f"Unknown max_growth keys: {', '.join(unknown)} "
+                             f"(expected some of {', '.join(_MEMORY_GROWTH_KEYS)})"}
+        if max_growth and not cmd.get("baseline"):
+            return {"success": False, "error": "max_growth needs a baseline"}
+        if self.memory is None:
+            self.memory = _MemoryTracker(self.app)
+        if cmd.get("sample_ms") is not None:
+            self.memory.sample_every(float(cmd["sample_ms"]))
+        report = self.memory.report(cmd.get("baseline"), bool(cmd.get("update_baseline")),
+                                    int(cmd.get("top", 10)), max_growth)
+        return {"success": True, **report}
+
+    def _process_events(self) -> None:
+        """app.processEvents(), timed for the command metrics."""
+        start = time.perf_counter()
+        self.app.processEvents()
+        self.process_events_time += time.perf_counter() - start
+
     def _handle_screenshot(self, cmd: dict) -> dict:
-        """Capture screenshot of the application."""
+        """Capture the application, one widget, or a region of either.
+
+        `widget_name`/`selector` captures that widget; `region` crops, in the
+        widget's coordinates or, without a widget, the screen's. `scale` and
+        `max_size` shrink the image, `format`/`quality` pick the encoding,
+        and `inline` returns the bytes base64-encoded instead of writing
+        `path`.
+        """
         output_path = cmd.get("path", "/tmp/screenshot.png")
+        # Without a format, the path's extension picks it, as QPixmap.save does.
+        fmt = str(cmd.get("format") or Path(output_path).suffix.lstrip(".") or "png").lower()
+        fmt = "jpeg" if fmt == "jpg" else fmt
+        if "format" not in cmd and fmt not in _SCREENSHOT_FORMATS:
+            fmt = "png"
+        if fmt not in _SCREENSHOT_FORMATS:
+            return {"success": False, "error": f"Unknown format: {fmt} "
+                    f"(expected one of {', '.join(_SCREENSHOT_FORMATS)})"}
+        if fmt != "png" and fmt.encode() not in {
+                bytes(f) for f in QImageWriter.supportedImageFormats()}:
+            return {"success": False, "error": f"This Qt build cannot write {fmt}"}
+        captured = self._capture(cmd)
+        if isinstance(captured, str):
+            return {"success": False, "error": captured}
+        pixmap, method = captured
+
+        if cmd.get("if_changed"):
+            key = self._capture_key(cmd)
+            fingerprint = _fingerprint(pixmap.toImage())
+            previous = self._frames.get(key)
+            self._remember_frame(key, fingerprint)
+            if previous is not None and not _compare_fingerprints(previous, fingerprint)["changed"]:
+                return {"success": True, "unchanged": True, "method": method,
+                        "width": pixmap.width(), "height": pixmap.height()}
+
+        pixmap = self._scale_pixmap(pixmap, cmd.get("scale"), cmd.get("max_size"))
+        quality = cmd.get("quality", -1)
+        result = {"success": True, "method": method, "format": fmt,
+                  "width": pixmap.width(), "height": pixmap.height()}
+        if cmd.get("inline"):
+            buffer = QBuffer()
+            buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+            if not pixmap.save(buffer, fmt.upper(), quality):
+                return {"success": False, "error": "Failed to encode screenshot"}
+            data = bytes(buffer.data())
+            return {**result, "bytes": len(data), "data": base64.b64encode(data).decode("ascii")}
+
+        if pixmap.save(output_path, fmt.upper(), quality):
+            return {**result, "path": output_path}
+        else:
+            return {"success": False, "error": "Failed to save screenshot"}
 
+    def _handle_visual_diff(self, cmd: dict) -> dict:
+        """Compare a capture with the target's previous one or a named baseline.
+
+        The target is given as for screenshot (widget_name/selector, region).
+        Changed areas come back as rectangles of whole tiles in the capture's
+        pixels, `diff_ratio` is the share of the image they cover. With no
+        previous frame (or a new baseline name) the capture becomes the
+        reference and `changed` is null.
+        """
+        captured = self._capture(cmd)
+        if isinstance(captured, str):
+            return {"success": False, "error": captured}
+        pixmap, method = captured
+        key = self._capture_key(cmd)
+        fingerprint = _fingerprint(pixmap.toImage())
+        baseline = cmd.get("baseline")
+        if baseline:
+            reference = self._baselines.get(baseline)
+            if reference is None or cmd.get("update_baseline"):
+                self._baselines[baseline] = fingerprint
+        else:
+            reference = self._frames.get(key)
+        self._remember_frame(key, fingerprint)
+
+        result = {"success": True, "compared_to": "baseline" if baseline else "previous",
+                  "method": method, "width": fingerprint["width"],
+                  "height": fingerprint["height"]}
+        if reference is None:
+            return {**result, "compared_to": None, "changed": None,
+                    "message": f"No {'baseline ' + baseline if baseline else 'previous capture'}"
+                               f"; this capture is now the reference"}
+        return {**result, **_compare_fingerprints(reference, fingerprint)}
+
+    def _capture(self, cmd: dict) -> tuple[QPixmap, str] | str:
+        """(pixmap, method) for a screenshot/visual_diff command's target, or an error."""
+        region = cmd.get("region")
+        if region is not None:
+            try:
+                region = QRect(int(region["x"]), int(region["y"]),
+                               int(region["width"]), int(region["height"]))
+            except (KeyError, TypeError, ValueError):
+                return "region must be {x, y, width, height}"
+
+        if self._target_label(cmd):
+            widget = self._target_widget(cmd)
+            if not widget:
+                return f"Widget not found: {self._target_label(cmd)}"
+            pixmap = widget.grab(region) if region is not None else widget.grab()
+            return pixmap, "widget_grab"
+        return self._grab_screen(region)
+
+    @staticmethod
+    def _capture_key(cmd: dict) -> str:
+        """Identifies a capture target, for remembering its last fingerprint."""
+        return json.dumps([cmd.get("selector"), cmd.get("widget_name"), cmd.get("region")],
+                          sort_keys=True)
+
+    def _remember_frame(self, key: str, fingerprint: dict) -> None:
+        self._frames[key] = fingerprint
+        self._frames.move_to_end(key)
+        while len(self._frames) > _FINGERPRINT_HISTORY:
+            self._frames.popitem(last=False)
+
+    def _grab_screen(self, region: QRect | None) -> tuple[QPixmap, str] | str:
+        """(pixmap, method) of the active window, modal dialog or screen; or an error.
+
+        With `region` (screen coordinates), just that rectangle of the screen.
+        """
         # Get the primary screen
         screen = QGuiApplication.primaryScreen()
         if not screen:
-            return {"success": False, "error": "No screen available"}
+            return "No screen available"
 
         # Find visible windows and get the active/topmost one
         windows = self.app.topLevelWidgets()
         visible_windows = [w for w in windows if w.isVisible()]
 
-        # Try to find the active window first (most likely the dialog on top)
-        active_window = self.app.activeWindow()
-
-        if active_window and active_window.isVisible():
-            # Grab the active window (typically the topmost dialog)
-            pixmap = screen.grabWindow(active_window.winId())
-        elif visible_windows:
-            # Sort by whether they're modal dialogs (dialogs on top)
-            # Modal dialogs should be captured preferentially
-            dialogs = [w for w in visible_windows if w.isModal()]
-            if dialogs:
-                pixmap = screen.grabWindow(dialogs[-1].winId())
-            else:
-                # Grab entire screen to capture all windows
-                pixmap = screen.grabWindow(0)
-        else:
-            # Grab entire screen
-            pixmap = screen.grabWindow(0)
-
-        if pixmap.save(output_path):
-            return {"success": True, "path": output_path}
+        # Try to find the active window first (most likely the dialog on top);
+        # otherwise prefer a modal dialog, else capture the whole screen
+        target = None
+        if region is None:
+            active_window = self.app.activeWindow()
+            if active_window and active_window.isVisible():
+                target = active_window
+            elif visible_windows:
+                dialogs = [w for w in visible_windows if w.isModal()]
+                if dialogs:
+                    target = dialogs[-1]
+
+        if region is not None:
+            pixmap = screen.grabWindow(0, region.x(), region.y(), region.width(),
+                                       region.height())
         else:
-            return {"success": False, "error": "Failed to save screenshot"}
+            pixmap = screen.grabWindow(target.winId() if target else 0)
+        if not pixmap.isNull():
+            return pixmap, "grabWindow"
+
+        # Platforms without a framebuffer (QT_QPA_PLATFORM=minimal) can't
+        # grab from the screen; render the widgets themselves instead
+        pixmap = self._grab_widgets(target, visible_windows)
+        if pixmap is None:
+            return "No visible window to capture"
+        if region is not None:
+            pixmap = pixmap.copy(region.translated(-self._windows_origin(visible_windows)))
+        return pixmap, "widget_grab"
+
+    @staticmethod
+    def _scale_pixmap(pixmap: QPixmap, scale: float | None, max_size: int | None) -> QPixmap:
+        """Shrink by `scale`, then so neither side exceeds `max_size`; never enlarges."""
+        width, height = pixmap.width(), pixmap.height()
+        if scale is not None and 0 < scale < 1:
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        if max_size is not None and max_size > 0 and max(width, height) > max_size:
+            ratio = max_size / max(width, height)
+            width, height = max(1, round(width * ratio)), max(1, round(height * ratio))
+        if (width, height) == (pixmap.width(), pixmap.height()):
+            return pixmap
+        return pixmap.scaled(width, height, Qt.AspectRatioMode.IgnoreAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+
+    @staticmethod
+    def _windows_origin(windows: list[QWidget]) -> QPoint:
+        """Top-left of the union of the windows' geometries (see _grab_widgets)."""
+        bounds = windows[0].geometry()
+        for window in windows[1:]:
+            bounds = bounds.united(window.geometry())
+        return bounds.topLeft()
+
+    @staticmethod
+    def _grab_widgets(target: QWidget | None, windows: list[QWidget]) -> QPixmap | None:
+        """Render target, or all windows composed at their positions, via QWidget.grab()."""
+        if target is not None:
+            return target.grab()
+        if not windows:
+            return None
+        bounds = windows[0].geometry()
+        for window in windows[1:]:
+            bounds = bounds.united(window.geometry())
+        pixmap = QPixmap(bounds.size())
+        pixmap.fill(Qt.GlobalColor.black)
+        painter = QPainter(pixmap)
+        try:
+            for window in windows:
+                painter.drawPixmap(window.geometry().topLeft() - bounds.topLeft(), window.grab())
+        finally:
+            painter.end()
+        return pixmap
 
     def _find_widget(self, name: str) -> QWidget | None:
         """Find a widget by its object name."""
-        for window in self.app.topLevelWidgets():
-            if window.objectName() == name:
-                return window
-            widget = window.findChild(QWidget, name)
-            if widget:
-                return widget
-        return None
+        if not name:
+            return None
+        return self.index.widget(name)
+
+    def _target_widget(self, cmd: dict, rebuild: bool = True) -> QWidget | None:
+        """The widget a command addresses: first `selector` match, else `widget_name`.
+
+        rebuild=False skips the index's full walk on a name miss (see
+        _ObjectIndex.widget).
+        """
+        selector = cmd.get("selector")
+        if selector:
+            matches = _compile_selector(selector).select(
+                self.app, lambda name: self.index.widget(name, rebuild=rebuild))
+            return next(matches, None)
+        name = cmd.get("widget_name")
+        return self.index.widget(name, rebuild=rebuild) if name else None
+
+    @staticmethod
+    def _target_label(cmd: dict) -> str | None:
+        """How a command's target is named in errors."""
+        return cmd.get("selector") or cmd.get("widget_name")
 
     def _handle_click(self, cmd: dict) -> dict:
-        """Click a widget by name."""
-        widget_name = cmd.get("widget_name")
+        """Click a widget by name or selector."""
         button_str = cmd.get("button", "left")
 
-        widget = self._find_widget(widget_name)
+        widget = self._target_widget(cmd)
         if not widget:
-            return {"success": False, "error": f"Widget not found: {widget_name}"}
+            return {"success": False, "error": f"Widget not found: {self._target_label(cmd)}"}
 
         # Map button string to Qt enum
         button_map = {
@@ -236,13 +1584,13 @@ class CommandHandler:
         button = button_map.get(button_str, Qt.MouseButton.LeftButton)
 
         # Process pending events first
-        self.app.processEvents()
+        self._process_events()
 
         # Perform click
         QTest.mouseClick(widget, button)
 
         # Process events to handle the click
-        self.app.processEvents()
+        self._process_events()
 
         return {"success": True}
 
@@ -272,44 +1620,42 @@ class CommandHandler:
         local_pos = widget.mapFromGlobal(global_pos)
 
         # Process pending events
-        self.app.processEvents()
+        self._process_events()
 
         # Perform click at the specific position
         QTest.mouseClick(widget, button, Qt.KeyboardModifier.NoModifier, local_pos)
 
         # Process events
-        self.app.processEvents()
+        self._process_events()
 
         return {"success": True, "widget_type": widget.__class__.__name__}
 
     def _handle_hover(self, cmd: dict) -> dict:
-        """Hover over a widget by name."""
-        widget_name = cmd.get("widget_name")
-
-        widget = self._find_widget(widget_name)
+        """Hover over a widget by name or selector."""
+        widget = self._target_widget(cmd)
         if not widget:
-            return {"success": False, "error": f"Widget not found: {widget_name}"}
+            return {"success": False, "error": f"Widget not found: {self._target_label(cmd)}"}
 
         # Process pending events
-        self.app.processEvents()
+        self._process_events()
 
         # Move mouse to widget center
         QTest.mouseMove(widget)
 
         # Process events
-        self.app.processEvents()
+        self._process_events()
 
         return {"success": True}
 
     def _handle_type_text(self, cmd: dict) -> dict:
         """Type text into a widget."""
         text = cmd.get("text", "")
-        widget_name = cmd.get("widget_name")
+        target = self._target_label(cmd)
 
-        if widget_name:
-            widget = self._find_widget(widget_name)
+        if target:
+            widget = self._target_widget(cmd)
             if not widget:
-                return {"success": False, "error": f"Widget not found: {widget_name}"}
+                return {"success": False, "error": f"Widget not found: {target}"}
         else:
             # Use focused widget
             widget = self.app.focusWidget()
@@ -317,13 +1663,13 @@ class CommandHandler:
                 return {"success": False, "error": "No focused widget"}
 
         # Process pending events
-        self.app.processEvents()
+        self._process_events()
 
         # Type the text
         QTest.keyClicks(widget, text)
 
         # Process events
-        self.app.processEvents()
+        self._process_events()
 
         return {"success": True}
 
@@ -372,78 +1718,238 @@ class CommandHandler:
             return {"success": False, "error": "No widget to send key to"}
 
         # Process pending events
-        self.app.processEvents()
+        self._process_events()
 
         # Press the key
         QTest.keyClick(widget, key, mod_flags)
 
         # Process events
-        self.app.processEvents()
+        self._process_events()
 
         return {"success": True}
 
     def _handle_find_widgets(self, cmd: dict) -> dict:
-        """Find all widgets matching a pattern."""
+        """Find all widgets matching a pattern.
+
+        Filters, `fields` and `limit`/`cursor` work as for list_all_widgets;
+        only named widgets match, first one per name.
+        """
         pattern = cmd.get("pattern", "*")
+        if cmd.get("fields") or any(cmd.get(key) is not None for key in _WIDGET_QUERY_KEYS):
+            return self._query_widgets(
+                _WidgetQuery(cmd, _FIND_WIDGET_FIELDS, include_invisible=True), pattern)
+
         widgets = []
+        seen: set[str] = set()
 
-        def collect_widgets(widget: QWidget):
-            """Recursively collect named widgets."""
-            name = widget.objectName()
-            if name and fnmatch.fnmatch(name, pattern):
+        # findChildren is already recursive: one flat pass per window, with a
+        # set (not a scan of `widgets`) to keep the first widget per name.
+        for window in self.app.topLevelWidgets():
+            for widget in [window, *window.findChildren(QWidget)]:
+                name = widget.objectName()
+                if not name or name in seen or not fnmatch.fnmatch(name, pattern):
+                    continue
+                seen.add(name)
                 widgets.append({
                     "name": name,
                     "type": widget.__class__.__name__,
                     "visible": widget.isVisible(),
                     "enabled": widget.isEnabled(),
                 })
-            for child in widget.findChildren(QWidget):
-                name = child.objectName()
-                if name and fnmatch.fnmatch(name, pattern):
-                    # Avoid duplicates
-                    if not any(w["name"] == name for w in widgets):
-                        widgets.append({
-                            "name": name,
-                            "type": child.__class__.__name__,
-                            "visible": child.isVisible(),
-                            "enabled": child.isEnabled(),
-                        })
-
-        for window in self.app.topLevelWidgets():
-            collect_widgets(window)
 
         return {"success": True, "widgets": widgets}
 
     def _handle_list_all_widgets(self, cmd: dict) -> dict:
-        """List all widgets with their coordinates (even unnamed ones)."""
+        """List all widgets with their coordinates (even unnamed ones).
+
+        Every reply carries a snapshot `version`. Passing it back as
+        `changes_since` returns only widgets added, removed or changed since
+        then; an unknown (evicted) version gets a full listing, `full: true`.
+
+        `types`, `region`, `max_depth`, `visible`, `enabled` and `root` filter
+        the walk (pruning subtrees that can't match) and `limit` pages it:
+        the reply's `next_cursor` is passed back as `cursor` for the next
+        page. Filtered and paged listings are not snapshots and carry no
+        `version`. `fields` trims every record to the named keys.
+        """
         include_invisible = cmd.get("include_invisible", False)
-        widgets = []
+        since = cmd.get("changes_since")
+        if any(cmd.get(key) is not None for key in _WIDGET_QUERY_KEYS):
+            if since is not None:
+                return {"success": False,
+                        "error": "changes_since cannot be combined with filters or paging"}
+            return self._query_widgets(_WidgetQuery(cmd, _WIDGET_FIELDS, include_invisible))
+
+        fields = cmd.get("fields")
+        if fields:
+            # Validates the names; the snapshot itself always holds every field.
+            _WidgetQuery({"fields": fields}, _WIDGET_FIELDS, include_invisible)
+        project = (lambda record: {k: v for k, v in record.items() if k in fields}) if fields \
+            else None
+        version, records = self._widget_snapshot(include_invisible, reuse=since is not None)
+
+        previous = self._snapshots.get(since)
+        if previous is None or previous[0] != include_invisible:
+            widgets = list(records.values())
+            if project:
+                widgets = [project(r) for r in widgets]
+            result = {"success": True, "widgets": widgets, "count": len(widgets),
+                      "version": version}
+            if since is not None:
+                result["full"] = True
+            return result
+
+        old = previous[1]
+        if old is records:
+            return {"success": True, "version": version, "since": since, "full": False,
+                    "added": [], "removed": [], "changed": [], "count": len(records)}
+        added = [r for key, r in records.items() if key not in old]
+        changed = [r for key, r in records.items() if key in old and old[key] != r]
+        if project:
+            added, changed = [project(r) for r in added], [project(r) for r in changed]
+        return {
+            "success": True,
+            "version": version,
+            "since": since,
+            "full": False,
+            "added": added,
+            "removed": [key for key in old if key not in records],
+            "changed": changed,
+            "count": len(records),
+        }
+
+    def _query_widgets(self, query: _WidgetQuery, name_pattern: str | None = None) -> dict:
+        """One page of a filtered depth-first walk (find_widgets passes its name pattern).
+
+        The walk stops at the first match past the page, so listing a page
+        of a large tree costs about as much as the pages before it.
+        """
+        if query.root is not None:
+            root = self._find_widget(query.root)
+            if not root:
+                return {"success": False, "error": f"Widget not found: {query.root}"}
+            roots = [root]
+        else:
+            roots = self.app.topLevelWidgets()
+
+        changes = self.index.changes
+        end = None if query.limit is None else query.offset + query.limit
+        widgets: list[dict] = []
+        seen: set[str] = set()
+        matched = 0
+        more = False
+        stack = [(widget, 0) for widget in reversed(roots)]
+        while stack:
+            widget, depth = stack.pop()
+            rect = None
+            if query.region is not None or {"global_x", "global_y"} & query.fields:
+                rect = self._global_rect(widget)
+            if query.prunes(widget, depth, rect):
+                continue
+            if query.matches(widget):
+                name = widget.objectName()
+                if name_pattern is None or (name and name not in seen
+                                            and fnmatch.fnmatch(name, name_pattern)):
+                    if name_pattern is not None:
+                        seen.add(name)
+                    if end is not None and matched >= end:
+                        more = True
+                        break
+                    if matched >= query.offset:
+                        widgets.append(self._widget_record(widget, depth, query.fields, rect))
+                    matched += 1
+            if query.max_depth is None or depth < query.max_depth:
+                children = [child for child in widget.children() if isinstance(child, QWidget)]
+                stack.extend((child, depth + 1) for child in reversed(children))
+
+        first_changes = changes if query.changes is None else query.changes
+        result = {"success": True, "widgets": widgets, "count": len(widgets),
+                  "next_cursor": f"{matched}:{first_changes}" if more else None}
+        if query.changes is not None:
+            # Widgets were added or removed since the first page: offsets may
+            # have shifted, so a page can repeat or skip entries.
+            result["tree_changed"] = query.changes != changes
+        return result
+
+    @staticmethod
+    def _global_rect(widget: QWidget) -> tuple[int, int, int, int]:
+        """(left, top, right, bottom) of the widget in screen coordinates."""
+        try:
+            pos = widget.mapToGlobal(widget.rect().topLeft())
+            x, y = pos.x(), pos.y()
+        except Exception:
+            x, y = 0, 0
+        geom = widget.geometry()
+        return x, y, x + geom.width(), y + geom.height()
+
+    @staticmethod
+    def _widget_record(widget: QWidget, depth: int, fields: frozenset[str],
+                       rect: tuple[int, int, int, int] | None = None) -> dict:
+        """The widget's record, computing only the requested fields."""
+        record: dict = {}
+        if "id" in fields:
+            record["id"] = f"{id(widget):x}"
+        if "name" in fields:
+            record["name"] = widget.objectName() or "(unnamed)"
+        if "type" in fields:
+            record["type"] = widget.__class__.__name__
+        if "visible" in fields:
+            record["visible"] = widget.isVisible()
+        if "enabled" in fields:
+            record["enabled"] = widget.isEnabled()
+        if not fields.isdisjoint(("x", "y", "width", "height")):
+            geom = widget.geometry()
+            for key, value in (("x", geom.x()), ("y", geom.y()),
+                               ("width", geom.width()), ("height", geom.height())):
+                if key in fields:
+                    record[key] = value
+        if "global_x" in fields or "global_y" in fields:
+            gx, gy = (rect or CommandHandler._global_rect(widget))[:2]
+            if "global_x" in fields:
+                record["global_x"] = gx
+            if "global_y" in fields:
+                record["global_y"] = gy
+        if "depth" in fields:
+            record["depth"] = depth
+        if "text" in fields and hasattr(widget, "text"):
+            record["text"] = widget.text()
+        return record
+
+    def _widget_snapshot(self, include_invisible: bool, reuse: bool) -> tuple[int, dict]:
+        """Current (version, records); the version only moves when they differ.
+
+        With `reuse`, a snapshot taken since the last tree-changing event is
+        returned without walking the tree at all.
+        """
+        latest = self._latest_snapshot.get(include_invisible)
+        if latest and latest[0] not in self._snapshots:
+            latest = None
+        if reuse and latest and latest[1] == self.index.changes:
+            return latest[0], self._snapshots[latest[0]][1]
+
+        changes = self.index.changes
+        records = self._collect_widget_records(include_invisible)
+        if latest and self._snapshots[latest[0]][1] == records:
+            version = latest[0]
+        else:
+            version = next(self._snapshot_versions)
+            self._snapshots[version] = (include_invisible, records)
+            while len(self._snapshots) > _SNAPSHOT_HISTORY:
+                self._snapshots.popitem(last=False)
+        self._latest_snapshot[include_invisible] = (version, changes)
+        return version, records
+
+    def _collect_widget_records(self, include_invisible: bool) -> dict[str, dict]:
+        """Walk the widget tree into {id: record}, in depth-first order."""
+        records: dict[str, dict] = {}
 
         def collect_all(widget: QWidget, depth: int = 0):
             """Recursively collect all widgets."""
             if not include_invisible and not widget.isVisible():
                 return
 
-            geom = widget.geometry()
-            try:
-                global_pos = widget.mapToGlobal(widget.rect().topLeft())
-                gx, gy = global_pos.x(), global_pos.y()
-            except Exception:
-                gx, gy = 0, 0
-
-            widgets.append({
-                "name": widget.objectName() or "(unnamed)",
-                "type": widget.__class__.__name__,
-                "visible": widget.isVisible(),
-                "enabled": widget.isEnabled(),
-                "x": geom.x(),
-                "y": geom.y(),
-                "width": geom.width(),
-                "height": geom.height(),
-                "global_x": gx,
-                "global_y": gy,
-                "depth": depth,
-            })
+            record = self._widget_record(widget, depth, _ALL_WIDGET_FIELDS)
+            records[record["id"]] = record
 
             for child in widget.children():
                 if isinstance(child, QWidget):
@@ -453,7 +1959,7 @@ class CommandHandler:
             if include_invisible or window.isVisible():
                 collect_all(window)
 
-        return {"success": True, "widgets": widgets, "count": len(widgets)}
+        return records
 
     def _handle_trigger_action(self, cmd: dict) -> dict:
         """Trigger a QAction by its object name."""
@@ -462,7 +1968,15 @@ class CommandHandler:
         if not action_name:
             return {"success": False, "error": "action_name is required"}
 
-        # Search for the action in all windows and menus
+        action = self.index.action(action_name)
+        if action:
+            self._process_events()
+            action.trigger()
+            self._process_events()
+            return {"success": True, "action": action_name}
+
+        # Not parented under any window (e.g. a parentless QAction added to a
+        # menu) - fall back to walking the menus and widget action lists.
         def find_action(widget) -> QAction | None:
             """Recursively find action by name."""
             # Check direct actions
@@ -496,17 +2010,17 @@ class CommandHandler:
                 if menubar:
                     action = find_action(menubar)
                     if action:
-                        self.app.processEvents()
+                        self._process_events()
                         action.trigger()
-                        self.app.processEvents()
+                        self._process_events()
                         return {"success": True, "action": action_name}
 
             # Check the window itself
             action = find_action(window)
             if action:
-                self.app.processEvents()
+                self._process_events()
                 action.trigger()
-                self.app.processEvents()
+                self._process_events()
                 return {"success": True, "action": action_name}
 
         return {"success": False, "error": f"Action not found: {action_name}"}
@@ -552,11 +2066,9 @@ class CommandHandler:
 
     def _handle_get_widget_info(self, cmd: dict) -> dict:
         """Get detailed info about a widget."""
-        widget_name = cmd.get("widget_name")
-
-        widget = self._find_widget(widget_name)
+        widget = self._target_widget(cmd)
         if not widget:
-            return {"success": False, "error": f"Widget not found: {widget_name}"}
+            return {"success": False, "error": f"Widget not found: {self._target_label(cmd)}"}
 
         # Get geometry
         geom = widget.geometry()
@@ -586,23 +2098,287 @@ class CommandHandler:
 
         return {"success": True, "info": info}
 
+    def _handle_get_model_data(self, cmd: dict) -> dict:
+        """Read a page of the item model behind a view: rows x columns x roles.
+
+        Only the page's cells are read, so a page of a 100k-row model costs
+        what a page of a small one does; models that load lazily
+        (canFetchMore) are fetched just far enough to cover it. `parent` is
+        a path of row numbers into a tree model. The reply's `hash` covers
+        the page; sent back as `if_hash`, an unchanged page is answered with
+        `unchanged: true` and no rows.
+        """
+        widget = self._target_widget(cmd)
+        if not widget:
+            return {"success": False, "error": f"Widget not found: {self._target_label(cmd)}"}
+        model = widget.model() if callable(getattr(widget, "model", None)) else None
+        if model is None:
+            return {"success": False,
+                    "error": f"{self._target_label(cmd)} ({widget.__class__.__name__}) "
+                             f"has no item model"}
+
+        role_names = cmd.get("roles") or ["display"]
+        roles = []
+        for name in role_names:
+            if isinstance(name, int) and not isinstance(name, bool):
+                roles.append(name)
+            elif name in _ITEM_ROLES:
+                roles.append(_ITEM_ROLES[name])
+            else:
+                return {"success": False, "error": f"Unknown role: {name} (expected an "
+                        f"integer or one of {', '.join(_ITEM_ROLES)})"}
+        start = cmd.get("row", 0)
+        count = cmd.get("row_count", _MODEL_PAGE_ROWS)
+        if not isinstance(start, int) or start < 0:
+            return {"success": False, "error": "row must be a non-negative integer"}
+        if not isinstance(count, int) or not 1 <= count <= _MODEL_MAX_PAGE_ROWS:
+            return {"success": False,
+                    "error": f"row_count must be between 1 and {_MODEL_MAX_PAGE_ROWS}"}
+
+        parent = QModelIndex()
+        for depth, row in enumerate(cmd.get("parent") or []):
+            parent = model.index(row, 0, parent)
+            if not parent.isValid():
+                return {"success": False, "error": f"No row {row} at parent depth {depth}"}
+
+        end = start + count
+        while model.rowCount(parent) < end and model.canFetchMore(parent):
+            model.fetchMore(parent)
+        row_count = model.rowCount(parent)
+        column_count = model.columnCount(parent)
+        columns = cmd.get("columns")
+        if columns is None:
+            columns = list(range(column_count))
+        elif any(not isinstance(c, int) or not 0 <= c < column_count for c in columns):
+            return {"success": False,
+                    "error": f"columns must be between 0 and {column_count - 1}"}
+        end = min(end, row_count)
+
+        rows = []
+        for row in range(start, end):
+            cells = []
+            for column in columns:
+                index = model.index(row, column, parent)
+                if len(roles) == 1:
+                    cells.append(_item_value(model.data(index, roles[0]), roles[0]))
+                else:
+                    cells.append({str(name): _item_value(model.data(index, role), role)
+                                  for name, role in zip(role_names, roles)})
+            rows.append(cells)
+        headers = [_item_value(model.headerData(column, Qt.Orientation.Horizontal,
+                                                Qt.ItemDataRole.DisplayRole))
+                   for column in columns]
+        page = json.dumps([start, columns, role_names, headers, rows], separators=(",", ":"))
+        digest = hashlib.blake2b(page.encode(), digest_size=8).hexdigest()
+
+        more = model.canFetchMore(parent)
+        result = {
+            "success": True,
+            "model": model.__class__.__name__,
+            "row_count": row_count,
+            "column_count": column_count,
+            "start_row": start,
+            "next_row": end if end < row_count or more else None,
+            "can_fetch_more": more,
+            "hash": digest,
+        }
+        if cmd.get("if_hash") == digest:
+            result["unchanged"] = True
+            return result
+        result.update(columns=columns, headers=headers, rows=rows)
+        # rowCount, not hasChildren: table models make hasChildren private
+        has_children = [model.rowCount(model.index(row, 0, parent)) > 0
+                        for row in range(start, end)]
+        if any(has_children):
+            result["has_children"] = has_children
+        return result
+
     def _handle_wait_idle(self, cmd: dict) -> dict:
-        """Wait for the application to finish processing events."""
-        timeout = cmd.get("timeout", 5.0)
-        start_time = time.time()
+        """Wait until the application has gone quiet, or the timeout.
 
-        # Process events repeatedly until the queue is empty or timeout
-        while time.time() - start_time < timeout:
-            # Process all pending events
-            self.app.processEvents()
+        Idle means a full `quiet_ms` window in which processEvents delivered
+        nothing to the app: posted events drained, no paints or layout
+        passes, and no timer shorter than the window fired.
+        """
+        timeout = cmd.get("timeout", 5.0)
+        quiet = cmd.get("quiet_ms", _IDLE_QUIET_MS) / 1000
+        start_time = time.monotonic()
+        last_activity = start_time
+        seen = self.index.activity
+
+        while True:
+            self._process_events()
+
+            # Let read-only queries queued behind this wait run now
+            if self.pipeline_hook:
+                self.pipeline_hook()
+
+            now = time.monotonic()
+            if self.index.activity != seen:
+                seen = self.index.activity
+                last_activity = now
+            elif now - last_activity >= quiet:
+                return {
+                    "success": True,
+                    "idle": True,
+                    "settle_time": last_activity - start_time,
+                    "elapsed": now - start_time,
+                }
+            if now - start_time >= timeout:
+                return {
+                    "success": True,
+                    "idle": False,
+                    "settle_time": None,
+                    "elapsed": now - start_time,
+                }
+            time.sleep(_IDLE_POLL_SECS)
+
+    def _wait_until(self, check: Callable[[bool], tuple[bool, object]],
+                    timeout: float) -> tuple[bool, object, float]:
+        """Pump events until check() holds; return (met, last value, elapsed).
+
+        check(thorough) is re-run whenever the app has handled events since
+        the last run, and every _CONDITION_RECHECK_SECS regardless; thorough
+        is True only on the timed re-checks (it may do a full widget walk).
+        """
+        start_time = time.monotonic()
+        last_check = start_time
+        seen = self.index.activity
+        met, value = check(True)
+
+        while not met:
+            now = time.monotonic()
+            if now - start_time >= timeout:
+                return False, value, now - start_time
+            time.sleep(_IDLE_POLL_SECS)
+            self._process_events()
+            if self.pipeline_hook:
+                self.pipeline_hook()
+
+            now = time.monotonic()
+            timed = now - last_check >= _CONDITION_RECHECK_SECS
+            if timed or self.index.activity != seen:
+                seen = self.index.activity
+                last_check = now
+                met, value = check(timed)
+
+        return True, value, time.monotonic() - start_time
+
+    def _handle_wait_for_widget(self, cmd: dict) -> dict:
+        """Wait until a widget exists / is visible / is enabled / is gone."""
+        widget_name = self._target_label(cmd)
+        state = cmd.get("state", "visible")
+        timeout = cmd.get("timeout", 10.0)
+        if not widget_name:
+            return {"success": False, "error": "widget_name or selector is required"}
+        if cmd.get("selector"):
+            _compile_selector(cmd["selector"])  # report syntax errors before waiting
+        if state not in _WIDGET_STATES:
+            return {"success": False, "error": f"Unknown state: {state} "
+                    f"(expected one of {', '.join(sorted(_WIDGET_STATES))})"}
+
+        def check(thorough: bool) -> tuple[bool, dict]:
+            widget = self._target_widget(cmd, rebuild=thorough)
+            observed = {
+                "exists": widget is not None,
+                "visible": widget is not None and widget.isVisible(),
+                "enabled": widget is not None and widget.isEnabled(),
+            }
+            if state == "gone":
+                return not observed["visible"], observed
+            return observed[state], observed
+
+        met, observed, elapsed = self._wait_until(check, timeout)
+        if met:
+            return {"success": True, "state": state, "observed": observed, "elapsed": elapsed}
+        return {
+            "success": False,
+            "error": f"Timed out after {timeout}s waiting for {widget_name} to be {state}",
+            "observed": observed,
+            "elapsed": elapsed,
+        }
 
-            # Small delay to allow async operations to queue new events
-            time.sleep(0.05)
+    def _handle_wait_for_property(self, cmd: dict) -> dict:
+        """Wait until a widget's Qt property equals a value or matches a regex."""
+        widget_name = self._target_label(cmd)
+        prop = cmd.get("property")
+        timeout = cmd.get("timeout", 10.0)
+        if not widget_name or not prop:
+            return {"success": False,
+                    "error": "widget_name (or selector) and property are required"}
+        if cmd.get("selector"):
+            _compile_selector(cmd["selector"])
+        if ("equals" in cmd) == ("matches" in cmd):
+            return {"success": False, "error": "Provide exactly one of equals or matches"}
+        pattern = re.compile(cmd["matches"]) if "matches" in cmd else None
+
+        def check(thorough: bool) -> tuple[bool, object]:
+            widget = self._target_widget(cmd, rebuild=thorough)
+            if widget is None:
+                return False, None
+            value = _json_value(widget.property(prop))
+            if pattern is not None:
+                return value is not None and bool(pattern.search(str(value))), value
+            return value == cmd["equals"], value
+
+        met, value, elapsed = self._wait_until(check, timeout)
+        if met:
+            return {"success": True, "property": prop, "value": value, "elapsed": elapsed}
+        condition = (f"match {cmd['matches']!r}" if pattern is not None
+                     else f"equal {cmd['equals']!r}")
+        return {
+            "success": False,
+            "error": f"Timed out after {timeout}s waiting for {widget_name}.{prop} "
+                     f"to {condition}",
+            "value": value,
+            "elapsed": elapsed,
+        }
 
-            # Process again to check if more events appeared
-            self.app.processEvents()
+    def _handle_run_sequence(self, cmd: dict) -> dict:
+        """Run a list of commands back to back within a single dispatch.
+
+        Each step is an ordinary command dict (waits are `wait_idle` steps).
+        A step may carry an `expect` dict; the step then fails unless every
+        key matches the step's result (its `info` for `get_widget_info`).
+        """
+        steps = cmd.get("steps")
+        if not isinstance(steps, list):
+            return {"success": False, "error": "steps must be a list of commands"}
+        stop_on_failure = cmd.get("stop_on_failure", True)
+
+        results = []
+        failed = 0
+        start_time = time.perf_counter()
+        for index, step in enumerate(steps):
+            step_start = time.perf_counter()
+            if not isinstance(step, dict):
+                result = {"success": False, "error": "step must be a command object"}
+            elif step.get("cmd") == "run_sequence":
+                result = {"success": False, "error": "run_sequence cannot be nested"}
+            else:
+                result = self.handle(step)
+                mismatch = _expectation_mismatch(result, step.get("expect"))
+                if mismatch:
+                    result = {**result, "success": False, "error": mismatch}
+            results.append({
+                "index": index,
+                "cmd": step.get("cmd") if isinstance(step, dict) else None,
+                "success": bool(result.get("success")),
+                "elapsed_ms": round((time.perf_counter() - step_start) * 1000, 3),
+                "result": result,
+            })
+            if not result.get("success"):
+                failed += 1
+                if stop_on_failure:
+                    break
 
-        return {"success": True, "elapsed": time.time() - start_time}
+        return {
+            "success": failed == 0,
+            "steps": results,
+            "completed": len(results),
+            "failed": failed,
+            "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 3),
+        }
 
     def _handle_quit(self, cmd: dict) -> dict:
         """Quit the application."""
@@ -612,52 +2388,342 @@ class CommandHandler:
 
 
 class CommandDispatcher(QObject):
-    """Routes socket commands to the Qt main thread via a polling QTimer.
-
-    The background socket thread calls dispatch(), which enqueues the command
-    and blocks on a per-request response queue. The QTimer fires every 10 ms
-    on the main thread, dequeues one command, executes it via CommandHandler
-    (safe because Qt APIs run on the main thread), and puts the result back.
-
-    Why QTimer polling instead of QMetaObject.invokeMethod: invokeMethod with
-    QueuedConnection requires the target to be a Slot with a fixed signature.
-    The queue+timer pattern avoids boilerplate and works without Qt's
-    meta-object system knowing about each individual command type.
+    """Routes socket commands to the Qt main thread via a queued signal.
+
+    Socket threads call submit() with a result callback (or the blocking
+    dispatch() wrapper). The first submit into an empty queue emits _wakeup;
+    the queued connection delivers it on the main thread, where _drain runs
+    up to `budget` commands via CommandHandler (safe because Qt APIs run on
+    the main thread) and hands each result to its callback.
+
+    Why a signal instead of the old 10 ms QTimer poll: polling added up to a
+    tick of latency per command, woke the GUI thread 100x/s while idle and
+    capped bursts at one command per tick. Only one wakeup is outstanding at
+    a time, and the budget bounds each wakeup so the app's own events (paint,
+    input, timers) interleave with a long burst instead of being starved;
+    leftovers get a fresh wakeup behind them.
+
+    Pipelining: a long handler (wait_idle) calls handler.pipeline_hook while
+    it waits, which runs queued commands re-entrantly - but only read-only
+    ones at the head of the queue. Anything else waits for the outer handler
+    to return, so no command ever overtakes a mutating one.
+
+    Each command's dispatch, queue, handler and processEvents times go into
+    a timing dict for the handler's metrics; a re-entrant command's time is
+    part of the enclosing handler's handler_ms but not its process_events_ms.
     """
 
-    def __init__(self, handler: CommandHandler, parent: QObject | None = None) -> None:
+    _wakeup = Signal()
+
+    def __init__(
+        self,
+        handler: CommandHandler,
+        parent: QObject | None = None,
+        budget: int = _DISPATCH_BUDGET,
+    ) -> None:
         super().__init__(parent)
         self._handler = handler
-        self._request_queue: queue_mod.Queue[
-            tuple[dict, queue_mod.Queue[dict]]
-        ] = queue_mod.Queue()
-        self._timer = QTimer(self)
-        self._timer.setInterval(10)  # 10 ms — invisible to users, keeps main thread responsive
-        self._timer.timeout.connect(self._process_pending)
-        self._timer.start()
+        self._budget = max(1, budget)
+        self._pending: collections.deque[
+            tuple[dict, Callable[[dict], None], dict | None, float]
+        ] = collections.deque()
+        self._lock = threading.Lock()
+        self._wakeup_posted = False
+        self._depth = 0  # handlers currently on the main-thread stack
+        handler.pipeline_hook = self._pipeline_read_only
+        # Our own wakeups are not app activity for wait_idle.
+        handler.index.exempt.add(id(self))
+        self._wakeup.connect(self._drain, Qt.ConnectionType.QueuedConnection)
+
+    def submit(self, command: dict, on_result: Callable[[dict], None],
+               timing: dict | None = None) -> None:
+        """Thread-safe: queue a command; on_result(result) runs on the main thread.
+
+        A caller passing `timing` gets the main-thread timings added to it
+        before on_result and records it itself (once the reply is sent);
+        otherwise the dispatcher records them.
+        """
+        with self._lock:
+            self._pending.append((command, on_result, timing, time.perf_counter()))
+            post = not self._wakeup_posted
+            self._wakeup_posted = True
+        if post:
+            self._wakeup.emit()
 
     def dispatch(self, command: dict, timeout: float = 10.0) -> dict:
         """Thread-safe: submit a command and block until the main thread returns a result."""
         response_queue: queue_mod.Queue[dict] = queue_mod.Queue()
-        self._request_queue.put((command, response_queue))
+        self.submit(command, response_queue.put)
         try:
             return response_queue.get(timeout=timeout)
         except queue_mod.Empty:
             return {"success": False, "error": "Command timed out in dispatcher"}
 
+    def _take_next(self) -> tuple[dict, Callable[[dict], None], dict | None, float] | None:
+        with self._lock:
+            if not self._pending:
+                return None
+            if self._depth and not _is_read_only(self._pending[0][0]):
+                return None
+            return self._pending.popleft()
+
     @Slot()
-    def _process_pending(self) -> None:
-        """Main thread: process one pending command per timer tick."""
+    def _drain(self) -> None:
+        """Main thread: run up to `budget` pending commands for one wakeup."""
+        woken = time.perf_counter()
+        with self._lock:
+            self._wakeup_posted = False
+        for _ in range(self._budget):
+            if not self._run_next(woken):
+                break
+        # Budget spent (or a re-entrant drain found a mutating head) with work
+        # left: queue another wakeup behind the app's own pending events.
+        with self._lock:
+            post = bool(self._pending) and not self._wakeup_posted and not self._depth
+            if post:
+                self._wakeup_posted = True
+        if post:
+            self._wakeup.emit()
+
+    def _pipeline_read_only(self) -> None:
+        """Main thread, inside a handler: run every read-only head command."""
+        woken = time.perf_counter()
+        while self._run_next(woken):
+            pass
+
+    def _run_next(self, woken: float) -> bool:
+        """Run the next runnable command; `woken` is when this pickup began."""
+        item = self._take_next()
+        if item is None:
+            return False
+        command, on_result, timing, submitted = item
+        handler = self._handler
+        outer_events = handler.process_events_time
+        handler.process_events_time = 0.0
+        self._depth += 1
+        start = time.perf_counter()
         try:
-            command, response_queue = self._request_queue.get_nowait()
-        except queue_mod.Empty:
+            result = handler.handle(command)
+        finally:
+            self._depth -= 1
+            end = time.perf_counter()
+            events = handler.process_events_time
+            handler.process_events_time = outer_events
+        record = timing is None
+        if record:
+            timing = {"cmd": command.get("cmd")}
+        timing.update(
+            dispatch_ms=round(max(0.0, woken - submitted) * 1000, 3),
+            queue_ms=round((start - max(woken, submitted)) * 1000, 3),
+            handler_ms=round((end - start) * 1000, 3),
+            process_events_ms=round(events * 1000, 3),
+            success=bool(result.get("success")),
+        )
+        on_result(result)
+        if record:
+            handler.metrics.record(timing)
+        return True
+
+    @property
+    def metrics(self) -> _CommandMetrics:
+        return self._handler.metrics
+
+
+class _Connection:
+    """One client connection: a reader thread that parses requests and
+    submits them, and a writer thread that sends results.
+
+    Requests carrying an "id" are answered with the same "id", in completion
+    order, so a persistent client can keep several requests in flight on one
+    socket. Id-less requests (one command per connection, the original
+    protocol) still get exactly one id-less reply.
+
+    Messages are newline-delimited JSON until the client's first message is a
+    protocol hello; from then on both directions use length-prefixed frames
+    (see _PROTOCOL_VERSION). The hello is answered on the reader thread, so
+    negotiation never waits for a busy Qt main thread.
+    """
+
+    def __init__(self, conn: socket.socket, dispatcher: CommandDispatcher):
+        self._conn = conn
+        self._dispatcher = dispatcher
+        # (reply parts, timing dict to record once sent, when the reply was ready)
+        self._outbox: queue_mod.Queue[tuple[list[bytes], dict | None, float] | None] = (
+            queue_mod.Queue()
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._reading = True
+        self._messages = 0
+        self._framed = False
+        self._compress_min: int | None = None
+
+    def serve(self) -> None:
+        """Run the reader on the calling thread; the writer gets its own."""
+        writer = threading.Thread(target=self._write_loop, daemon=True)
+        writer.start()
+        try:
+            self._read_loop()
+        finally:
+            with self._lock:
+                self._reading = False
+                if not self._in_flight:
+                    self._outbox.put(None)
+            writer.join()
+            self._conn.close()
+
+    def _read_loop(self) -> None:
+        buffer = bytearray()
+        scanned = 0
+        while True:
+            if self._framed:
+                try:
+                    message = self._next_frame(buffer)
+                except (OSError, zlib.error) as e:
+                    print(f"Dropping connection: {e}", file=sys.stderr)
+                    return
+            else:
+                newline = buffer.find(b"\n", scanned)
+                message = None
+                if newline >= 0:
+                    message = bytes(buffer[:newline]).strip()
+                    del buffer[:newline + 1]
+                    scanned = 0
+                else:
+                    scanned = len(buffer)
+            if message is None:
+                try:
+                    chunk = self._conn.recv(65536)
+                except OSError:
+                    return
+                if not chunk:
+                    return
+                buffer += chunk
+                continue
+            if message:
+                self._submit(message)
+
+    def _next_frame(self, buffer: bytearray) -> bytes | None:
+        """Pop one complete frame's payload off buffer, or None if incomplete.
+
+        A frame larger than what is buffered is read straight into a
+        preallocated bytearray with recv_into, so big requests are never
+        re-concatenated chunk by chunk.
+        """
+        if len(buffer) < _FRAME_HEADER.size:
+            return None
+        length, flags = _FRAME_HEADER.unpack_from(buffer)
+        if length > _MAX_FRAME_BYTES:
+            raise ConnectionError(f"frame of {length} bytes exceeds the limit")
+        end = _FRAME_HEADER.size + length
+        if len(buffer) < end:
+            payload = bytearray(length)
+            have = len(buffer) - _FRAME_HEADER.size
+            payload[:have] = buffer[_FRAME_HEADER.size:]
+            view = memoryview(payload)
+            while have < length:
+                received = self._conn.recv_into(view[have:])
+                if not received:
+                    raise ConnectionError("connection closed mid-frame")
+                have += received
+            del buffer[:]
+        else:
+            payload = bytes(buffer[_FRAME_HEADER.size:end])
+            del buffer[:end]
+        return zlib.decompress(payload) if flags & _FRAME_COMPRESSED else bytes(payload)
+
+    def _reply(self, parts: list[bytes], timing: dict | None = None,
+               started: float = 0.0) -> None:
+        self._outbox.put((parts, timing, started))
+
+    def _submit(self, message: bytes) -> None:
+        first = self._messages == 0
+        self._messages += 1
+        received = time.perf_counter()
+        try:
+            command = json.loads(message)
+        except ValueError as e:
+            self._reply(self._encode({"success": False, "error": str(e)}, None))
             return
-        result = self._handler.handle(command)
-        response_queue.put(result)
+        request_id = command.pop("id", None) if isinstance(command, dict) else None
+        if not isinstance(command, dict):
+            self._reply(self._encode(
+                {"success": False, "error": "Command must be a JSON object"}, None))
+            return
+        if first and command.get("cmd") == "hello" and not self._framed:
+            protocol = command.get("protocol", 1)
+            if not isinstance(protocol, int) or isinstance(protocol, bool):
+                # Answered like any failed command; the client stays on v1.
+                self._reply(self._encode(
+                    {"success": False, "error": "hello: protocol must be an integer"},
+                    request_id))
+                return
+            self._reply(self._encode({
+                "success": True,
+                "protocol": _PROTOCOL_VERSION,
+                "compression": "zlib",
+            }, request_id))
+            if protocol >= _PROTOCOL_VERSION:
+                self._framed = True
+                compress_min = command.get("compress_min")
+                self._compress_min = compress_min if isinstance(compress_min, int) else None
+            return
+        with self._lock:
+            self._in_flight += 1
+        timing = {
+            "cmd": command.get("cmd"),
+            "request_bytes": len(message),
+            "decode_ms": round((time.perf_counter() - received) * 1000, 3),
+        }
+
+        def on_result(result: dict) -> None:
+            started = time.perf_counter()
+            self._reply(self._encode(result, request_id), timing, started)
+            with self._lock:
+                self._in_flight -= 1
+                if not self._reading and not self._in_flight:
+                    self._outbox.put(None)
+
+        # submit() routes the command to the Qt main thread — safe for all
+        # Qt API calls; the reply is sent from the writer thread.
+        self._dispatcher.submit(command, on_result, timing)
+
+    def _encode(self, result: dict, request_id) -> list[bytes]:
+        if request_id is not None:
+            result = {**result, "id": request_id}
+        if not self._framed:
+            return [json.dumps(result).encode() + b"\n"]
+        payload = json.dumps(result, separators=(",", ":")).encode()
+        flags = 0
+        if self._compress_min is not None and len(payload) >= self._compress_min:
+            payload = zlib.compress(payload, 1)
+            flags |= _FRAME_COMPRESSED
+        return [_FRAME_HEADER.pack(len(payload), flags), payload]
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            parts, timing, started = item
+            try:
+                for part in parts:
+                    self._conn.sendall(part)
+            except OSError:
+                pass  # client went away; keep draining so on_result never blocks
+            if timing is not None:
+                timing["reply_bytes"] = sum(map(len, parts))
+                timing["reply_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                self._dispatcher.metrics.record(timing)
 
 
 class SocketServer:
-    """Unix socket server for receiving commands."""
+    """Unix socket server for receiving commands.
+
+    Each accepted connection is served on its own thread and may stay open
+    for the whole session, so connect/accept costs are paid once rather than
+    per command.
+    """
 
     def __init__(self, socket_path: str, dispatcher: CommandDispatcher):
         self.socket_path = socket_path
@@ -698,7 +2764,11 @@ class SocketServer:
         while self.running:
             try:
                 conn, _ = self.server_socket.accept()
-                self._handle_connection(conn)
+                conn.settimeout(None)
+                thread = threading.Thread(
+                    target=self._handle_connection, args=(conn,), daemon=True
+                )
+                thread.start()
             except socket.timeout:
                 continue
             except Exception as e:
@@ -706,34 +2776,8 @@ class SocketServer:
                     print(f"Socket error: {e}", file=sys.stderr)
 
     def _handle_connection(self, conn: socket.socket):
-        """Handle a single connection."""
-        try:
-            conn.settimeout(30.0)
-            data = b""
-            while True:
-                chunk = conn.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if b"\n" in data:
-                    break
-
-            if data:
-                command = json.loads(data.decode().strip())
-                # dispatch() routes the command to the Qt main thread and blocks
-                # until the result is ready — safe for all Qt API calls.
-                result = self.dispatcher.dispatch(command)
-                response = json.dumps(result) + "\n"
-                conn.sendall(response.encode())
-
-        except Exception as e:
-            error_response = json.dumps({"success": False, "error": str(e)}) + "\n"
-            try:
-                conn.sendall(error_response.encode())
-            except Exception:
-                pass
-        finally:
-            conn.close()
+        """Serve one connection until the client closes it."""
+        _Connection(conn, self.dispatcher).serve()
 
 
 def load_script(script_path: str):
@@ -768,19 +2812,201 @@ def load_module(module_path: str):
         module.main()
 
 
-def main():
+# Zygote mode: a long-lived harness that has already imported PySide6 and this
+# module, and forks a child per launch_app. The child becomes an ordinary
+# harness process (it runs main() with the launcher's arguments), so apps
+# skip the Qt import cost. Forking is only done while no QCoreApplication or
+# extra thread exists; otherwise the launcher is told to cold-spawn instead.
+
+# Env vars the interpreter reads at startup; a child forked from a zygote
+# started with different values would not match a cold spawn.
+_ZYGOTE_STARTUP_ENV_PREFIXES = ("PYTHON",)
+
+
+def _fork_unsafe_reason(env: dict[str, str]) -> str | None:
+    """Why forking a harness for this env now would be unsafe, or None."""
+    if not hasattr(os, "fork") or sys.platform == "darwin":
+        return f"fork without exec is not supported on {sys.platform}"
+    if threading.active_count() > 1:
+        return f"{threading.active_count()} threads are running"
+    if QCoreApplication.instance() is not None:
+        return "a QCoreApplication already exists"
+    for key in set(env) | set(os.environ):
+        if key.startswith(_ZYGOTE_STARTUP_ENV_PREFIXES) and env.get(key) != os.environ.get(key):
+            return f"{key} differs from the zygote's environment"
+    return None
+
+
+def _zygote_child(request: dict, fds: list[int], close_fds: list[int]) -> None:
+    """Turn a freshly forked zygote child into a harness process; never returns."""
+    code = 1
+    try:
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        for fd in close_fds:
+            os.close(fd)
+        os.setsid()  # own session: the launcher signals the child, not the zygote
+        stdout_fd, stderr_fd, ready_fd = fds
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+        os.environ.clear()
+        os.environ.update(request["env"])
+        if request.get("cwd"):
+            os.chdir(request["cwd"])
+        argv = request["argv"] + ["--ready-fd", str(ready_fd)]
+        sys.argv = [str(Path(__file__).resolve()), *argv]
+        main(argv)
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def _read_zygote_request(conn: socket.socket) -> tuple[dict, list[int]]:
+    """Read one newline-terminated JSON request plus its passed fds."""
+    data, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode()), fds
+
+
+def run_zygote(control_path: str, ready_fd: int | None) -> None:
+    """Serve fork requests on control_path until stdin reaches EOF.
+
+    Each request carries the harness argv, env and cwd as JSON, and the
+    child's stdout, stderr and ready-pipe fds as SCM_RIGHTS. The reply is
+    {"pid": n} (or {"error": reason} to make the launcher cold-spawn), and
+    {"exit": code} follows on the same connection when the child exits.
+    Stdin is a pipe from the launcher, so the zygote exits with it.
+    """
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(control_path)
+    listener.listen(16)
+    wake_read, wake_write = os.pipe()
+    os.set_blocking(wake_write, False)
+    signal.set_wakeup_fd(wake_write)
+    signal.signal(signal.SIGCHLD, lambda *_: None)  # wakes select via wake_write
+    children: dict[int, socket.socket] = {}
+
+    if ready_fd is not None:
+        os.write(ready_fd, b"ready\n")
+        os.close(ready_fd)
+    print(f"Harness zygote ready, control socket: {control_path}", file=sys.stderr)
+
+    while True:
+        readable, _, _ = select.select([listener, wake_read, 0], [], [])
+        if 0 in readable and not os.read(0, 4096):
+            break
+        if wake_read in readable:
+            os.read(wake_read, 4096)
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = children.pop(pid, None)
+            if conn is not None:
+                try:
+                    reply = {"exit": os.waitstatus_to_exitcode(status)}
+                    conn.sendall(json.dumps(reply).encode() + b"\n")
+                except OSError:
+                    pass
+                conn.close()
+        if listener not in readable:
+            continue
+
+        conn, _ = listener.accept()
+        fds: list[int] = []
+        try:
+            conn.settimeout(5.0)
+            request, fds = _read_zygote_request(conn)
+            if len(fds) != 3:
+                raise ValueError(f"expected 3 fds, got {len(fds)}")
+            reason = _fork_unsafe_reason(request["env"])
+            if reason is not None:
+                raise RuntimeError(reason)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                _zygote_child(request, fds, [
+                    listener.fileno(), conn.fileno(), wake_read, wake_write,
+                    *(child.fileno() for child in children.values()),
+                ])
+            children[pid] = conn
+            conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+        except (OSError, ValueError, KeyError, RuntimeError) as e:
+            try:
+                conn.sendall(json.dumps({"error": str(e)}).encode() + b"\n")
+            except OSError:
+                pass
+            conn.close()
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    for conn in children.values():
+        conn.close()
+    listener.close()
+    if os.path.exists(control_path):
+        os.unlink(control_path)
+
+
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(description="Qt Test Harness")
-    parser.add_argument("--socket", required=True, help="Unix socket path for commands")
+    parser.add_argument("--socket", help="Unix socket path for commands")
+    parser.add_argument(
+        "--zygote",
+        metavar="CONTROL_SOCKET",
+        help="Run as a pre-imported zygote that forks a harness per request",
+    )
     parser.add_argument("--script", help="Python script to run")
     parser.add_argument("--module", help="Python module to run (like -m)")
     parser.add_argument("--working-dir", help="Working directory (added to sys.path)")
+    parser.add_argument(
+        "--dispatch-budget",
+        type=int,
+        default=_DISPATCH_BUDGET,
+        help="Max commands run per main-thread wakeup before yielding to the app",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Start the responsiveness profiler as soon as the app is up",
+    )
+    parser.add_argument(
+        "--ready-fd",
+        type=int,
+        help="Pipe fd to write 'ready' to once the command socket is listening",
+    )
     parser.add_argument(
         "--python-path",
         action="append",
         dest="python_paths",
         help="Additional Python paths to add to sys.path (can be repeated)",
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.zygote:
+        run_zygote(args.zygote, args.ready_fd)
+        return
+    if not args.socket:
+        parser.error("--socket is required")
 
     # Add additional Python paths FIRST (in reverse order so first arg is first in path)
     if args.python_paths:
@@ -799,27 +3025,35 @@ def main():
     # We'll hook into the existing one after the script loads
 
     socket_path = args.socket
+    ready_fd = args.ready_fd
     dispatcher = None
     server = None
 
     def setup_harness():
         """Set up the harness after QApplication exists."""
-        nonlocal dispatcher, server
+        nonlocal dispatcher, server, ready_fd
         app = QApplication.instance()
         if app:
             handler = CommandHandler(app)
-            dispatcher = CommandDispatcher(handler)
+            dispatcher = CommandDispatcher(handler, budget=args.dispatch_budget)
+            if args.profile:
+                handler.handle({"cmd": "responsiveness"})
             server = SocketServer(socket_path, dispatcher)
             server.start()
             print(f"Harness started, socket: {socket_path}", file=sys.stderr)
+            if ready_fd is not None:
+                # The launcher blocks on this pipe instead of polling the socket
+                os.write(ready_fd, b"ready\n")
+                os.close(ready_fd)
+                ready_fd = None
 
     # Patch QApplication to hook our setup after it's created
     original_init = QApplication.__init__
 
     def patched_init(self, *args_init, **kwargs):
         original_init(self, *args_init, **kwargs)
-        # Set up harness after QApplication is created
-        QTimer.singleShot(100, setup_harness)
+        # Set up harness on the first event-loop pass after QApplication is created
+        QTimer.singleShot(0, setup_harness)
 
     QApplication.__init__ = patched_init
 
@@ -11,19 +11,29 @@ IMPORTANT: This is a stdio MCP server - NEVER use print() or write to stdout!
 All logging must go to stderr or a file.
 """
 
+import atexit
+import collections
 import dataclasses
+import functools
+import itertools
 import json
 import logging
 import os
+import select
 import shutil
-from typing import Any
+import signal
+from typing import Any, Callable
 import socket
+import struct
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+import zlib
 from pathlib import Path
 
+import anyio
 from mcp.server.fastmcp import FastMCP
 
 # Configure logging to stderr (NEVER stdout for stdio MCP servers)
@@ -34,6 +44,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger("qt-pilot")
 
+
+def _env_int(name: str, default: int | None) -> int | None:
+    """Integer from environment variable `name`, or `default` when it is
+    unset, empty or not an integer (a bad value is logged, not fatal)."""
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        logger.warning("Ignoring %s=%r: not an integer, using %s", name, raw, default)
+        return default
+
+
+# Harness wire protocol (see the _PROTOCOL_VERSION comment in harness.py):
+# newline-delimited JSON, or length-prefixed compact-JSON frames once the
+# harness accepts the connect-time hello.
+_PROTOCOL_VERSION: int = 2
+_FRAME_HEADER = struct.Struct("!IB")
+_FRAME_COMPRESSED: int = 0x01
+_MAX_FRAME_BYTES: int = 256 * 1024 * 1024
+# Ask the harness to zlib-compress replies of at least this many bytes
+# (env QT_PILOT_WIRE_COMPRESS_MIN; unset = never, the cheaper choice on a
+# local socket)
+_WIRE_COMPRESS_MIN: int | None = _env_int("QT_PILOT_WIRE_COMPRESS_MIN", None)
+
+
 @dataclasses.dataclass
 class AppState:
     """Mutable state for a single launched Qt application session.
@@ -46,75 +83,785 @@ class AppState:
     socket_dir: str | None = None
     display: str | None = None
     xvfb_process: "subprocess.Popen[bytes] | None" = None
+    connection: "HarnessConnection | None" = None
+    logs: "AppLogs | None" = None
+
+
+class HarnessConnection:
+    """Persistent, multiplexed connection to one harness socket.
+
+    Every request carries an "id"; a reader thread routes each reply to the
+    waiting caller by id, so several requests can be in flight on the one
+    socket and replies may arrive out of order (a read-only query pipelines
+    behind a long wait_idle). Connecting once per session instead of once per
+    tool call removes connect/accept overhead from every action.
+
+    On connect, a hello negotiates the wire protocol: ``protocol`` is 2
+    (length-prefixed frames) when the harness supports it, else 1 (newline
+    JSON, what older harnesses speak). A harness that answers the hello
+    without echoing its "id" predates multiplexing: it serves one command
+    per connection and then closes it, so ``one_shot`` requests each open
+    their own connection, as the client did before.
+
+    request() is thread-safe. Once the socket fails or the harness closes it,
+    the connection is dead (``closed``) and every waiter is released with an
+    error; _send_command then opens a fresh one.
+    """
+
+    def __init__(self, socket_path: str, connect_timeout: float) -> None:
+        self._socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.settimeout(connect_timeout)
+            self._sock.connect(socket_path)
+            self.protocol, self.one_shot = self._negotiate()
+            self._sock.settimeout(None)
+        except BaseException:
+            self._sock.close()
+            raise
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._waiters: dict[int, tuple[threading.Event, list[dict[str, Any]]]] = {}
+        self.closed = False
+        if self.one_shot:
+            self._sock.close()  # the harness closes it after the hello anyway
+            return
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def request(self, command: dict[str, Any], timeout: float) -> dict[str, Any]:
+        """Send one command and block until its reply (raises socket.timeout)."""
+        if self.one_shot:
+            return self._request_one_shot(command, timeout)
+        done = threading.Event()
+        slot: list[dict[str, Any]] = []
+        with self._lock:
+            if self.closed:
+                raise ConnectionResetError("connection to harness is closed")
+            request_id = next(self._ids)
+            self._waiters[request_id] = (done, slot)
+            try:
+                self._send({**command, "id": request_id})
+            except OSError:
+                self._waiters.pop(request_id, None)
+                raise
+        if not done.wait(timeout):
+            with self._lock:
+                self._waiters.pop(request_id, None)
+            raise socket.timeout("timed out waiting for harness reply")
+        if not slot:
+            raise ConnectionResetError("harness closed the connection")
+        return slot[0]
+
+    def _request_one_shot(self, command: dict[str, Any], timeout: float) -> dict[str, Any]:
+        """One command on its own connection, for a harness that closes after replying."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(self._socket_path)
+            sock.sendall(json.dumps(command).encode() + b"\n")
+            reply = bytearray()
+            while b"\n" not in reply:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+        if not reply.strip():
+            raise ConnectionResetError("harness closed the connection")
+        return json.loads(reply)
+
+    def _negotiate(self) -> tuple[int, bool]:
+        """Send the protocol hello (as v1); return (version to speak, one_shot)."""
+        hello = {"cmd": "hello", "protocol": _PROTOCOL_VERSION,
+                 "compress_min": _WIRE_COMPRESS_MIN, "id": 0}
+        self._sock.sendall(json.dumps(hello).encode() + b"\n")
+        reply = bytearray()
+        while not reply.endswith(b"\n"):
+            chunk = self._sock.recv(4096)
+            if not chunk:
+                raise ConnectionResetError("harness closed the connection")
+            reply += chunk
+        answer = json.loads(reply)
+        if "id" not in answer:
+            return 1, True
+        version = answer.get("protocol", 1)
+        if not isinstance(version, int) or version < _PROTOCOL_VERSION:
+            return 1, False
+        return _PROTOCOL_VERSION, False
+
+    def _send(self, message: dict[str, Any]) -> None:
+        if self.protocol == 1:
+            self._sock.sendall(json.dumps(message).encode() + b"\n")
+            return
+        payload = json.dumps(message, separators=(",", ":")).encode()
+        self._sock.sendall(_FRAME_HEADER.pack(len(payload), 0) + payload)
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    def _read_loop(self) -> None:
+        try:
+            if self.protocol == 1:
+                self._read_lines()
+            else:
+                self._read_frames()
+        except (OSError, ValueError, zlib.error) as e:
+            logger.debug("harness_connection_read_error: %s", e)
+        finally:
+            with self._lock:
+                self.closed = True
+                waiters = list(self._waiters.values())
+                self._waiters.clear()
+            for done, _ in waiters:
+                done.set()  # empty slot -> ConnectionResetError in request()
+
+    def _read_frames(self) -> None:
+        """Deliver length-prefixed frames until EOF.
+
+        Each payload is read with recv_into into a buffer sized from its
+        header, so a multi-megabyte reply is received without re-copying.
+        """
+        header = bytearray(_FRAME_HEADER.size)
+        while True:
+            if not self._recv_exactly(memoryview(header)):
+                return
+            length, flags = _FRAME_HEADER.unpack(header)
+            if length > _MAX_FRAME_BYTES:
+                raise ConnectionError(f"frame of {length} bytes exceeds the limit")
+            payload = bytearray(length)
+            if not self._recv_exactly(memoryview(payload)):
+                return
+            data = zlib.decompress(payload) if flags & _FRAME_COMPRESSED else payload
+            self._deliver(json.loads(data))
+
+    def _recv_exactly(self, view: memoryview) -> bool:
+        """Fill view from the socket; False on EOF."""
+        have = 0
+        while have < len(view):
+            received = self._sock.recv_into(view[have:])
+            if not received:
+                return False
+            have += received
+        return True
+
+    def _read_lines(self) -> None:
+        buffer = bytearray()
+        scanned = 0
+        while True:
+            newline = buffer.find(b"\n", scanned)
+            if newline < 0:
+                scanned = len(buffer)
+                chunk = self._sock.recv(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+                continue
+            line = bytes(buffer[:newline])
+            del buffer[:newline + 1]
+            scanned = 0
+            self._deliver(json.loads(line.decode()))
+
+    def _deliver(self, reply: dict[str, Any]) -> None:
+        with self._lock:
+            waiter = self._waiters.pop(reply.pop("id", None), None)
+        if waiter is None:
+            return  # reply to a request that already timed out
+        done, slot = waiter
+        slot.append(reply)
+        done.set()
 
 
 # Create MCP server
 mcp = FastMCP("qt-pilot")
 
-# Global state for tracking launched apps
+
+def _tool(fn: Callable[..., dict[str, Any]]) -> Callable[..., dict[str, Any]]:
+    """Register `fn` as an MCP tool that runs on a worker thread.
+
+    FastMCP awaits tools on its event loop, so a plain `def` tool blocked on
+    the harness socket would stall every other call until it returned. The
+    registered coroutine hands `fn` to anyio's thread pool instead, letting a
+    quick query (or another session) proceed during a long wait. `fn` itself
+    is returned unchanged for direct callers.
+    """
+    @functools.wraps(fn)
+    async def run(**kwargs: Any) -> dict[str, Any]:
+        return await anyio.to_thread.run_sync(functools.partial(fn, **kwargs))
+
+    mcp.tool()(run)
+    return fn
+
+
+# Global state for tracking launched apps. Each named session has its own
+# Xvfb display, socket and harness process; "default" is _app_state itself.
 _app_state = AppState()
+_DEFAULT_SESSION = "default"
+_sessions: dict[str, AppState] = {_DEFAULT_SESSION: _app_state}
+_sessions_lock = threading.Lock()
+# Guards installing a session's HarnessConnection from concurrent tool calls
+_connection_lock = threading.Lock()
+# Max sessions with a running app at once (env QT_PILOT_MAX_SESSIONS overrides)
+_MAX_SESSIONS: int = _env_int("QT_PILOT_MAX_SESSIONS", 4)
 
 # Xvfb display numbering: start at 99 to avoid conflicts with user displays (0-10 range)
 _XVFB_DISPLAY_START: int = 99
-# Seconds to wait after starting Xvfb before launching the harness
-_XVFB_STARTUP_WAIT_SECS: float = 0.5
+# launch_app backends: "xvfb" runs the app on a private X server; "offscreen"
+# and "minimal" are Qt platform plugins that need no display server at all
+_BACKENDS = ("xvfb", "offscreen", "minimal")
+# Max seconds to wait for Xvfb to report readiness over -displayfd
+_XVFB_STARTUP_WAIT_SECS: float = 5.0
+_XVFB_SCREEN = "1280x1024x24"
+# Idle pre-started Xvfb servers to keep (env QT_PILOT_XVFB_POOL; 0 disables)
+_XVFB_POOL_SIZE: int = _env_int("QT_PILOT_XVFB_POOL", 0)
+# Bytes of recent app output kept per session (env QT_PILOT_LOG_BUFFER overrides)
+_LOG_BUFFER_BYTES: int = _env_int("QT_PILOT_LOG_BUFFER", 1024 * 1024)
+_LOG_STREAMS = ("stdout", "stderr")
+# capture_screenshot deliveries; "shm" files go in the memory-backed _SHM_DIR
+_SCREENSHOT_OUTPUTS = ("file", "base64", "shm")
+_SHM_DIR = "/dev/shm"
+# Fork harnesses from a pre-imported zygote (env QT_PILOT_ZYGOTE=1 enables)
+_ZYGOTE_ENABLED: bool = os.environ.get("QT_PILOT_ZYGOTE", "0") not in ("", "0")
+# Max seconds to wait for the zygote to import Qt and report ready
+_ZYGOTE_STARTUP_WAIT_SECS: float = 30.0
+# Displays picked for an Xvfb that has not reported ready (and so may have no
+# lock file yet); guarded by _sessions_lock
+_starting_displays: set[str] = set()
 
 # Path to the test harness script (same directory as this file)
 HARNESS_PATH = Path(__file__).parent / "harness.py"
 
 
-def _cleanup_app() -> None:
-    """Clean up any running app and xvfb."""
-    if _app_state.process:
+def _read_ready(fd: int, timeout: float) -> bytes:
+    """Read one newline-terminated readiness message from a pipe.
+
+    Returns the message without the newline, or b"" if the timeout expires or
+    every writer closes the pipe (the child exited) before a full line arrives.
+    """
+    deadline = time.monotonic() + timeout
+    data = b""
+    while not data.endswith(b"\n"):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return b""
+        readable, _, _ = select.select([fd], [], [], remaining)
+        if not readable:
+            return b""
+        chunk = os.read(fd, 64)
+        if not chunk:
+            return b""
+        data += chunk
+    return data.strip()
+
+
+def _start_xvfb(display: str) -> "subprocess.Popen[bytes]":
+    """Start Xvfb on display and block until it accepts connections.
+
+    With -displayfd, Xvfb writes the display number to the pipe once it is
+    listening, so there is no fixed startup sleep.
+    """
+    read_fd, write_fd = os.pipe()
+    try:
+        try:
+            process = subprocess.Popen(
+                ["Xvfb", display, "-screen", "0", _XVFB_SCREEN, "-displayfd", str(write_fd)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(write_fd,),
+            )
+        finally:
+            os.close(write_fd)
+        if not _read_ready(read_fd, _XVFB_STARTUP_WAIT_SECS):
+            process.kill()
+            process.wait(timeout=5)
+            raise RuntimeError(f"Xvfb did not become ready on {display}")
+    finally:
+        os.close(read_fd)
+    return process
+
+
+def _reserve_display(exclude: AppState | None = None) -> str:
+    """Pick a free display number and mark it as starting.
+
+    Skips lock files, displays other sessions or the pool hold, and displays
+    still starting (their Xvfb may not have written its lock file yet). The
+    caller holds _sessions_lock and discards the display from
+    _starting_displays once its Xvfb is up or has failed.
+    """
+    taken = {other.display for other in _sessions.values()
+             if other is not exclude and other.xvfb_process}
+    taken |= _xvfb_pool.displays() | _starting_displays
+    display_num = _XVFB_DISPLAY_START
+    while os.path.exists(f"/tmp/.X{display_num}-lock") or f":{display_num}" in taken:
+        display_num += 1
+    display = f":{display_num}"
+    _starting_displays.add(display)
+    return display
+
+
+class XvfbPool:
+    """Pre-started Xvfb servers kept idle for reuse across launch/close cycles.
+
+    Starting Xvfb is the largest fixed cost of launch_app. With a pool size
+    above zero, launch_app takes a ready display from here instead of starting
+    one, and _cleanup_app hands a session's display back instead of
+    terminating it (an X server resets once its last client disconnects, so a
+    reused display starts clean). fill() tops the pool back up.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle: list[tuple[str, "subprocess.Popen[bytes]"]] = []
+        self._starting = 0
+
+    def displays(self) -> set[str]:
+        with self._lock:
+            return {display for display, _ in self._idle}
+
+    def acquire(self) -> "tuple[str, subprocess.Popen[bytes]] | None":
+        """Take a running idle server, or None if the pool has none."""
+        with self._lock:
+            while self._idle:
+                display, process = self._idle.pop()
+                if process.poll() is None:
+                    return display, process
+        return None
+
+    def release(self, display: str | None, process: "subprocess.Popen[bytes]") -> bool:
+        """Keep a still-running server for reuse; False if the pool is full."""
+        if not display or process.poll() is not None:
+            return False
+        with self._lock:
+            if len(self._idle) >= self.size:
+                return False
+            self._idle.append((display, process))
+        logger.info("Returned Xvfb %s to the pool", display)
+        return True
+
+    def fill(self) -> None:
+        """Start servers until `size` are idle or starting (blocks while starting)."""
+        while True:
+            with _sessions_lock:
+                with self._lock:
+                    if len(self._idle) + self._starting >= self.size:
+                        return
+                    self._starting += 1
+                display = _reserve_display()
+            try:
+                process = _start_xvfb(display)
+                with self._lock:
+                    self._idle.append((display, process))
+                logger.info("Pre-started Xvfb %s for the pool", display)
+            except (OSError, RuntimeError) as e:
+                logger.warning("Could not pre-start Xvfb: %s", e)
+                return
+            finally:
+                with _sessions_lock:
+                    _starting_displays.discard(display)
+                with self._lock:
+                    self._starting -= 1
+
+    def fill_async(self) -> None:
+        if self.size > 0:
+            threading.Thread(target=self.fill, daemon=True).start()
+
+    def close(self) -> None:
+        """Terminate every idle server (called at exit)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, process in idle:
+            try:
+                process.terminate()
+                process.wait(timeout=5)
+            except Exception as e:
+                logger.warning("Error terminating pooled xvfb: %s", e)
+
+
+_xvfb_pool = XvfbPool(_XVFB_POOL_SIZE)
+atexit.register(_xvfb_pool.close)
+
+
+class ZygoteProcess:
+    """Popen-compatible handle for a harness forked by the zygote.
+
+    The child belongs to the zygote, not to this process, so its exit status
+    arrives as an {"exit": code} line on the launch connection instead of
+    from waitpid(). Its stdout and stderr are pipes created here and drained
+    by AppLogs like a Popen child's.
+    """
+
+    def __init__(self, conn: socket.socket, stdout_fd: int, stderr_fd: int) -> None:
+        self.pid = 0
+        self.returncode: int | None = None
+        self.stdout = os.fdopen(stdout_fd, "rb", buffering=0)
+        self.stderr = os.fdopen(stderr_fd, "rb", buffering=0)
+        self._conn = conn
+        self._buffer = b""
+
+    def read_message(self, timeout: float | None) -> dict[str, Any] | None:
+        """Next JSON line from the zygote; None on timeout, {} once it is gone."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self._buffer:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._conn], [], [], remaining)
+            if not readable:
+                return None
+            try:
+                chunk = self._conn.recv(4096)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                return {}
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line.decode())
+
+    def _collect_exit(self, timeout: float | None) -> None:
+        message = self.read_message(timeout)
+        if message is None:
+            return
+        self._conn.close()
+        if "exit" in message:
+            self.returncode = message["exit"]
+            return
+        # The zygote died, so nobody will report this child's exit: stop it
+        logger.warning("Harness zygote lost; killing forked harness %d", self.pid)
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.returncode = -signal.SIGKILL
+
+    def poll(self) -> int | None:
+        if self.returncode is None:
+            self._collect_exit(0)
+        return self.returncode
+
+    def wait(self, timeout: float | None = None) -> int:
+        if self.returncode is None:
+            self._collect_exit(timeout)
+            if self.returncode is None:
+                raise subprocess.TimeoutExpired(f"harness pid {self.pid}", timeout or 0)
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+
+class HarnessZygote:
+    """A long-lived `harness.py --zygote` process that forks app harnesses.
+
+    Importing PySide6 is most of a cold harness start; the zygote pays for it
+    once and forks a child per launch before any QApplication exists. fork()
+    returns None whenever the zygote cannot be used (it failed to start, it
+    died, or it reports that forking is unsafe), and launch_app then falls
+    back to spawning a fresh interpreter.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._process: "subprocess.Popen[bytes] | None" = None
+        self._dir: str | None = None
+        self._control_path: str | None = None
+
+    def _ensure_started(self) -> str | None:
+        """Control socket path of a running zygote, starting one if needed."""
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                return self._control_path
+            self._stop()
+            self._dir = tempfile.mkdtemp(prefix="qt_pilot_zygote_")
+            self._control_path = os.path.join(self._dir, "zygote.sock")
+            ready_read, ready_write = os.pipe()
+            try:
+                try:
+                    self._process = subprocess.Popen(
+                        [sys.executable, str(HARNESS_PATH), "--zygote", self._control_path,
+                         "--ready-fd", str(ready_write)],
+                        stdin=subprocess.PIPE,  # EOF when this server exits
+                        stdout=subprocess.DEVNULL,
+                        pass_fds=(ready_write,),
+                    )
+                finally:
+                    os.close(ready_write)
+                ready = _read_ready(ready_read, _ZYGOTE_STARTUP_WAIT_SECS)
+            except OSError as e:
+                logger.warning("Could not start harness zygote: %s", e)
+                ready = b""
+            finally:
+                os.close(ready_read)
+            if not ready:
+                self._stop()
+                return None
+            logger.info("Harness zygote started (pid %d)", self._process.pid)
+            return self._control_path
+
+    def start_async(self) -> None:
+        threading.Thread(target=self._ensure_started, daemon=True).start()
+
+    def fork(
+        self,
+        argv: list[str],
+        cwd: str | None,
+        env: dict[str, str],
+        ready_fd: int,
+    ) -> ZygoteProcess | None:
+        """Fork a harness running `harness.py *argv`, or None to cold-spawn."""
+        control_path = self._ensure_started()
+        if control_path is None:
+            return None
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        process = ZygoteProcess(conn, stdout_read, stderr_read)
+        request = json.dumps({"argv": argv, "cwd": cwd, "env": env}).encode() + b"\n"
         try:
-            _app_state.process.terminate()
-            _app_state.process.wait(timeout=5)
+            conn.settimeout(5.0)
+            conn.connect(control_path)
+            socket.send_fds(conn, [request], [stdout_write, stderr_write, ready_fd])
+            conn.settimeout(None)
+            reply = process.read_message(5.0) or {}
+        except (OSError, ValueError) as e:
+            reply = {"error": str(e)}
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+        if "pid" not in reply:
+            logger.info("Zygote fork unavailable (%s); cold-spawning harness",
+                        reply.get("error", "no reply"))
+            conn.close()
+            process.stdout.close()
+            process.stderr.close()
+            return None
+        process.pid = reply["pid"]
+        return process
+
+    def _stop(self) -> None:
+        if self._process:
+            try:
+                self._process.terminate()
+                self._process.wait(timeout=5)
+            except Exception as e:
+                logger.warning("Error terminating harness zygote: %s", e)
+            self._process = None
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+
+_zygote = HarnessZygote()
+atexit.register(_zygote.close)
+
+
+class AppLogs:
+    """Drains a harness's stdout and stderr into a bounded ring buffer.
+
+    Nothing else reads those pipes while the app runs, and an app that fills
+    the 64 KiB pipe buffer blocks inside print(), freezing the GUI under
+    test. One reader thread per stream keeps the pipes empty. The most recent
+    `limit` bytes of both streams are kept in arrival order as
+    (offset, stream, data) chunks. Offsets count bytes across both streams
+    since launch, so get_app_logs(since=...) can read incrementally. With a
+    spill directory, every byte is also written to <dir>/<session>.<stream>.log.
+    """
+
+    def __init__(
+        self,
+        process: "subprocess.Popen[bytes] | ZygoteProcess",
+        limit: int,
+        spill_dir: str | None = None,
+        session: str = _DEFAULT_SESSION,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._chunks: collections.deque[tuple[int, str, bytes]] = collections.deque()
+        self._limit = limit
+        self._size = 0
+        self._start = 0  # offset of the oldest retained byte
+        self._end = 0
+        self.files: dict[str, str] = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            for name in _LOG_STREAMS:
+                self.files[name] = os.path.join(spill_dir, f"{session}.{name}.log")
+        self._readers = []
+        for name in _LOG_STREAMS:
+            pipe = getattr(process, name, None)
+            if pipe is None:
+                continue
+            reader = threading.Thread(target=self._drain, args=(name, pipe), daemon=True)
+            reader.start()
+            self._readers.append(reader)
+
+    def _drain(self, name: str, pipe: Any) -> None:
+        spill = open(self.files[name], "wb") if name in self.files else None
+        try:
+            fd = pipe.fileno()
+            while chunk := os.read(fd, 65536):
+                self._append(name, chunk)
+                if spill:
+                    spill.write(chunk)
+                    spill.flush()
+        except (OSError, ValueError) as e:
+            logger.debug("log_drain_error(%s): %s", name, e)
+        finally:
+            if spill:
+                spill.close()
+
+    def _append(self, name: str, chunk: bytes) -> None:
+        with self._lock:
+            self._chunks.append((self._end, name, chunk))
+            self._end += len(chunk)
+            self._size += len(chunk)
+            while self._size > self._limit:
+                offset, stream, data = self._chunks[0]
+                excess = self._size - self._limit
+                if excess >= len(data):
+                    self._chunks.popleft()
+                    self._size -= len(data)
+                else:
+                    self._chunks[0] = (offset + excess, stream, data[excess:])
+                    self._size -= excess
+            self._start = self._chunks[0][0] if self._chunks else self._end
+
+    def read(
+        self,
+        since: int = 0,
+        streams: tuple[str, ...] = _LOG_STREAMS,
+        max_bytes: int | None = None,
+    ) -> dict[str, Any]:
+        """Output of `streams` from offset `since`, oldest first.
+
+        next_offset covers chunks of unselected streams too, so it can be
+        passed back as `since` whatever the filter. dropped_bytes counts
+        output after `since` that the ring buffer has already discarded.
+        """
+        room = self._limit if max_bytes is None else max_bytes
+        parts: list[bytes] = []
+        with self._lock:
+            dropped = max(0, self._start - since)
+            position = min(max(since, self._start), self._end)
+            for offset, stream, data in self._chunks:
+                if offset + len(data) <= position:
+                    continue
+                piece = data[max(0, position - offset):]
+                if stream in streams:
+                    piece = piece[:room]
+                    parts.append(piece)
+                    room -= len(piece)
+                position = max(position, offset) + len(piece)
+                if room <= 0:
+                    break
+        return {
+            "text": b"".join(parts).decode("utf-8", "replace"),
+            "next_offset": position,
+            "dropped_bytes": dropped,
+        }
+
+    def text(self, stream: str) -> str:
+        """Everything retained for one stream."""
+        return self.read(0, (stream,))["text"]
+
+    def join(self, timeout: float) -> None:
+        """Wait for the readers to hit EOF (the app exited and closed its pipes)."""
+        deadline = time.monotonic() + timeout
+        for reader in self._readers:
+            reader.join(max(0.0, deadline - time.monotonic()))
+
+
+def _cleanup_app(state: AppState | None = None) -> None:
+    """Clean up a session's app and xvfb (the default session if not given)."""
+    if state is None:
+        state = _app_state
+    if state.connection:
+        state.connection.close()
+        state.connection = None
+
+    app_exited = True
+    if state.process:
+        try:
+            state.process.terminate()
+            state.process.wait(timeout=5)
         except Exception as e:
             logger.warning("Error terminating app: %s", e)
-        _app_state.process = None
-
-    if _app_state.xvfb_process:
+            app_exited = False
+        state.process = None
+    if state.logs:
+        state.logs.join(timeout=1)
+        state.logs = None
+
+    # A display whose app is gone goes back to the pool when there is room
+    if state.xvfb_process and app_exited and _xvfb_pool.release(state.display,
+                                                                state.xvfb_process):
+        state.xvfb_process = None
+    if state.xvfb_process:
         try:
-            _app_state.xvfb_process.terminate()
-            _app_state.xvfb_process.wait(timeout=5)
+            state.xvfb_process.terminate()
+            state.xvfb_process.wait(timeout=5)
         except Exception as e:
             logger.warning("Error terminating xvfb: %s", e)
-        _app_state.xvfb_process = None
+        state.xvfb_process = None
 
-    socket_path = _app_state.socket_path
+    socket_path = state.socket_path
     if socket_path and os.path.exists(socket_path):
         try:
             os.unlink(socket_path)
         except OSError as e:
             logger.warning("Error removing socket: %s", e)
-    _app_state.socket_path = None
+    state.socket_path = None
 
-    socket_dir = _app_state.socket_dir
+    socket_dir = state.socket_dir
     if socket_dir:
         shutil.rmtree(socket_dir, ignore_errors=True)
-    _app_state.socket_dir = None
+    state.socket_dir = None
+
 
+def _detach_app(state: AppState) -> AppState:
+    """Move a session's app handles to a new AppState, clearing them on state.
 
-def _get_process_output() -> dict[str, Any]:
-    """Get any available output from the app process."""
-    if not _app_state.process:
+    Lets a caller holding _sessions_lock claim the session and run the slow
+    _cleanup_app on the returned handles after releasing it.
+    """
+    detached = dataclasses.replace(state)
+    for field in dataclasses.fields(state):
+        setattr(state, field.name, None)
+    return detached
+
+
+def _get_process_output(state: AppState | None = None) -> dict[str, Any]:
+    """Get a session's app status and its retained stdout/stderr."""
+    if state is None:
+        state = _app_state
+    if not state.process:
         return {"stdout": "", "stderr": "", "running": False, "exit_code": None}
 
     # Check if process is still running
-    exit_code = _app_state.process.poll()
+    exit_code = state.process.poll()
     running = exit_code is None
 
-    stdout = ""
-    stderr = ""
-
-    if not running:
-        # Process has exited, get all output
-        try:
-            out, err = _app_state.process.communicate(timeout=1)
-            stdout = out.decode() if out else ""
-            stderr = err.decode() if err else ""
-        except (subprocess.TimeoutExpired, OSError) as e:
-            logger.debug("process_communicate_error: %s", e)
+    logs = state.logs
+    if logs and not running:
+        logs.join(timeout=1)  # let the readers collect output up to EOF
+    stdout = logs.text("stdout") if logs else ""
+    stderr = logs.text("stderr") if logs else ""
 
     return {
         "stdout": stdout,
@@ -124,60 +871,82 @@ def _get_process_output() -> dict[str, Any]:
     }
 
 
-def _send_command(command: dict[str, Any], timeout: float = 10.0) -> dict[str, Any]:
-    """Send a command to the test harness via Unix socket."""
-    if not _app_state.socket_path:
+def _send_command(
+    command: dict[str, Any],
+    timeout: float = 10.0,
+    state: AppState | None = None,
+) -> dict[str, Any]:
+    """Send a command to the test harness over the session's persistent connection."""
+    if state is None:
+        state = _app_state
+    if not state.socket_path:
         return {"success": False, "error": "No app is running"}
 
     # Check if process is still alive before attempting communication
-    proc_info = _get_process_output()
+    proc_info = _get_process_output(state)
     if not proc_info["running"]:
         error_msg = f"App has exited (code: {proc_info['exit_code']})"
         if proc_info["stderr"]:
-            error_msg += f"\nstderr: {proc_info['stderr'][:500]}"
+            error_msg += f"\nstderr: {proc_info['stderr'][-500:]}"
         return {"success": False, "error": error_msg}
 
+    connection = None
     try:
-        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout)
-            sock.connect(_app_state.socket_path)
-
-            data = json.dumps(command).encode() + b"\n"
-            sock.sendall(data)
-
-            response_data = b""
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                if b"\n" in response_data:
-                    break
-
-        return json.loads(response_data.decode().strip())
+        connection = state.connection
+        if connection is None or connection.closed:
+            fresh = HarnessConnection(state.socket_path, timeout)
+            # Tools run on worker threads: keep whichever connection won.
+            with _connection_lock:
+                connection = state.connection
+                if connection is None or connection.closed:
+                    connection = state.connection = fresh
+            if connection is not fresh:
+                fresh.close()
+        return connection.request(command, timeout)
     except socket.timeout:
         return {"success": False, "error": "Command timed out"}
-    except ConnectionRefusedError:
-        proc_info = _get_process_output()
+    except (ConnectionRefusedError, ConnectionResetError, BrokenPipeError) as e:
+        with _connection_lock:
+            if state.connection is connection:
+                state.connection = None
+        proc_info = _get_process_output(state)
         if not proc_info["running"]:
             error_msg = f"App crashed (exit code: {proc_info['exit_code']})"
             if proc_info["stderr"]:
-                error_msg += f"\nstderr: {proc_info['stderr'][:500]}"
+                error_msg += f"\nstderr: {proc_info['stderr'][-500:]}"
             return {"success": False, "error": error_msg}
-        return {"success": False, "error": "App not responding (connection refused)"}
+        if isinstance(e, ConnectionRefusedError):
+            return {"success": False, "error": "App not responding (connection refused)"}
+        return {"success": False, "error": f"Connection to app lost: {e}"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-@mcp.tool()
+def _running_session(session: str) -> AppState | None:
+    """The session's state if it has a launched app, else None."""
+    state = _sessions.get(session)
+    return state if state is not None and state.process else None
+
+
+def _no_app(session: str) -> dict[str, Any]:
+    if session == _DEFAULT_SESSION:
+        return {"success": False, "message": "No app is running"}
+    return {"success": False, "message": f"No app is running in session '{session}'"}
+
+
+@_tool
 def launch_app(
     script_path: str | None = None,
     module: str | None = None,
     working_dir: str | None = None,
     python_paths: list[str] | None = None,
     timeout: int = 10,
+    session: str = _DEFAULT_SESSION,
+    log_dir: str | None = None,
+    backend: str = "xvfb",
+    profile: bool = False,
 ) -> dict[str, Any]:
-    """Launch a Qt application headlessly via xvfb.
+    """Launch a Qt application headlessly (on Xvfb unless backend says otherwise).
 
     Supports two modes:
     1. Script mode: Run a Python script directly
@@ -186,15 +955,36 @@ def launch_app(
     2. Module mode: Run as Python module (like `python -m`)
        launch_app(module="src.gui.main", working_dir="/path/to/project")
 
+    Each session name gets its own Xvfb display, socket and app process, so
+    several apps (e.g. a client/server pair) can run side by side. Relaunching
+    a session replaces only that session's app.
+
+    Xvfb and the harness both signal readiness over a pipe, so launch returns
+    as soon as the app can take commands. With QT_PILOT_XVFB_POOL=N set for
+    the server, up to N pre-started displays are kept idle and reused. With
+    QT_PILOT_ZYGOTE=1, harnesses are forked from a process that has already
+    imported PySide6, falling back to a fresh interpreter when that is unsafe.
+
     Args:
         script_path: Path to Python script (mode 1)
         module: Python module path to run with -m (mode 2)
         working_dir: Working directory (required for module mode)
         python_paths: Additional paths to add to Python's sys.path (for finding modules)
         timeout: Seconds to wait for app window to appear
+        session: Session name; pass the same name to the other tools
+        log_dir: Also write the app's full stdout/stderr to
+            <log_dir>/<session>.stdout.log and .stderr.log (see get_app_logs)
+        backend: "xvfb" (default; real X11 rendering), "offscreen" (Qt's
+            offscreen platform, no X server; faster and lighter, screenshots
+            still work) or "minimal" (lightest; screenshots are rendered per
+            widget with QWidget.grab())
+        profile: Measure the app's responsiveness from the start (see
+            get_responsiveness_report)
 
     Returns:
-        {"success": bool, "message": str, "socket_path": str}
+        {"success": bool, "message": str, "socket_path": str, "display": str,
+         "backend": str, "session": str, "launch_ms": float, "xvfb_pooled": bool, "forked": bool,
+         "timings": {"xvfb_ms", "harness_ms", "connect_ms"}}
     """
     # Validate inputs
     if not script_path and not module:
@@ -206,134 +996,281 @@ def launch_app(
     if script_path and not os.path.exists(script_path):
         return {"success": False, "message": f"Script not found: {script_path}"}
 
-    # Clean up any existing app
-    _cleanup_app()
-
-    # Create socket path for communication — mkdtemp atomically creates the dir,
-    # eliminating the TOCTOU race that mktemp() had between name generation and use.
-    socket_dir = tempfile.mkdtemp(prefix="qt_gui_tester_")
-    socket_path = os.path.join(socket_dir, "qt.sock")
-    _app_state.socket_path = socket_path
-    _app_state.socket_dir = socket_dir
-
-    # Find available display number
-    display_num = _XVFB_DISPLAY_START
-    while os.path.exists(f"/tmp/.X{display_num}-lock"):
-        display_num += 1
-    display = f":{display_num}"
-    _app_state.display = display
+    if backend not in _BACKENDS:
+        return {
+            "success": False,
+            "message": f"Unknown backend: {backend!r} (use one of {', '.join(_BACKENDS)})",
+        }
 
-    try:
-        # Start Xvfb
-        xvfb_cmd = ["Xvfb", display, "-screen", "0", "1280x1024x24"]
-        _app_state.xvfb_process = subprocess.Popen(
-            xvfb_cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+    with _sessions_lock:
+        running = sum(
+            1 for name, other in _sessions.items() if other.process and name != session
         )
-        time.sleep(_XVFB_STARTUP_WAIT_SECS)
+        if running >= _MAX_SESSIONS:
+            return {
+                "success": False,
+                "message": f"Session limit reached ({_MAX_SESSIONS} running); "
+                           "close_app one first",
+            }
+        state = _sessions.setdefault(session, AppState())
+
+        # Take over any existing app in this session; it is cleaned up once the
+        # lock is released, since stopping it can block for seconds.
+        previous = _detach_app(state)
+
+        # Create socket path for communication — mkdtemp atomically creates the dir,
+        # eliminating the TOCTOU race that mktemp() had between name generation and use.
+        socket_dir = tempfile.mkdtemp(prefix="qt_gui_tester_")
+        socket_path = os.path.join(socket_dir, "qt.sock")
+        state.socket_path = socket_path
+        state.socket_dir = socket_dir
+
+        # Take a pre-started display from the pool, or pick a free one
+        pooled = None
+        display = None
+        if backend == "xvfb":
+            pooled = _xvfb_pool.acquire()
+            if pooled:
+                display, state.xvfb_process = pooled
+            else:
+                display = _reserve_display(exclude=state)
+        state.display = display
+
+    _cleanup_app(previous)
+
+    launch_start = time.perf_counter()
+    try:
+        if pooled:
+            _xvfb_pool.fill_async()
+        elif display:
+            try:
+                state.xvfb_process = _start_xvfb(display)
+            finally:
+                with _sessions_lock:
+                    _starting_displays.discard(display)
+        xvfb_done = time.perf_counter()
 
         # Build harness command
         env = os.environ.copy()
-        env["DISPLAY"] = display
-        env["QT_QPA_PLATFORM"] = "xcb"  # Use X11 backend
+        if display:
+            env["DISPLAY"] = display
+            env["QT_QPA_PLATFORM"] = "xcb"  # Use X11 backend
+        else:
+            env.pop("DISPLAY", None)
+            env["QT_QPA_PLATFORM"] = backend
 
-        harness_cmd = [sys.executable, str(HARNESS_PATH), "--socket", socket_path]
+        harness_args = ["--socket", socket_path]
 
         if script_path:
-            harness_cmd.extend(["--script", script_path])
+            harness_args.extend(["--script", script_path])
         elif module:
-            harness_cmd.extend(["--module", module])
+            harness_args.extend(["--module", module])
 
         # Determine working directory
         cwd = working_dir or (os.path.dirname(script_path) if script_path else None)
 
         # Pass working directory to harness for sys.path setup
         if cwd:
-            harness_cmd.extend(["--working-dir", cwd])
+            harness_args.extend(["--working-dir", cwd])
 
         # Add additional Python paths for module discovery
         if python_paths:
             for path in python_paths:
-                harness_cmd.extend(["--python-path", path])
+                harness_args.extend(["--python-path", path])
+
+        if profile:
+            harness_args.append("--profile")
 
-        logger.info("Launching harness: %s", " ".join(harness_cmd))
+        logger.info("Launching harness: %s", " ".join(harness_args))
         logger.info("Working dir: %s", cwd)
-        logger.info("Display: %s", display)
+        logger.info("Backend: %s, display: %s", backend, display)
         if python_paths:
             logger.info("Python paths: %s", python_paths)
 
-        # Start the harness
-        _app_state.process = subprocess.Popen(
-            harness_cmd,
-            cwd=cwd,
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-
-        # Wait for socket to be ready
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            if os.path.exists(socket_path):
-                # Try to connect
-                result = _send_command({"cmd": "ping"}, timeout=2)
-                if result.get("success"):
-                    return {
-                        "success": True,
-                        "message": "App launched successfully",
-                        "socket_path": socket_path,
-                        "display": display,
-                    }
-            time.sleep(0.5)
+        # Start the harness (forked from the zygote when enabled and safe, else
+        # a fresh interpreter); it writes to the ready pipe once its socket listens
+        ready_read, ready_write = os.pipe()
+        try:
+            try:
+                forked = None
+                if _ZYGOTE_ENABLED:
+                    forked = _zygote.fork(harness_args, cwd, env, ready_write)
+                state.process = forked or subprocess.Popen(
+                    [sys.executable, str(HARNESS_PATH), *harness_args,
+                     "--ready-fd", str(ready_write)],
+                    cwd=cwd,
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    pass_fds=(ready_write,),
+                )
+            finally:
+                os.close(ready_write)
+            state.logs = AppLogs(state.process, _LOG_BUFFER_BYTES, log_dir, session)
+            ready = _read_ready(ready_read, timeout)
+        finally:
+            os.close(ready_read)
+        harness_done = time.perf_counter()
+
+        if ready:
+            result = _send_command({"cmd": "ping"}, timeout=2, state=state)
+            if result.get("success"):
+                done = time.perf_counter()
+                timings = {
+                    "xvfb_ms": round((xvfb_done - launch_start) * 1000, 1),
+                    "harness_ms": round((harness_done - xvfb_done) * 1000, 1),
+                    "connect_ms": round((done - harness_done) * 1000, 1),
+                }
+                launch_ms = round((done - launch_start) * 1000, 1)
+                logger.info("Launched %s in %.1f ms (%s, xvfb_pooled=%s, forked=%s)",
+                            session, launch_ms, timings, bool(pooled), bool(forked))
+                return {
+                    "success": True,
+                    "message": "App launched successfully",
+                    "socket_path": socket_path,
+                    "display": display or "",
+                    "backend": backend,
+                    "session": session,
+                    "launch_ms": launch_ms,
+                    "timings": timings,
+                    "xvfb_pooled": bool(pooled),
+                    "forked": bool(forked),
+                }
+
+        # The ready pipe closes early when the harness dies; let its exit
+        # status arrive before telling a crash from a timeout
+        if not ready and harness_done - xvfb_done < timeout:
+            try:
+                state.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                pass
 
         # Check if process died
-        if _app_state.process.poll() is not None:
-            _, stderr = _app_state.process.communicate()
-            _cleanup_app()
+        if state.process.poll() is not None:
+            stderr = _get_process_output(state)["stderr"]
+            _cleanup_app(state)
             return {
                 "success": False,
-                "message": f"App exited unexpectedly. stderr: {stderr.decode()[:500]}",
+                "message": f"App exited unexpectedly. stderr: {stderr[-500:]}",
             }
 
-        _cleanup_app()
+        _cleanup_app(state)
         return {"success": False, "message": f"Timeout waiting for app (socket: {socket_path})"}
 
     except Exception as e:
-        _cleanup_app()
+        _cleanup_app(state)
         return {"success": False, "message": f"Failed to launch: {str(e)}"}
 
 
-@mcp.tool()
-def capture_screenshot(output_path: str | None = None) -> dict[str, Any]:
+@_tool
+def capture_screenshot(
+    output_path: str | None = None,
+    widget_name: str = "",
+    selector: str | None = None,
+    region: dict[str, int] | None = None,
+    scale: float | None = None,
+    max_size: int | None = None,
+    format: str | None = None,
+    quality: int = -1,
+    output: str = "file",
+    if_changed: bool = False,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """Capture screenshot of current application.
 
+    For visual checks, a cropped, downscaled capture returned inline is
+    usually all that's needed: e.g. widget_name="chart", max_size=400,
+    format="jpeg", output="base64".
+
     Args:
-        output_path: Optional path to save PNG file
+        output_path: Optional path to save the image file
+        widget_name: Capture only this widget (objectName)
+        selector: Capture only the widget this selector matches (see click_widget)
+        region: {"x", "y", "width", "height"} to crop to — in the widget's
+            coordinates with widget_name/selector, else in screen coordinates
+        scale: Shrink factor, e.g. 0.5
+        max_size: Shrink so neither side exceeds this many pixels
+        format: "png", "jpeg" or "webp" (default: output_path's extension, else png)
+        quality: 0-100 for jpeg/webp (-1 = Qt's default)
+        output: "file" (write output_path), "base64" (return the bytes inline
+            as "data", nothing written) or "shm" (write to a memory-backed file
+            under /dev/shm when output_path is not given)
+        if_changed: Skip encoding and writing when the target (same
+            widget_name/selector/region) looks exactly as at its last capture
+        session: Session name given to launch_app (default "default")
 
     Returns:
-        {"success": bool, "path": str, "message": str}
+        {"success": bool, "path": str, "message": str, "method": str,
+        "format": str, "width": int, "height": int} — with output="base64",
+        "data" (base64) and "bytes" instead of "path". method is "grabWindow",
+        or "widget_grab" for widget captures and where the platform cannot
+        grab the screen (the minimal backend) and widgets render themselves.
+        With if_changed and nothing changed: {"success": True,
+        "unchanged": True, "width", "height"} and no image
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
-
-    # Generate output path if not provided — mkstemp atomically creates the file,
-    # avoiding the TOCTOU race that mktemp() has between name generation and use.
-    if not output_path:
-        fd, output_path = tempfile.mkstemp(suffix=".png", prefix="screenshot_")
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+    if output not in _SCREENSHOT_OUTPUTS:
+        return {"success": False, "message": f"Unknown output: {output} "
+                f"(expected one of {', '.join(_SCREENSHOT_OUTPUTS)})"}
+
+    command: dict[str, Any] = {"cmd": "screenshot", **_widget_target(widget_name, selector)}
+    for key, value in (("region", region), ("scale", scale), ("max_size", max_size),
+                       ("format", format)):
+        if value is not None:
+            command[key] = value
+    if quality != -1:
+        command["quality"] = quality
+    if if_changed:
+        command["if_changed"] = True
+
+    generated_path = False
+    if output == "base64":
+        command["inline"] = True
+    elif not output_path:
+        # Generate output path if not provided — mkstemp atomically creates the file,
+        # avoiding the TOCTOU race that mktemp() has between name generation and use.
+        shm = output == "shm" and os.path.isdir(_SHM_DIR)
+        ext = (format or "png").lower()
+        suffix = ".jpg" if ext in ("jpeg", "jpg") else f".{ext}"
+        fd, output_path = tempfile.mkstemp(suffix=suffix, prefix="screenshot_",
+                                           dir=_SHM_DIR if shm else None)
         os.close(fd)
-
-    result = _send_command({
-        "cmd": "screenshot",
-        "path": output_path,
-    })
-
-    if result.get("success"):
+        generated_path = True
+    if output != "base64":
+        command["path"] = output_path
+
+    result = _send_command(command, state=app_state)
+
+    if result.get("success") and result.get("unchanged"):
+        if generated_path:
+            try:
+                os.unlink(output_path)
+            except OSError:
+                pass
         return {
             "success": True,
-            "path": output_path,
-            "message": f"Screenshot saved to {output_path}",
+            "unchanged": True,
+            "method": result.get("method", "grabWindow"),
+            "width": result.get("width"),
+            "height": result.get("height"),
+            "message": "Unchanged since the last capture",
         }
+    if result.get("success"):
+        shot = {
+            "success": True,
+            "method": result.get("method", "grabWindow"),
+            "format": result.get("format", "png"),
+            "width": result.get("width"),
+            "height": result.get("height"),
+        }
+        if output == "base64":
+            shot.update(data=result.get("data"), bytes=result.get("bytes"),
+                        message=f"Screenshot captured ({result.get('bytes')} bytes)")
+        else:
+            shot.update(path=output_path, message=f"Screenshot saved to {output_path}")
+        return shot
     else:
         return {
             "success": False,
@@ -341,102 +1278,197 @@ def capture_screenshot(output_path: str | None = None) -> dict[str, Any]:
         }
 
 
-@mcp.tool()
-def click_widget(widget_name: str, button: str = "left") -> dict[str, Any]:
-    """Click a widget by its object name.
+@_tool
+def visual_diff(
+    widget_name: str = "",
+    selector: str | None = None,
+    region: dict[str, int] | None = None,
+    baseline: str | None = None,
+    update_baseline: bool = False,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Report what changed on screen, without transferring any image.
+
+    Compares a capture of the target with its previous capture (by
+    capture_screenshot(if_changed=True) or visual_diff), or with a named
+    baseline. Useful to check that an action repainted only what it should.
+
+    Args:
+        widget_name: Compare only this widget (objectName)
+        selector: Compare only the widget this selector matches (see click_widget)
+        region: {"x", "y", "width", "height"} to crop to, as for capture_screenshot
+        baseline: Compare with the baseline of this name; the first call
+            with a new name stores the current capture as that baseline
+        update_baseline: Replace the named baseline with this capture after comparing
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "changed": bool | None, "compared_to": "previous" |
+        "baseline" | None, "diff_ratio": float (share of the area changed),
+        "changed_tiles": int, "rects": [{"x", "y", "width", "height"}]
+        (changed areas in 32 px tiles), "hash_distance": int (0-64, how
+        different the two look overall), "width": int, "height": int} —
+        "size_changed": True when the dimensions differ. changed is None
+        when there was nothing to compare with
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    command: dict[str, Any] = {"cmd": "visual_diff", **_widget_target(widget_name, selector)}
+    if region is not None:
+        command["region"] = region
+    if baseline:
+        command["baseline"] = baseline
+    if update_baseline:
+        command["update_baseline"] = True
+    result = _send_command(command, state=app_state)
+
+    if result.get("success"):
+        return result
+    else:
+        return {"success": False, "message": result.get("error", "Visual diff failed")}
+
+
+def _widget_target(widget_name: str | None, selector: str | None) -> dict[str, str]:
+    """The widget_name / selector of a command; the harness prefers the selector."""
+    target = {}
+    if widget_name:
+        target["widget_name"] = widget_name
+    if selector:
+        target["selector"] = selector
+    return target
+
+
+@_tool
+def click_widget(
+    widget_name: str = "",
+    button: str = "left",
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Click a widget by its object name or a selector.
 
     Args:
         widget_name: The objectName of the target widget
         button: "left", "right", or "middle"
+        selector: Selector instead of a name, e.g.
+            'QDialog#saveDialog > QPushButton[text="OK"]:visible' (first match)
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "click",
-        "widget_name": widget_name,
+        **_widget_target(widget_name, selector),
         "button": button,
-    })
+    }, state=app_state)
 
     if result.get("success"):
-        return {"success": True, "message": f"Clicked widget '{widget_name}'"}
+        return {"success": True, "message": f"Clicked widget '{selector or widget_name}'"}
     else:
         return {"success": False, "message": result.get("error", "Click failed")}
 
 
-@mcp.tool()
-def hover_widget(widget_name: str) -> dict[str, Any]:
-    """Hover over a widget by its object name.
+@_tool
+def hover_widget(
+    widget_name: str = "",
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Hover over a widget by its object name or a selector.
 
     Args:
         widget_name: The objectName of the target widget
+        selector: Selector instead of a name, e.g.
+            'QDialog#saveDialog > QPushButton[text="OK"]:visible' (first match)
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "hover",
-        "widget_name": widget_name,
-    })
+        **_widget_target(widget_name, selector),
+    }, state=app_state)
 
     if result.get("success"):
-        return {"success": True, "message": f"Hovering over widget '{widget_name}'"}
+        return {"success": True, "message": f"Hovering over widget '{selector or widget_name}'"}
     else:
         return {"success": False, "message": result.get("error", "Hover failed")}
 
 
-@mcp.tool()
-def type_text(text: str, widget_name: str | None = None) -> dict[str, Any]:
+@_tool
+def type_text(
+    text: str,
+    widget_name: str | None = None,
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """Type text into a widget or the currently focused widget.
 
     Args:
         text: Text to type
         widget_name: Optional target widget (uses focused widget if None)
+        selector: Selector instead of a name, e.g.
+            'QDialog#saveDialog > QPushButton[text="OK"]:visible' (first match)
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "type_text",
         "text": text,
-        "widget_name": widget_name,
-    })
+        **_widget_target(widget_name, selector),
+    }, state=app_state)
 
     if result.get("success"):
-        target = f"widget '{widget_name}'" if widget_name else "focused widget"
+        label = selector or widget_name
+        target = f"widget '{label}'" if label else "focused widget"
         return {"success": True, "message": f"Typed text into {target}"}
     else:
         return {"success": False, "message": result.get("error", "Type failed")}
 
 
-@mcp.tool()
-def press_key(key: str, modifiers: list[str] | None = None) -> dict[str, Any]:
+@_tool
+def press_key(
+    key: str,
+    modifiers: list[str] | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """Simulate a key press.
 
     Args:
         key: Key name (e.g., "Enter", "Tab", "Escape", "A", "F1")
         modifiers: Optional list of modifiers ("Ctrl", "Shift", "Alt")
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "press_key",
         "key": key,
         "modifiers": modifiers or [],
-    })
+    }, state=app_state)
 
     if result.get("success"):
         mod_str = "+".join(modifiers) + "+" if modifiers else ""
@@ -445,36 +1477,92 @@ def press_key(key: str, modifiers: list[str] | None = None) -> dict[str, Any]:
         return {"success": False, "message": result.get("error", "Key press failed")}
 
 
-@mcp.tool()
-def find_widgets(name_pattern: str = "*") -> dict[str, Any]:
+def _widget_query(
+    types: list[str] | None,
+    region: dict[str, int] | None,
+    max_depth: int | None,
+    visible: bool | None,
+    enabled: bool | None,
+    root: str | None,
+    fields: list[str] | None,
+    limit: int | None,
+    cursor: str | None,
+) -> dict[str, Any]:
+    """The filter/paging arguments of find_widgets / list_all_widgets that were given."""
+    query = {
+        "types": types, "region": region, "max_depth": max_depth, "visible": visible,
+        "enabled": enabled, "root": root, "fields": fields, "limit": limit, "cursor": cursor,
+    }
+    return {key: value for key, value in query.items() if value is not None}
+
+
+@_tool
+def find_widgets(
+    name_pattern: str = "*",
+    types: list[str] | None = None,
+    region: dict[str, int] | None = None,
+    max_depth: int | None = None,
+    visible: bool | None = None,
+    enabled: bool | None = None,
+    root: str | None = None,
+    fields: list[str] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """List widgets matching a name pattern.
 
+    The filters and paging work as for list_all_widgets; records default to
+    name, type, visible and enabled.
+
     Args:
         name_pattern: Glob pattern for widget names (* = all named widgets)
+        types: Class names to keep; base classes match too ("QAbstractButton")
+        region: {"x", "y", "width", "height"} in screen coordinates
+        max_depth: Deepest level to search (windows, or root, are 0)
+        visible: Only visible (True) or only hidden (False) widgets
+        enabled: Only enabled (True) or only disabled (False) widgets
+        root: objectName of the widget whose subtree to search
+        fields: Record keys to return (see list_all_widgets)
+        limit: Page size
+        cursor: next_cursor from the previous page
+        session: Session name given to launch_app (default "default")
 
     Returns:
-        {"success": bool, "widgets": list[dict]}
+        {"success": bool, "widgets": list[dict], "count": int}, plus
+        "next_cursor" (null on the last page) when filtering or paging
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "find_widgets",
         "pattern": name_pattern,
-    })
+        **_widget_query(types, region, max_depth, visible, enabled, root, fields, limit, cursor),
+    }, state=app_state)
 
     if result.get("success"):
-        return {
+        found = {
             "success": True,
             "widgets": result.get("widgets", []),
             "count": len(result.get("widgets", [])),
         }
+        for key in ("next_cursor", "tree_changed"):
+            if key in result:
+                found[key] = result[key]
+        return found
     else:
         return {"success": False, "message": result.get("error", "Find failed")}
 
 
-@mcp.tool()
-def click_at(x: int, y: int, button: str = "left") -> dict[str, Any]:
+@_tool
+def click_at(
+    x: int,
+    y: int,
+    button: str = "left",
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """Click at specific screen coordinates.
 
     Useful for clicking widgets that don't have object names.
@@ -483,19 +1571,21 @@ def click_at(x: int, y: int, button: str = "left") -> dict[str, Any]:
         x: X coordinate (global screen position)
         y: Y coordinate (global screen position)
         button: "left", "right", or "middle"
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str, "widget_type": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "click_at",
         "x": x,
         "y": y,
         "button": button,
-    })
+    }, state=app_state)
 
     if result.get("success"):
         widget_type = result.get("widget_type", "unknown")
@@ -504,39 +1594,79 @@ def click_at(x: int, y: int, button: str = "left") -> dict[str, Any]:
         return {"success": False, "message": result.get("error", "Click failed")}
 
 
-@mcp.tool()
-def list_all_widgets(include_invisible: bool = False) -> dict[str, Any]:
+@_tool
+def list_all_widgets(
+    include_invisible: bool = False,
+    changes_since: int | None = None,
+    types: list[str] | None = None,
+    region: dict[str, int] | None = None,
+    max_depth: int | None = None,
+    visible: bool | None = None,
+    enabled: bool | None = None,
+    root: str | None = None,
+    fields: list[str] | None = None,
+    limit: int | None = None,
+    cursor: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """List all widgets with their coordinates (including unnamed ones).
 
     Useful for understanding the complete widget hierarchy and finding
-    click targets by position.
+    click targets by position. When polling, pass the `version` of the last
+    reply as `changes_since` to receive only what changed.
+
+    On large apps, filter and page in the app instead of listing everything:
+    subtrees that can't match (hidden, disabled, outside the region, too
+    deep) are skipped, and a page stops the walk once it is full. Filtered
+    or paged listings carry no version and can't take changes_since.
 
     Args:
         include_invisible: Whether to include invisible widgets
+        changes_since: Snapshot version from an earlier call
+        types: Class names to keep; base classes match too ("QAbstractButton")
+        region: {"x", "y", "width", "height"} in screen coordinates
+        max_depth: Deepest level to list (windows, or root, are 0)
+        visible: Only visible (True) or only hidden (False); overrides include_invisible
+        enabled: Only enabled (True) or only disabled (False) widgets
+        root: objectName of the widget whose subtree to list
+        fields: Record keys to return, from id, name, type, visible, enabled,
+            x, y, width, height, global_x, global_y, depth, text
+        limit: Page size
+        cursor: next_cursor from the previous page
+        session: Session name given to launch_app (default "default")
 
     Returns:
-        {"success": bool, "widgets": list[dict], "count": int}
+        {"success": bool, "widgets": list[dict], "count": int, "version": int}, or
+        with changes_since: {"success": bool, "version": int, "since": int,
+        "full": false, "added": list[dict], "removed": list[str],
+        "changed": list[dict], "count": int} — a full listing with
+        "full": true if that version is no longer kept. Filtered or paged:
+        {"success": bool, "widgets": list[dict], "count": int,
+        "next_cursor": str | null}, plus "tree_changed": bool with a cursor
+        (widgets were added or removed since the first page)
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
-    result = _send_command({
+    command: dict[str, Any] = {
         "cmd": "list_all_widgets",
         "include_invisible": include_invisible,
-    })
+    }
+    if changes_since is not None:
+        command["changes_since"] = changes_since
+    command.update(
+        _widget_query(types, region, max_depth, visible, enabled, root, fields, limit, cursor))
+    result = _send_command(command, state=app_state)
 
     if result.get("success"):
-        return {
-            "success": True,
-            "widgets": result.get("widgets", []),
-            "count": result.get("count", 0),
-        }
+        return result
     else:
         return {"success": False, "message": result.get("error", "List failed")}
 
 
-@mcp.tool()
-def trigger_action(action_name: str) -> dict[str, Any]:
+@_tool
+def trigger_action(action_name: str, session: str = _DEFAULT_SESSION) -> dict[str, Any]:
     """Trigger a QAction by its object name.
 
     This directly triggers menu actions without needing to click through menus.
@@ -544,17 +1674,19 @@ def trigger_action(action_name: str) -> dict[str, Any]:
 
     Args:
         action_name: The objectName of the QAction to trigger
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "trigger_action",
         "action_name": action_name,
-    })
+    }, state=app_state)
 
     if result.get("success"):
         return {"success": True, "message": f"Triggered action '{action_name}'"}
@@ -562,22 +1694,26 @@ def trigger_action(action_name: str) -> dict[str, Any]:
         return {"success": False, "message": result.get("error", "Trigger failed")}
 
 
-@mcp.tool()
-def list_actions() -> dict[str, Any]:
+@_tool
+def list_actions(session: str = _DEFAULT_SESSION) -> dict[str, Any]:
     """List all QActions in the application.
 
     Returns menu items, toolbar actions, etc. with their names, text,
     shortcuts, and enabled/checked state.
 
+    Args:
+        session: Session name given to launch_app (default "default")
+
     Returns:
         {"success": bool, "actions": list[dict], "count": int}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "list_actions",
-    })
+    }, state=app_state)
 
     if result.get("success"):
         return {
@@ -589,23 +1725,31 @@ def list_actions() -> dict[str, Any]:
         return {"success": False, "message": result.get("error", "List failed")}
 
 
-@mcp.tool()
-def get_widget_info(widget_name: str) -> dict[str, Any]:
+@_tool
+def get_widget_info(
+    widget_name: str = "",
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """Get detailed information about a specific widget.
 
     Args:
         widget_name: The objectName of the target widget
+        selector: Selector instead of a name, e.g.
+            'QDialog#saveDialog > QPushButton[text="OK"]:visible' (first match)
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "info": dict} with size, position, visible, enabled, etc.
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "get_widget_info",
-        "widget_name": widget_name,
-    })
+        **_widget_target(widget_name, selector),
+    }, state=app_state)
 
     if result.get("success"):
         return {"success": True, "info": result.get("info", {})}
@@ -613,16 +1757,21 @@ def get_widget_info(widget_name: str) -> dict[str, Any]:
         return {"success": False, "message": result.get("error", "Get info failed")}
 
 
-@mcp.tool()
-def get_app_status() -> dict[str, Any]:
+@_tool
+def get_app_status(session: str = _DEFAULT_SESSION) -> dict[str, Any]:
     """Check if the application is still running and get diagnostics.
 
     Use this to check app health without attempting a command.
 
+    Args:
+        session: Session name given to launch_app (default "default")
+
     Returns:
         {"running": bool, "exit_code": int|None, "stderr": str, "display": str}
+        — stderr is the last 1000 characters; use get_app_logs for more
     """
-    if not _app_state.process:
+    app_state = _running_session(session)
+    if app_state is None:
         return {
             "running": False,
             "exit_code": None,
@@ -630,62 +1779,521 @@ def get_app_status() -> dict[str, Any]:
             "message": "No app has been launched",
         }
 
-    proc_info = _get_process_output()
+    proc_info = _get_process_output(app_state)
     return {
         "running": proc_info["running"],
         "exit_code": proc_info["exit_code"],
-        "stderr": proc_info["stderr"][:1000] if proc_info["stderr"] else "",
-        "display": _app_state.display or "",
-        "socket_path": _app_state.socket_path or "",
+        "stderr": proc_info["stderr"][-1000:],
+        "display": app_state.display or "",
+        "socket_path": app_state.socket_path or "",
     }
 
 
-@mcp.tool()
-def wait_for_idle(timeout: float = 5.0) -> dict[str, Any]:
+@_tool
+def get_app_logs(
+    since: int = 0,
+    stream: str = "all",
+    max_bytes: int = 65536,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Read the app's stdout/stderr incrementally while it runs.
+
+    Output is drained continuously into a ring buffer holding the most recent
+    output (1 MiB by default, QT_PILOT_LOG_BUFFER in the server's environment
+    changes it), so a chatty app never blocks on a full pipe. Offsets count
+    bytes across both streams since launch: pass the returned next_offset as
+    `since` to get only output that arrived after the previous call.
+
+    Args:
+        since: Offset to read from (0 = oldest output still buffered)
+        stream: "stdout", "stderr", or "all" (both, interleaved in arrival order)
+        max_bytes: Max bytes of output to return; call again from next_offset for more
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "text": str, "next_offset": int, "dropped_bytes": int,
+         "running": bool, "log_files": dict} — dropped_bytes counts output after
+        `since` already discarded from the buffer (read log_files for all of it)
+    """
+    app_state = _running_session(session)
+    if app_state is None or app_state.logs is None:
+        return _no_app(session)
+    if stream not in (*_LOG_STREAMS, "all"):
+        return {
+            "success": False,
+            "message": f"Unknown stream: {stream!r} (use stdout, stderr or all)",
+        }
+
+    streams = _LOG_STREAMS if stream == "all" else (stream,)
+    result = app_state.logs.read(max(0, since), streams, max(0, max_bytes))
+    return {
+        "success": True,
+        **result,
+        "running": app_state.process.poll() is None,
+        "log_files": dict(app_state.logs.files),
+    }
+
+
+@_tool
+def get_harness_metrics(
+    reset: bool = False,
+    histograms: bool = False,
+    jsonl_path: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Per-command timings inside the harness, to see where test time goes.
+
+    For each command type: how long requests took to decode, waited for the
+    Qt main thread (dispatch_ms) and behind other commands (queue_ms), ran
+    (handler_ms, of which process_events_ms in processEvents) and took to
+    encode and send back (reply_ms), plus request and reply sizes.
+
+    Args:
+        reset: Clear the statistics after returning them
+        histograms: Include each timing's bucket counts (bounds in "bucket_bounds_ms")
+        jsonl_path: Append one JSON line per command to this file from now
+            on, for offline analysis; "" stops
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "seconds": float (covered), "stream_to": str | None,
+        "commands": {cmd: {"count", "errors", "<timing>_ms": {"mean", "p50",
+        "p95", "p99", "max", "total"}, "request_bytes" / "reply_bytes":
+        {"mean", "max", "total"}}}} — percentiles are histogram bucket upper
+        bounds; a command's own reply is counted in the next call
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    command: dict[str, Any] = {"cmd": "get_metrics", "reset": reset, "histograms": histograms}
+    if jsonl_path is not None:
+        command["stream_to"] = os.path.abspath(jsonl_path) if jsonl_path else ""
+    result = _send_command(command, state=app_state)
+
+    if result.get("success"):
+        return result
+    else:
+        return {"success": False, "message": result.get("error", "Metrics unavailable")}
+
+
+@_tool
+def get_responsiveness_report(
+    reset: bool = False,
+    stall_ms: float | None = None,
+    stop: bool = False,
+    histograms: bool = False,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """How responsive the app under test has been: event-loop lag, stalls, repaints.
+
+    The first call starts profiling (unless launch_app(profile=True) already
+    did) and reports nothing yet; later calls report since the start or the
+    last reset. A stall is a gap of stall_ms or more in a 5 ms heartbeat on
+    the main thread, reported with the Python stack sampled during it.
+
+    Args:
+        reset: Clear the data after returning it (e.g. once per test)
+        stall_ms: Stall threshold in ms (default 100)
+        stop: Stop profiling after returning the report
+        histograms: Include bucket counts (bounds in "bucket_bounds_ms")
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "started": bool, "running": bool, "seconds": float,
+        "beats": int, "lag_ms": {"mean", "p50", "p95", "p99", "max", "total"},
+        "stall_count": int, "stalls": [{"at": float (s since start),
+        "duration_ms": float, "stack": [str] | None}] (last 100),
+        "windows": {window: {"paints": int, "paint_ms": {...}}}} —
+        percentiles are histogram bucket upper bounds
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    command: dict[str, Any] = {"cmd": "responsiveness", "reset": reset, "stop": stop,
+                               "histograms": histograms}
+    if stall_ms is not None:
+        command["stall_ms"] = stall_ms
+    result = _send_command(command, state=app_state)
+
+    if result.get("success"):
+        return result
+    else:
+        return {"success": False, "message": result.get("error", "Report unavailable")}
+
+
+@_tool
+def get_memory_report(
+    baseline: str | None = None,
+    update_baseline: bool = False,
+    max_growth: dict[str, int] | None = None,
+    top: int = 10,
+    sample_ms: float | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Memory use of the app under test, and its growth since a baseline.
+
+    To check for leaks, take a baseline, repeat an action sequence N times
+    (e.g. with run_sequence), then compare:
+    get_memory_report(baseline="start") ... get_memory_report(baseline="start",
+    max_growth={"qobjects": 0, "python_bytes": 100000}) → "bounded".
+
+    Args:
+        baseline: Compare with the state stored under this name; the first
+            call with a new name stores the current state (and starts
+            tracing Python allocations, if not yet on)
+        update_baseline: Replace the named baseline with this state after comparing
+        max_growth: Limits on growth since the baseline, keyed by
+            "rss_bytes", "python_bytes", "qobjects" or "widgets"
+        top: Entries per list (classes, allocation sites)
+        sample_ms: Sample RSS in the background at this period (0 stops);
+            the samples come back with the next report
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "rss_bytes": int, "peak_rss_bytes": int,
+        "python_bytes": int | None (traced, once a baseline exists),
+        "qobjects": int, "widgets": int, "classes": {class: count}} — with a
+        stored baseline also "growth": {key: delta}, "classes_growth":
+        {class: delta}, "allocation_sites": [{"site": "file:line",
+        "size_diff", "count_diff", "size"}], "seconds"; with max_growth
+        "bounded": bool and "exceeded": {key: growth}; with sampling
+        "rss_samples": [[seconds, bytes]]
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    command: dict[str, Any] = {"cmd": "memory", "top": top}
+    for key, value in (("baseline", baseline), ("max_growth", max_growth),
+                       ("sample_ms", sample_ms)):
+        if value is not None:
+            command[key] = value
+    if update_baseline:
+        command["update_baseline"] = True
+    result = _send_command(command, timeout=30, state=app_state)
+
+    if result.get("success"):
+        return result
+    else:
+        return {"success": False, "message": result.get("error", "Memory report failed")}
+
+
+@_tool
+def wait_for_idle(
+    timeout: float = 5.0,
+    quiet_ms: int = 100,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
     """Wait for the Qt application to process pending events.
 
-    Useful after clicks or other actions to let the UI settle.
+    Useful after clicks or other actions to let the UI settle. Returns as
+    soon as the app has been quiet (no events delivered) for quiet_ms.
 
     Args:
         timeout: Maximum seconds to wait
+        quiet_ms: Milliseconds without any event that count as idle
+        session: Session name given to launch_app (default "default")
 
     Returns:
-        {"success": bool, "message": str}
+        {"success": bool, "message": str, "idle": bool,
+         "settle_time": float | None, "elapsed": float}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     result = _send_command({
         "cmd": "wait_idle",
         "timeout": timeout,
-    }, timeout=timeout + 2)
+        "quiet_ms": quiet_ms,
+    }, timeout=timeout + 2, state=app_state)
 
     if result.get("success"):
-        return {"success": True, "message": "App is idle"}
+        idle = result.get("idle", True)
+        return {
+            "success": True,
+            "message": "App is idle" if idle else f"App still busy after {timeout}s",
+            "idle": idle,
+            "settle_time": result.get("settle_time"),
+            "elapsed": result.get("elapsed"),
+        }
     else:
         return {"success": False, "message": result.get("error", "Wait failed")}
 
 
-@mcp.tool()
-def close_app() -> dict[str, Any]:
-    """Close the currently running application.
+@_tool
+def get_model_data(
+    widget_name: str = "",
+    row: int = 0,
+    row_count: int = 100,
+    columns: list[int] | None = None,
+    roles: list[str | int] | None = None,
+    parent: list[int] | None = None,
+    if_hash: str | None = None,
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Read the data behind an item view (table, tree, list, combo box), a page at a time.
+
+    Only the requested rows are read, so large models can be paged through
+    without transferring them whole.
+
+    Args:
+        widget_name: objectName of the view (or anything with a model())
+        row: First row of the page
+        row_count: Rows in the page (at most 10000)
+        columns: Column numbers to read (default all)
+        roles: "display" (default), "edit", "tooltip", "check_state", "user",
+            or integer roles such as 257 (UserRole + 1); with more than one,
+            each cell is {role: value}
+        parent: Row path to a tree node whose children to read, e.g. [2, 0]
+        if_hash: hash from an earlier reply; an unchanged page comes back
+            as "unchanged": true with no rows
+        selector: Selector instead of a name (see click_widget)
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "model": str, "row_count": int, "column_count": int,
+        "start_row": int, "next_row": int | None, "can_fetch_more": bool,
+        "hash": str, "columns": list[int], "headers": list, "rows": list[list]},
+        plus "has_children": list[bool] for tree nodes with children
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    command: dict[str, Any] = {
+        "cmd": "get_model_data",
+        **_widget_target(widget_name, selector),
+        "row": row,
+        "row_count": row_count,
+    }
+    for key, value in (("columns", columns), ("roles", roles), ("parent", parent),
+                       ("if_hash", if_hash)):
+        if value is not None:
+            command[key] = value
+    result = _send_command(command, state=app_state)
+
+    if result.get("success"):
+        return result
+    else:
+        return {"success": False, "message": result.get("error", "Read failed")}
+
+
+@_tool
+def wait_for_widget(
+    widget_name: str = "",
+    state: str = "visible",
+    timeout: float = 10.0,
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Wait inside the app until a widget reaches a state.
+
+    Replaces polling find_widgets/get_widget_info in a loop: the condition is
+    re-checked on the Qt main thread as events arrive, and the call returns
+    as soon as it holds.
+
+    Args:
+        widget_name: The objectName of the widget
+        state: "exists", "visible", "enabled", or "gone" (missing or hidden)
+        timeout: Maximum seconds to wait
+        selector: Selector instead of a name, e.g.
+            'QDialog#saveDialog > QPushButton[text="OK"]:visible' (first match)
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "message": str, "observed": dict, "elapsed": float}
+        — observed holds the last exists/visible/enabled seen
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    result = _send_command({
+        "cmd": "wait_for_widget",
+        **_widget_target(widget_name, selector),
+        "state": state,
+        "timeout": timeout,
+    }, timeout=timeout + 2, state=app_state)
+
+    if result.get("success"):
+        return {
+            "success": True,
+            "message": f"{selector or widget_name} is {state}",
+            "observed": result.get("observed"),
+            "elapsed": result.get("elapsed"),
+        }
+    else:
+        return {
+            "success": False,
+            "message": result.get("error", "Wait failed"),
+            "observed": result.get("observed"),
+            "elapsed": result.get("elapsed"),
+        }
+
+
+@_tool
+def wait_for_property(
+    widget_name: str = "",
+    property_name: str = "",
+    equals: str | int | float | bool | None = None,
+    matches: str | None = None,
+    timeout: float = 10.0,
+    selector: str | None = None,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Wait inside the app until a widget's Qt property has a value.
+
+    Args:
+        widget_name: The objectName of the widget
+        property_name: Qt property name, e.g. "text", "checked", "currentText", "value"
+        equals: Value the property must equal
+        matches: Regular expression the property's string form must match
+            (give exactly one of equals / matches)
+        timeout: Maximum seconds to wait
+        selector: Selector instead of a name, e.g.
+            'QDialog#saveDialog > QPushButton[text="OK"]:visible' (first match)
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "message": str, "value": Any, "elapsed": float}
+        — on timeout, value is the last observed value
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    command: dict[str, Any] = {
+        "cmd": "wait_for_property",
+        **_widget_target(widget_name, selector),
+        "property": property_name,
+        "timeout": timeout,
+    }
+    if equals is not None:
+        command["equals"] = equals
+    if matches is not None:
+        command["matches"] = matches
+    result = _send_command(command, timeout=timeout + 2, state=app_state)
+
+    if result.get("success"):
+        return {
+            "success": True,
+            "message": f"{selector or widget_name}.{property_name} is {result.get('value')!r}",
+            "value": result.get("value"),
+            "elapsed": result.get("elapsed"),
+        }
+    else:
+        return {
+            "success": False,
+            "message": result.get("error", "Wait failed"),
+            "value": result.get("value"),
+            "elapsed": result.get("elapsed"),
+        }
+
+
+@_tool
+def run_sequence(
+    steps: list[dict[str, Any]],
+    stop_on_failure: bool = True,
+    timeout: float = 30.0,
+    session: str = _DEFAULT_SESSION,
+) -> dict[str, Any]:
+    """Run several harness commands in one round trip.
+
+    Steps execute in order on the Qt main thread within a single dispatch, so
+    a 20-step form fill costs one call instead of twenty.
+
+    Args:
+        steps: Harness commands, e.g. {"cmd": "click", "widget_name": "ok_btn"},
+            {"cmd": "type_text", "widget_name": "name_input", "text": "Ada"},
+            {"cmd": "wait_idle", "timeout": 0.5}. Add "expect": {"text": "42"}
+            to a step to assert on its result (e.g. get_widget_info fields).
+        stop_on_failure: Stop at the first failing step (False runs them all)
+        timeout: Seconds to wait for the whole sequence
+        session: Session name given to launch_app (default "default")
+
+    Returns:
+        {"success": bool, "steps": list[dict], "completed": int, "failed": int,
+         "elapsed_ms": float} — each step has index, cmd, success, elapsed_ms, result
+    """
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
+
+    result = _send_command({
+        "cmd": "run_sequence",
+        "steps": steps,
+        "stop_on_failure": stop_on_failure,
+    }, timeout=timeout, state=app_state)
+
+    if "steps" not in result:
+        return {"success": False, "message": result.get("error", "Sequence failed")}
+    return result
+
+
+@_tool
+def close_app(session: str = _DEFAULT_SESSION) -> dict[str, Any]:
+    """Close a session's application and its Xvfb display.
+
+    Other sessions keep running.
+
+    Args:
+        session: Session name given to launch_app (default "default")
 
     Returns:
         {"success": bool, "message": str}
     """
-    if not _app_state.process:
-        return {"success": False, "message": "No app is running"}
+    app_state = _running_session(session)
+    if app_state is None:
+        return _no_app(session)
 
     # Try graceful shutdown first
-    _send_command({"cmd": "quit"}, timeout=2)
+    _send_command({"cmd": "quit"}, timeout=2, state=app_state)
 
-    _cleanup_app()
+    _cleanup_app(app_state)
+    if session != _DEFAULT_SESSION:
+        with _sessions_lock:
+            _sessions.pop(session, None)
     return {"success": True, "message": "App closed"}
 
 
+@_tool
+def list_sessions() -> dict[str, Any]:
+    """List launched app sessions and whether each is still running.
+
+    Returns:
+        {"success": bool, "sessions": list[dict], "count": int, "max_sessions": int}
+        — each session has session, running, exit_code, display, socket_path
+    """
+    with _sessions_lock:
+        states = [(name, state) for name, state in _sessions.items() if state.process]
+    sessions = []
+    for name, state in states:
+        proc_info = _get_process_output(state)
+        sessions.append({
+            "session": name,
+            "running": proc_info["running"],
+            "exit_code": proc_info["exit_code"],
+            "display": state.display or "",
+            "socket_path": state.socket_path or "",
+        })
+    return {
+        "success": True,
+        "sessions": sessions,
+        "count": len(sessions),
+        "max_sessions": _MAX_SESSIONS,
+    }
+
+
 def main() -> None:
     """Run the MCP server."""
     logger.info("Starting Qt GUI Testing MCP Server")
+    _xvfb_pool.fill_async()
+    if _ZYGOTE_ENABLED:
+        _zygote.start_async()
     mcp.run(transport="stdio")
 
 
@@ -2,15 +2,20 @@
 
 All Qt classes (QApplication, QTest, QWidget, etc.) are mocked so no real
 display or Qt event loop is required.  CommandDispatcher is tested with real
-threading by calling _process_pending() manually from the "main" thread while
-dispatch() blocks in a background thread.
+threading by calling _drain() manually from the "main" thread (standing in
+for the queued wakeup signal) while dispatch() blocks in a background thread.
 """
 
 from __future__ import annotations
 
+import enum
+import json
+import os
+import socket as socket_mod
 import sys
 import threading
 import time
+import tracemalloc
 import types
 import unittest.mock as mock
 from pathlib import Path
@@ -47,6 +52,33 @@ def _make_qt_stubs() -> None:
         class ConnectionType:
             QueuedConnection = 2
 
+        class GlobalColor:
+            black = 2
+
+        class ItemDataRole:
+            DisplayRole = 0
+            EditRole = 2
+            ToolTipRole = 3
+            CheckStateRole = 10
+            UserRole = 256
+
+        class Orientation:
+            Horizontal = 1
+
+        class AspectRatioMode:
+            IgnoreAspectRatio = 1
+
+        class TransformationMode:
+            SmoothTransformation = 1
+
+        class TimerType:
+            PreciseTimer = 0
+
+        class CheckState(enum.Enum):
+            Unchecked = 0
+            PartiallyChecked = 1
+            Checked = 2
+
     class _QTimer:
         def __init__(self, *args, **kwargs):
             self._interval = 0
@@ -55,6 +87,9 @@ def _make_qt_stubs() -> None:
         def setInterval(self, ms: int) -> None:
             self._interval = ms
 
+        def setTimerType(self, timer_type) -> None:
+            pass
+
         def start(self) -> None:
             pass
 
@@ -76,6 +111,35 @@ def _make_qt_stubs() -> None:
         def __init__(self, parent=None):
             pass
 
+    class _QEvent:
+        class Type:
+            Move = 13
+            Resize = 14
+            Show = 17
+            Hide = 18
+            EnabledChange = 98
+            LayoutRequest = 76
+            Paint = 12
+            ChildAdded = 68
+            ChildPolished = 69
+            ChildRemoved = 71
+            UpdateRequest = 77
+            DeferredDelete = 52
+
+        def __init__(self, etype, child=None):
+            self._type = etype
+            self._child = child
+
+        def type(self):
+            return self._type
+
+        def child(self):
+            return self._child
+
+    class _QModelIndex:
+        def isValid(self):
+            return False
+
     class _QPoint:
         def __init__(self, x=0, y=0):
             self._x = x
@@ -88,7 +152,13 @@ def _make_qt_stubs() -> None:
             return self._y
 
     class _QCoreApplication:
-        pass
+        @staticmethod
+        def instance():
+            return None
+
+        @staticmethod
+        def sendPostedEvents(receiver=None, event_type=0):
+            pass
 
     def _Slot(*args):
         """Stub @Slot decorator — returns the function unchanged."""
@@ -96,13 +166,45 @@ def _make_qt_stubs() -> None:
             return fn
         return _decorator
 
+    class _BoundSignal:
+        def __init__(self):
+            self.emit_count = 0
+
+        def connect(self, fn, *args):
+            pass
+
+        def emit(self, *args):
+            # No event loop: record the wakeup; tests deliver it by hand.
+            self.emit_count += 1
+
+    class _Signal:
+        """Stub Signal descriptor — one recording _BoundSignal per instance."""
+        def __init__(self, *types):
+            pass
+
+        def __set_name__(self, owner, name):
+            self._attr = f"_signal_{name}"
+
+        def __get__(self, obj, objtype=None):
+            if obj is None:
+                return self
+            if not hasattr(obj, self._attr):
+                setattr(obj, self._attr, _BoundSignal())
+            return getattr(obj, self._attr)
+
     qtcore_mod = types.ModuleType("PySide6.QtCore")
     qtcore_mod.Qt = _Qt
     qtcore_mod.QTimer = _QTimer
     qtcore_mod.QObject = _QObject
+    qtcore_mod.QEvent = _QEvent
     qtcore_mod.QPoint = _QPoint
+    qtcore_mod.QModelIndex = _QModelIndex
+    qtcore_mod.QRect = MagicMock
+    qtcore_mod.QBuffer = MagicMock
+    qtcore_mod.QIODevice = MagicMock()
     qtcore_mod.QCoreApplication = _QCoreApplication
     qtcore_mod.Slot = _Slot
+    qtcore_mod.Signal = _Signal
 
     # PySide6.QtGui stubs
     class _QAction:
@@ -138,6 +240,11 @@ def _make_qt_stubs() -> None:
     qtgui_mod = types.ModuleType("PySide6.QtGui")
     qtgui_mod.QAction = _QAction
     qtgui_mod.QGuiApplication = _QGuiApplication
+    qtgui_mod.QPainter = MagicMock
+    qtgui_mod.QPixmap = MagicMock
+    qtgui_mod.QImageWriter = MagicMock()
+    qtgui_mod.QImage = MagicMock()
+    qtgui_mod.QImageWriter.supportedImageFormats.return_value = [b"png", b"jpeg", b"webp"]
 
     # PySide6.QtTest stubs
     class _QTest:
@@ -191,21 +298,39 @@ def _make_qt_stubs() -> None:
         def mapToGlobal(self, pt):
             return pt
 
+        def grab(self):
+            return None
+
         def findChildren(self, typ, name=""):
             return []
 
         def children(self):
             return []
 
+        def parentWidget(self):
+            return None
+
         def actions(self):
             return []
 
         def isModal(self):
             return False
 
+        def property(self, name):
+            return None
+
         def winId(self):
             return 0
 
+        def installEventFilter(self, obj):
+            pass
+
+        def removeEventFilter(self, obj):
+            pass
+
+        def event(self, event):
+            return True
+
     class _QApplication:
         _instance = None
 
@@ -218,6 +343,13 @@ def _make_qt_stubs() -> None:
         def topLevelWidgets(self):
             return self._top_levels
 
+        def allWidgets(self):
+            return [w for top in self._top_levels
+                    for w in (top, *top.findChildren(_QWidget))]
+
+        def findChildren(self, typ, name=""):
+            return []
+
         def activeWindow(self):
             return self._active
 
@@ -230,6 +362,9 @@ def _make_qt_stubs() -> None:
         def processEvents(self):
             pass
 
+        def installEventFilter(self, obj):
+            self._event_filter = obj
+
         def closingDown(self):
             return False
 
@@ -272,19 +407,24 @@ def _make_qt_stubs() -> None:
 # Install stubs before importing harness
 _make_qt_stubs()
 
-# Also stub mcp.server.fastmcp since main.py uses it (harness.py does not)
-_mcp_mod = types.ModuleType("mcp")
-_mcp_server = types.ModuleType("mcp.server")
-_mcp_fastmcp = types.ModuleType("mcp.server.fastmcp")
-_mcp_fastmcp.FastMCP = MagicMock
-sys.modules["mcp"] = _mcp_mod
-sys.modules["mcp.server"] = _mcp_server
-sys.modules["mcp.server.fastmcp"] = _mcp_fastmcp
+# Also stub mcp.server.fastmcp where it isn't installed, since main.py uses it
+# (harness.py does not); test_main drives the real server when it is.
+try:
+    import mcp.server.fastmcp  # noqa: F401
+except ImportError:
+    _mcp_mod = types.ModuleType("mcp")
+    _mcp_server = types.ModuleType("mcp.server")
+    _mcp_fastmcp = types.ModuleType("mcp.server.fastmcp")
+    _mcp_fastmcp.FastMCP = MagicMock
+    sys.modules["mcp"] = _mcp_mod
+    sys.modules["mcp.server"] = _mcp_server
+    sys.modules["mcp.server.fastmcp"] = _mcp_fastmcp
 
 # Now import harness from its actual location
 _HARNESS_PATH = Path(__file__).parent.parent
 sys.path.insert(0, str(_HARNESS_PATH))
 import harness  # noqa: E402
+import main as qt_main  # noqa: E402
 
 # Pull out the classes and the Qt stubs
 CommandHandler = harness.CommandHandler
@@ -330,8 +470,205 @@ def _make_widget(name="myWidget", visible=True, enabled=True):
     return w
 
 
+class _NamedAction(sys.modules["PySide6.QtGui"].QAction):
+    def __init__(self, name):
+        self.name = name
+        self.triggered = 0
+
+    def objectName(self):
+        return self.name
+
+    def trigger(self):
+        self.triggered += 1
+
+
+# ===========================================================================
+# _ObjectIndex tests
+# ===========================================================================
+
+class TestObjectIndex:
+    def _index(self, app):
+        index = harness._ObjectIndex(app)
+        index.rebuild = MagicMock(wraps=index.rebuild)
+        return index
+
+    def test_installs_itself_as_app_event_filter(self):
+        app, handler = _make_app_and_handler()
+        assert app._event_filter is handler.index
+
+    def test_initial_walk_indexes_named_descendants(self):
+        app = _QApplication()
+        window = _make_widget("win")
+        child = _make_widget("child")
+        action = _NamedAction("saveAction")
+        window.findChildren.return_value = [child, action, _make_widget("")]
+        app._top_levels = [window]
+        index = self._index(app)
+        assert index.widget("child") is child
+        assert index.action("saveAction") is action
+        index.rebuild.assert_not_called()
+
+    def test_child_added_event_indexes_without_rebuild(self):
+        app = _QApplication()
+        index = self._index(app)
+        late = _make_widget("late")
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        assert index.eventFilter(None, QEvent(QEvent.Type.ChildPolished, late)) is False
+        assert index.widget("late") is late
+        index.rebuild.assert_not_called()
+
+    def test_child_removed_event_drops_entry(self):
+        app = _QApplication()
+        index = self._index(app)
+        gone = _make_widget("gone")
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        index.eventFilter(None, QEvent(QEvent.Type.ChildAdded, gone))
+        index.eventFilter(None, QEvent(QEvent.Type.ChildRemoved, gone))
+        assert index.widget("gone") is None
+
+    def test_renamed_entry_is_stale_and_rebuilt(self):
+        app = _QApplication()
+        widget = _make_widget("old")
+        app._top_levels = [widget]
+        index = self._index(app)
+        widget.objectName.return_value = "new"
+        assert index.widget("old") is None
+        assert index.widget("new") is widget
+        index.rebuild.assert_called_once()  # the rebuild for "old" indexed "new"
+
+    def test_deleted_cpp_object_is_stale(self):
+        app = _QApplication()
+        widget = _make_widget("w")
+        app._top_levels = [widget]
+        index = self._index(app)
+        app._top_levels = []
+        widget.objectName.side_effect = RuntimeError("Internal C++ object already deleted")
+        assert index.widget("w") is None
+
+
 # ===========================================================================
 # CommandHandler tests
+class _FakeImage:
+    """Solid-colour image; paint() changes one pixel, as seen by its tile checksum."""
+
+    def __init__(self, width, height, thumb=bytes(range(72))):
+        self.w, self.h, self.thumb, self.painted = width, height, thumb, set()
+
+    def width(self):
+        return self.w
+
+    def height(self):
+        return self.h
+
+    def convertToFormat(self, _fmt):
+        return self
+
+    def copy(self, x, y, w, h):
+        tile = MagicMock()
+        dirty = any(x <= px < x + w and y <= py < y + h for px, py in self.painted)
+        tile.constBits.return_value = bytes([dirty]) * (w * h * 4)
+        return tile
+
+    def scaled(self, *_args):
+        thumb = MagicMock()
+        thumb.convertToFormat.return_value = thumb
+        thumb.constBits.return_value = self.thumb
+        thumb.bytesPerLine.return_value = 9
+        return thumb
+
+
+class TestFingerprints:
+    def test_tiles_cover_the_image_including_partial_edges(self):
+        fingerprint = harness._fingerprint(_FakeImage(70, 40))
+        assert (fingerprint["width"], fingerprint["height"]) == (70, 40)
+        assert [len(row) for row in fingerprint["tiles"]] == [3, 3]
+        assert fingerprint["dhash"] == 0  # thumbnail brightens left to right
+
+    def test_changed_tiles_merge_into_rectangles(self):
+        before = harness._fingerprint(_FakeImage(128, 128))
+        image = _FakeImage(128, 128)
+        image.painted = {(5, 5), (40, 5), (40, 40), (100, 100)}
+        diff = harness._compare_fingerprints(before, harness._fingerprint(image))
+        assert diff["changed"] is True and diff["changed_tiles"] == 4
+        assert diff["rects"] == [{"x": 0, "y": 0, "width": 64, "height": 32},
+                                 {"x": 32, "y": 32, "width": 32, "height": 32},
+                                 {"x": 96, "y": 96, "width": 32, "height": 32}]
+        assert diff["diff_ratio"] == 0.25 and diff["hash_distance"] == 0
+
+    def test_vertical_runs_of_the_same_width_grow_one_rectangle(self):
+        before = harness._fingerprint(_FakeImage(64, 100))
+        image = _FakeImage(64, 100)
+        image.painted = {(1, 1), (1, 40), (1, 70), (1, 99)}
+        diff = harness._compare_fingerprints(before, harness._fingerprint(image))
+        assert diff["rects"] == [{"x": 0, "y": 0, "width": 32, "height": 100}]
+        assert diff["diff_ratio"] == 0.5
+
+    def test_size_change_is_a_full_change(self):
+        diff = harness._compare_fingerprints(harness._fingerprint(_FakeImage(64, 64)),
+                                             harness._fingerprint(_FakeImage(32, 64)))
+        assert diff["size_changed"] is True and diff["diff_ratio"] == 1.0
+        assert diff["rects"] == [{"x": 0, "y": 0, "width": 32, "height": 64}]
+
+
+class TestVisualDiff:
+    def _handler(self):
+        _, handler = _make_app_and_handler()
+        widget = _make_widget("chart")
+        handler.index.widget = MagicMock(return_value=widget)
+        return handler, widget
+
+    def _frames(self, *images):
+        return patch.object(harness, "_fingerprint",
+                            side_effect=[harness._fingerprint(image) for image in images])
+
+    def test_if_changed_skips_encoding_an_unchanged_capture(self):
+        handler, widget = self._handler()
+        cmd = {"cmd": "screenshot", "widget_name": "chart", "path": "/tmp/x.png",
+               "if_changed": True}
+        changed = _FakeImage(64, 64)
+        changed.painted = {(0, 0)}
+        with self._frames(_FakeImage(64, 64), _FakeImage(64, 64), changed):
+            first, second, third = (handler.handle(dict(cmd)) for _ in range(3))
+        assert "unchanged" not in first and "unchanged" not in third
+        assert second["success"] is True and second["unchanged"] is True
+        assert widget.grab.return_value.save.call_count == 2
+
+    def test_diff_against_previous_frame(self):
+        handler, _ = self._handler()
+        changed = _FakeImage(64, 64)
+        changed.painted = {(40, 40)}
+        cmd = {"cmd": "visual_diff", "widget_name": "chart"}
+        with self._frames(_FakeImage(64, 64), changed):
+            first = handler.handle(dict(cmd))
+            second = handler.handle(dict(cmd))
+        assert first["changed"] is None and first["compared_to"] is None
+        assert second["changed"] is True and second["compared_to"] == "previous"
+        assert second["rects"] == [{"x": 32, "y": 32, "width": 32, "height": 32}]
+
+    def test_named_baseline_is_kept_until_updated(self):
+        handler, _ = self._handler()
+        changed = _FakeImage(64, 64)
+        changed.painted = {(0, 0)}
+        cmd = {"cmd": "visual_diff", "widget_name": "chart", "baseline": "start"}
+        with self._frames(_FakeImage(64, 64), changed, changed, changed):
+            saved = handler.handle(dict(cmd))
+            first = handler.handle(dict(cmd))
+            updated = handler.handle({**cmd, "update_baseline": True})
+            after = handler.handle(dict(cmd))
+        assert saved["changed"] is None and "start" in saved["message"]
+        assert first["changed"] is True and updated["changed"] is True
+        assert after["changed"] is False and after["compared_to"] == "baseline"
+
+    def test_frame_history_is_bounded(self):
+        handler, _ = self._handler()
+        with patch.object(harness, "_fingerprint",
+                          return_value=harness._fingerprint(_FakeImage(8, 8))):
+            for x in range(harness._FINGERPRINT_HISTORY + 5):
+                handler.handle({"cmd": "visual_diff", "widget_name": "chart",
+                                "region": {"x": x, "y": 0, "width": 8, "height": 8}})
+        assert len(handler._frames) == harness._FINGERPRINT_HISTORY
+
+
 # ===========================================================================
 
 class TestHandlePing:
@@ -349,6 +686,104 @@ class TestHandleUnknown:
         assert "Unknown command" in result["error"]
 
 
+class TestHandleScreenshot:
+    def _handler(self, active=None, windows=()):
+        app, handler = _make_app_and_handler()
+        app.activeWindow = lambda: active
+        app.topLevelWidgets = lambda: list(windows)
+        return handler
+
+    def _screen(self, null):
+        screen = MagicMock()
+        screen.grabWindow.return_value.isNull.return_value = null
+        return screen
+
+    def test_grabs_active_window_from_screen(self):
+        window = _make_widget("main")
+        window.winId.return_value = 42
+        screen = self._screen(null=False)
+        with patch.object(harness.QGuiApplication, "primaryScreen", return_value=screen):
+            result = self._handler(active=window, windows=[window]).handle(
+                {"cmd": "screenshot", "path": "/tmp/x.png"})
+        screen.grabWindow.assert_called_once_with(42)
+        assert result["success"] is True and result["path"] == "/tmp/x.png"
+        assert result["method"] == "grabWindow" and result["format"] == "png"
+
+    def test_falls_back_to_widget_grab_when_screen_grab_is_null(self):
+        window = _make_widget("main")
+        with patch.object(harness.QGuiApplication, "primaryScreen",
+                          return_value=self._screen(null=True)):
+            result = self._handler(active=window, windows=[window]).handle(
+                {"cmd": "screenshot", "path": "/tmp/x.png"})
+        window.grab.return_value.save.assert_called_once_with("/tmp/x.png", "PNG", -1)
+        assert result["method"] == "widget_grab"
+
+    def test_fallback_composes_all_visible_windows(self):
+        windows = [_make_widget("a"), _make_widget("b")]
+        for window in windows:
+            window.isModal.return_value = False
+        painter = MagicMock()
+        with patch.object(harness.QGuiApplication, "primaryScreen",
+                          return_value=self._screen(null=True)), \
+             patch.object(harness, "QPixmap") as pixmap_cls, \
+             patch.object(harness, "QPainter", return_value=painter):
+            result = self._handler(windows=windows).handle({"cmd": "screenshot"})
+        assert result["success"] is True and result["method"] == "widget_grab"
+        assert painter.drawPixmap.call_count == 2
+        painter.end.assert_called_once()
+        pixmap_cls.return_value.save.assert_called_once()
+
+    def test_widget_capture_crops_scales_and_returns_inline(self):
+        _, handler = _make_app_and_handler()
+        widget = _make_widget("chart")
+        handler.index.widget = MagicMock(return_value=widget)
+        pixmap = widget.grab.return_value
+        pixmap.width.return_value, pixmap.height.return_value = 800, 400
+        scaled = pixmap.scaled.return_value
+        scaled.width.return_value, scaled.height.return_value = 400, 200
+        with patch.object(harness, "QBuffer") as buffer_cls:
+            buffer_cls.return_value.data.return_value = b"\xff\xd8jpeg"
+            result = handler.handle({"cmd": "screenshot", "widget_name": "chart",
+                                     "region": {"x": 0, "y": 0, "width": 800, "height": 400},
+                                     "max_size": 400, "format": "jpg", "quality": 70,
+                                     "inline": True})
+        assert widget.grab.call_count == 1 and widget.grab.call_args[0]  # cropped grab
+        assert pixmap.scaled.call_args[0][:2] == (400, 200)
+        scaled.save.assert_called_once_with(buffer_cls.return_value, "JPEG", 70)
+        assert result["data"] == "/9hqcGVn" and result["bytes"] == 6
+        assert (result["format"], result["width"], result["height"]) == ("jpeg", 400, 200)
+        assert result["method"] == "widget_grab" and "path" not in result
+
+    def test_screen_region_grabs_only_that_rectangle(self):
+        screen = self._screen(null=False)
+        with patch.object(harness.QGuiApplication, "primaryScreen", return_value=screen), \
+             patch.object(harness, "QRect") as rect_cls:
+            rect = rect_cls.return_value
+            rect.x.return_value, rect.y.return_value = 10, 20
+            rect.width.return_value, rect.height.return_value = 300, 200
+            result = self._handler(windows=[_make_widget("main")]).handle(
+                {"cmd": "screenshot", "path": "/tmp/x.webp",
+                 "region": {"x": 10, "y": 20, "width": 300, "height": 200}})
+        screen.grabWindow.assert_called_once_with(0, 10, 20, 300, 200)
+        screen.grabWindow.return_value.save.assert_called_once_with("/tmp/x.webp", "WEBP", -1)
+        assert result["format"] == "webp"
+
+    def test_rejects_unknown_formats_and_regions(self):
+        handler = self._handler()
+        bad_format = handler.handle({"cmd": "screenshot", "format": "gif"})
+        assert bad_format["success"] is False and "gif" in bad_format["error"]
+        bad_region = handler.handle({"cmd": "screenshot", "region": {"x": 1}})
+        assert bad_region["success"] is False and "region" in bad_region["error"]
+        missing = handler.handle({"cmd": "screenshot", "selector": "QDialog"})
+        assert missing == {"success": False, "error": "Widget not found: QDialog"}
+
+    def test_fallback_without_windows_reports_error(self):
+        with patch.object(harness.QGuiApplication, "primaryScreen",
+                          return_value=self._screen(null=True)):
+            result = self._handler().handle({"cmd": "screenshot"})
+        assert result == {"success": False, "error": "No visible window to capture"}
+
+
 class TestHandleClick:
     def test_click_widget_not_found(self):
         app, handler = _make_app_and_handler()
@@ -527,6 +962,19 @@ class TestHandleFindWidgets:
         assert result["success"] is True
         assert result["widgets"] == []
 
+    def test_find_widgets_keeps_first_widget_per_name(self):
+        app, handler = _make_app_and_handler()
+        window = _make_widget("win")
+        first, dup, other = _make_widget("btn"), _make_widget("btn"), _make_widget("ok")
+        first.isEnabled.return_value = False
+        window.findChildren = MagicMock(return_value=[first, dup, other])
+        app._top_levels = [window]
+
+        result = handler.handle({"cmd": "find_widgets", "pattern": "*"})
+        assert [w["name"] for w in result["widgets"]] == ["win", "btn", "ok"]
+        assert result["widgets"][1]["enabled"] is False
+        window.findChildren.assert_called_once()
+
 
 class TestHandleListAllWidgets:
     def test_list_all_widgets_empty(self):
@@ -550,8 +998,316 @@ class TestHandleListAllWidgets:
         assert "height" in w
         assert "x" in w
         assert "y" in w
+        assert "version" in result
 
 
+
+class TestWidgetQueries:
+    def _tree(self):
+        """win > [panel > [btn_a, btn_b (disabled)], hidden > [inner]]"""
+        QWidget = sys.modules["PySide6.QtWidgets"].QWidget
+
+        class QAbstractButton(QWidget):
+            pass
+
+        class QPushButton(QAbstractButton):
+            pass
+
+        app, handler = _make_app_and_handler()
+        win, panel, hidden = _make_widget("win"), _make_widget("panel"), _make_widget("hidden")
+        hidden.isVisible.return_value = False
+        inner = _make_widget("inner", visible=False)
+        buttons = []
+        for name in ("btn_a", "btn_b"):
+            button = _make_widget(name)
+            button.__class__ = QPushButton
+            buttons.append(button)
+        buttons[1].isEnabled.return_value = False
+        win.children.return_value = [panel, hidden]
+        panel.children.return_value = buttons
+        hidden.children.return_value = [inner]
+        app._top_levels = [win]
+        return app, handler, win, panel, hidden, inner, buttons
+
+    def _names(self, result):
+        return [w["name"] for w in result["widgets"]]
+
+    def test_types_match_base_classes(self):
+        _, handler, *_ = self._tree()
+        result = handler.handle({"cmd": "list_all_widgets", "types": ["QAbstractButton"]})
+        assert self._names(result) == ["btn_a", "btn_b"]
+        assert "version" not in result
+
+    def test_disabled_and_invisible_subtrees_are_pruned(self):
+        _, handler, _, panel, hidden, inner, _ = self._tree()
+        result = handler.handle({"cmd": "list_all_widgets", "enabled": True})
+        assert self._names(result) == ["win", "panel", "btn_a"]
+        # hidden is excluded by the default include_invisible=False, so its
+        # child is never visited.
+        inner.isVisible.assert_not_called()
+
+        hidden_only = handler.handle({"cmd": "list_all_widgets", "visible": False})
+        assert self._names(hidden_only) == ["hidden", "inner"]
+
+    def test_max_depth_and_root(self):
+        _, handler, _, panel, *_ = self._tree()
+        handler.index.widget = MagicMock(return_value=panel)
+        shallow = handler.handle({"cmd": "list_all_widgets", "max_depth": 1})
+        assert self._names(shallow) == ["win", "panel"]
+        subtree = handler.handle({"cmd": "list_all_widgets", "root": "panel", "max_depth": 0})
+        assert self._names(subtree) == ["panel"]
+
+        handler.index.widget = MagicMock(return_value=None)
+        missing = handler.handle({"cmd": "list_all_widgets", "root": "nope"})
+        assert missing == {"success": False, "error": "Widget not found: nope"}
+
+    def test_region_prunes_widgets_outside_it(self):
+        _, handler, win, panel, *_ = self._tree()
+        outside = MagicMock()
+        outside.x.return_value, outside.y.return_value = 500, 500
+        panel.mapToGlobal.return_value = outside
+        result = handler.handle({"cmd": "list_all_widgets",
+                                 "region": {"x": 0, "y": 0, "width": 200, "height": 200}})
+        assert self._names(result) == ["win"]
+        panel.children.assert_not_called()
+
+    def test_fields_project_records(self):
+        _, handler, *_ = self._tree()
+        result = handler.handle({"cmd": "list_all_widgets", "fields": ["name", "depth"],
+                                 "limit": 10})
+        assert result["widgets"][0] == {"name": "win", "depth": 0}
+
+        snapshot = handler.handle({"cmd": "list_all_widgets", "fields": ["name"]})
+        assert snapshot["widgets"][0] == {"name": "win"} and "version" in snapshot
+
+        bad = handler.handle({"cmd": "list_all_widgets", "fields": ["colour"]})
+        assert bad["success"] is False and "colour" in bad["error"]
+
+    def test_limit_and_cursor_page_through_the_walk(self):
+        _, handler, _, _, _, _, buttons = self._tree()
+        first = handler.handle({"cmd": "list_all_widgets", "limit": 2})
+        assert self._names(first) == ["win", "panel"] and first["next_cursor"]
+        buttons[1].isVisible.assert_not_called()
+
+        second = handler.handle({"cmd": "list_all_widgets", "limit": 2,
+                                 "cursor": first["next_cursor"]})
+        assert self._names(second) == ["btn_a", "btn_b"]
+        assert second["tree_changed"] is False and second["next_cursor"] is None
+
+    def test_cursor_reports_tree_changes(self):
+        _, handler, *_ = self._tree()
+        first = handler.handle({"cmd": "list_all_widgets", "limit": 1})
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        handler.index.eventFilter(None, QEvent(QEvent.Type.Resize))
+        second = handler.handle({"cmd": "list_all_widgets", "limit": 1,
+                                 "cursor": first["next_cursor"]})
+        assert second["tree_changed"] is True
+
+    def test_changes_since_cannot_be_filtered(self):
+        _, handler, *_ = self._tree()
+        result = handler.handle({"cmd": "list_all_widgets", "changes_since": 1, "limit": 5})
+        assert result["success"] is False
+
+    def test_find_widgets_filters_and_pages(self):
+        _, handler, *_ = self._tree()
+        result = handler.handle({"cmd": "find_widgets", "pattern": "btn_*", "enabled": True})
+        assert result["widgets"] == [
+            {"name": "btn_a", "type": "QPushButton", "visible": True, "enabled": True}]
+
+        page = handler.handle({"cmd": "find_widgets", "pattern": "*", "limit": 3})
+        assert self._names(page) == ["win", "panel", "btn_a"]
+        rest = handler.handle({"cmd": "find_widgets", "pattern": "*", "limit": 3,
+                               "cursor": page["next_cursor"]})
+        assert self._names(rest) == ["btn_b", "hidden", "inner"]
+
+class TestWidgetSnapshots:
+    def _setup(self):
+        app, handler = _make_app_and_handler()
+        window = _make_widget("win")
+        child = _make_widget("child")
+        window.children = MagicMock(return_value=[child])
+        app._top_levels = [window]
+        return app, handler, window, child
+
+    def _tree_changed(self, handler):
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        handler.index.eventFilter(None, QEvent(QEvent.Type.Resize))
+
+    def test_unknown_version_returns_full_listing(self):
+        _, handler, _, _ = self._setup()
+        result = handler.handle({"cmd": "list_all_widgets", "changes_since": 999})
+        assert result["full"] is True
+        assert result["count"] == 2 and len(result["widgets"]) == 2
+
+    def test_no_changes_returns_empty_diff_without_walking(self):
+        _, handler, window, _ = self._setup()
+        version = handler.handle({"cmd": "list_all_widgets"})["version"]
+        window.children.reset_mock()
+
+        result = handler.handle({"cmd": "list_all_widgets", "changes_since": version})
+        assert result["full"] is False
+        assert result["version"] == version
+        assert result["added"] == result["removed"] == result["changed"] == []
+        window.children.assert_not_called()
+
+    def test_diff_reports_changed_added_and_removed(self):
+        _, handler, window, child = self._setup()
+        first = handler.handle({"cmd": "list_all_widgets"})
+        child_id = first["widgets"][1]["id"]
+
+        child.isEnabled.return_value = False
+        newcomer = _make_widget("new")
+        window.children.return_value = [child, newcomer]
+        self._tree_changed(handler)
+        second = handler.handle({"cmd": "list_all_widgets", "changes_since": first["version"]})
+        assert second["version"] > first["version"]
+        assert [w["id"] for w in second["changed"]] == [child_id]
+        assert second["changed"][0]["enabled"] is False
+        assert [w["name"] for w in second["added"]] == ["new"]
+
+        window.children.return_value = [newcomer]
+        self._tree_changed(handler)
+        third = handler.handle({"cmd": "list_all_widgets", "changes_since": second["version"]})
+        assert third["removed"] == [child_id]
+        assert third["added"] == third["changed"] == []
+
+    def test_version_is_stable_when_walk_finds_nothing_new(self):
+        _, handler, _, _ = self._setup()
+        version = handler.handle({"cmd": "list_all_widgets"})["version"]
+        self._tree_changed(handler)  # e.g. a repaint that changed nothing listed
+        assert handler.handle({"cmd": "list_all_widgets"})["version"] == version
+
+    def test_old_versions_are_evicted(self):
+        _, handler, _, child = self._setup()
+        first = handler.handle({"cmd": "list_all_widgets"})["version"]
+        for width in range(harness._SNAPSHOT_HISTORY):
+            child.geometry.return_value.width.return_value = width
+            handler.handle({"cmd": "list_all_widgets"})
+        assert handler.handle({"cmd": "list_all_widgets", "changes_since": first})["full"] is True
+
+
+
+class TestSelectors:
+    def _tree(self):
+        """main > [ok (QPushButton "OK"), dialog#saveDialog (QDialog) > [cancel, ok2 "OK"]]"""
+        QWidget = sys.modules["PySide6.QtWidgets"].QWidget
+
+        class QAbstractButton(QWidget):
+            pass
+
+        class QPushButton(QAbstractButton):
+            pass
+
+        class QDialog(QWidget):
+            pass
+
+        app, handler = _make_app_and_handler()
+        main = _make_widget("main")
+        dialog = _make_widget("saveDialog")
+        dialog.__class__ = QDialog
+        buttons = {}
+        for key, name, text in (("ok", "", "OK"), ("cancel", "cancel", "Cancel"),
+                                ("ok2", "", "OK")):
+            button = _make_widget(name)
+            button.__class__ = QPushButton
+            button.property = MagicMock(side_effect=lambda prop, text=text: {
+                "text": text, "checked": False}.get(prop))
+            buttons[key] = button
+        buttons["cancel"].isEnabled.return_value = False
+
+        def attach(parent, children):
+            parent.children.return_value = children
+            for child in children:
+                child.parentWidget.return_value = parent
+            parent.findChildren.side_effect = lambda cls, *args: [
+                w for c in children for w in [c, *c.findChildren(cls)]]
+
+        for widget in (main, dialog, *buttons.values()):
+            widget.parentWidget.return_value = None
+            attach(widget, [])
+        attach(dialog, [buttons["cancel"], buttons["ok2"]])
+        attach(main, [buttons["ok"], dialog])
+        app._top_levels = [main, dialog]
+        handler.index.widget = MagicMock(
+            side_effect=lambda name, rebuild=True: {"saveDialog": dialog,
+                                                    "cancel": buttons["cancel"]}.get(name))
+        return handler, main, dialog, buttons
+
+    def _select(self, handler, selector):
+        return list(harness._compile_selector(selector).select(
+            handler.app, lambda name: handler.index.widget(name)))
+
+    def test_child_combinator_and_properties(self):
+        handler, _, _, buttons = self._tree()
+        selector = 'QDialog#saveDialog > QPushButton[text="OK"]:visible'
+        assert self._select(handler, selector) == [buttons["ok2"]]
+        assert self._select(handler, "#saveDialog QAbstractButton:disabled") == [
+            buttons["cancel"]]
+        assert self._select(handler, "QPushButton[text~=^O]") == [buttons["ok"], buttons["ok2"]]
+        assert self._select(handler, "QPushButton[text!=OK]") == [buttons["cancel"]]
+        assert self._select(handler, "QPushButton[checked]") == []
+        assert self._select(handler, r'QPushButton[text~="^O\w$"]') == [buttons["ok"],
+                                                                       buttons["ok2"]]
+        assert harness._Selector(r'[text="say \"hi\""]').steps[0][1].props == [
+            ("text", "=", 'say "hi"')]
+
+    def test_named_compound_checks_ancestors_without_walking(self):
+        handler, main, _, buttons = self._tree()
+        assert self._select(handler, "QWidget#main > #cancel") == []
+        assert self._select(handler, "#main #cancel") == [buttons["cancel"]]
+        main.findChildren.assert_not_called()
+
+    def test_first_match_stops_the_walk(self):
+        handler, _, _, buttons = self._tree()
+        matches = harness._compile_selector("QPushButton[text=OK]").select(
+            handler.app, handler.index.widget)
+        assert next(matches) is buttons["ok"]
+        buttons["cancel"].property.assert_not_called()
+        buttons["ok2"].property.assert_not_called()
+
+    def test_parented_windows_are_searched_once(self):
+        handler, _, dialog, buttons = self._tree()
+        assert self._select(handler, "QDialog QPushButton") == [buttons["cancel"],
+                                                               buttons["ok2"]]
+
+    def test_invalid_selectors_are_rejected(self):
+        for selector in ("", "> QPushButton", "QDialog >", "[text=OK]QPushButton",
+                         "QPushButton:bogus", "QPushButton[text~=(]", "QPushButton{"):
+            try:
+                harness._Selector(selector)
+            except ValueError:
+                continue
+            raise AssertionError(f"accepted {selector!r}")
+
+    def test_commands_accept_selectors(self):
+        handler, _, _, buttons = self._tree()
+        QTest = sys.modules["PySide6.QtTest"].QTest
+        with patch.object(QTest, "mouseClick") as click:
+            result = handler.handle({"cmd": "click",
+                                     "selector": '#saveDialog > QPushButton[text="OK"]'})
+        assert result["success"] is True
+        assert click.call_args[0][0] is buttons["ok2"]
+
+        info = handler.handle({"cmd": "get_widget_info", "selector": "#cancel"})
+        assert info["info"]["enabled"] is False
+        missing = handler.handle({"cmd": "hover", "selector": "QDialog > QDialog"})
+        assert missing == {"success": False, "error": "Widget not found: QDialog > QDialog"}
+        bad = handler.handle({"cmd": "get_widget_info", "selector": "QDialog >"})
+        assert bad["success"] is False and "Invalid selector" in bad["error"]
+
+    def test_wait_tools_accept_selectors(self):
+        handler, _, _, buttons = self._tree()
+        appeared = handler.handle({"cmd": "wait_for_widget", "state": "enabled",
+                                   "selector": "#saveDialog QPushButton:enabled",
+                                   "timeout": 0.1})
+        assert appeared["success"] is True
+        value = handler.handle({"cmd": "wait_for_property", "property": "text",
+                                "selector": "#saveDialog > :disabled", "equals": "Cancel",
+                                "timeout": 0.1})
+        assert value["success"] is True and value["value"] == "Cancel"
+        bad = handler.handle({"cmd": "wait_for_widget", "selector": "[", "timeout": 5})
+        assert bad["success"] is False and "Invalid selector" in bad["error"]
+
 class TestHandleGetWidgetInfo:
     def test_get_widget_info_not_found(self):
         app, handler = _make_app_and_handler()
@@ -574,6 +1330,128 @@ class TestHandleGetWidgetInfo:
         assert "height" in info
 
 
+
+class _FakeIndex:
+    def __init__(self, row=-1, column=-1, path=()):
+        self._row, self._column, self.path = row, column, path
+
+    def isValid(self):
+        return self._row >= 0
+
+
+class _FakeModel:
+    """rows x 2 model with one level of children under even rows; loads in batches."""
+
+    def __init__(self, rows=10, loaded=None, batch=4):
+        self.total, self.loaded, self.batch = rows, rows if loaded is None else loaded, batch
+        self.reads = 0
+
+    def index(self, row, column, parent=None):
+        path = (*parent.path, row) if parent is not None and parent.isValid() else (row,)
+        if parent is not None and parent.isValid() and (len(path) > 2 or path[0] % 2):
+            return _FakeIndex()
+        return _FakeIndex(row, column, path)
+
+    def rowCount(self, parent=None):
+        if parent is not None and parent.isValid():
+            return 2 if len(parent.path) == 1 and parent.path[0] % 2 == 0 else 0
+        return self.loaded
+
+    def columnCount(self, parent=None):
+        return 2
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded < self.total
+
+    def fetchMore(self, parent):
+        self.loaded = min(self.total, self.loaded + self.batch)
+
+    def data(self, index, role):
+        self.reads += 1
+        label = "/".join(map(str, index.path))
+        if role == 0:
+            return f"{label}:{index._column}"
+        if role == 10:
+            return 2 if index.path[-1] % 2 else 0
+        return None
+
+    def headerData(self, section, orientation, role):
+        return f"Col {section}"
+
+
+class TestHandleGetModelData:
+    def _view(self, model):
+        app, handler = _make_app_and_handler()
+        view = _make_widget("table")
+        view.model = MagicMock(return_value=model)
+        handler.index.widget = MagicMock(
+            side_effect=lambda name, rebuild=True: view if name == "table" else None)
+        return handler
+
+    def test_reads_only_the_requested_page(self):
+        model = _FakeModel(rows=100_000)
+        handler = self._view(model)
+        result = handler.handle({"cmd": "get_model_data", "widget_name": "table",
+                                 "row": 500, "row_count": 2, "columns": [1]})
+        assert result["rows"] == [["500:1"], ["501:1"]]
+        assert result["headers"] == ["Col 1"] and result["next_row"] == 502
+        assert result["row_count"] == 100_000 and "has_children" in result
+        assert model.reads == 2
+
+    def test_multiple_roles_and_check_state_names(self):
+        handler = self._view(_FakeModel())
+        result = handler.handle({"cmd": "get_model_data", "widget_name": "table",
+                                 "row_count": 2, "columns": [0],
+                                 "roles": ["display", "check_state", 256]})
+        assert result["rows"] == [
+            [{"display": "0:0", "check_state": "Unchecked", "256": None}],
+            [{"display": "1:0", "check_state": "Checked", "256": None}],
+        ]
+
+    def test_lazy_models_are_fetched_just_far_enough(self):
+        model = _FakeModel(rows=40, loaded=4, batch=4)
+        handler = self._view(model)
+        result = handler.handle({"cmd": "get_model_data", "widget_name": "table",
+                                 "row": 8, "row_count": 3})
+        assert model.loaded == 12 and len(result["rows"]) == 3
+        assert result["can_fetch_more"] is True and result["next_row"] == 11
+
+    def test_parent_path_reads_tree_children(self):
+        handler = self._view(_FakeModel())
+        children = handler.handle({"cmd": "get_model_data", "widget_name": "table",
+                                   "parent": [2]})
+        assert children["rows"] == [["2/0:0", "2/0:1"], ["2/1:0", "2/1:1"]]
+        assert children["next_row"] is None and "has_children" not in children
+        missing = handler.handle({"cmd": "get_model_data", "widget_name": "table",
+                                  "parent": [1, 0]})
+        assert missing == {"success": False, "error": "No row 0 at parent depth 1"}
+
+    def test_if_hash_skips_unchanged_pages(self):
+        handler = self._view(_FakeModel())
+        first = handler.handle({"cmd": "get_model_data", "widget_name": "table"})
+        again = handler.handle({"cmd": "get_model_data", "widget_name": "table",
+                                "if_hash": first["hash"]})
+        assert again["unchanged"] is True and "rows" not in again
+        other = handler.handle({"cmd": "get_model_data", "widget_name": "table", "row": 1,
+                                "if_hash": first["hash"]})
+        assert "unchanged" not in other and other["hash"] != first["hash"]
+
+    def test_rejects_bad_arguments(self):
+        handler = self._view(_FakeModel())
+        for extra, error in (({"roles": ["colour"]}, "Unknown role"),
+                             ({"row_count": 0}, "row_count"),
+                             ({"columns": [5]}, "columns"),
+                             ({"widget_name": "nope"}, "Widget not found")):
+            result = handler.handle({"cmd": "get_model_data", "widget_name": "table", **extra})
+            assert result["success"] is False and error in result["error"]
+
+    def test_requires_a_model(self):
+        app, handler = _make_app_and_handler()
+        plain = _make_widget("plain")
+        handler.index.widget = MagicMock(return_value=plain)
+        result = handler.handle({"cmd": "get_model_data", "widget_name": "plain"})
+        assert result["success"] is False and "has no item model" in result["error"]
+
 class TestHandleTriggerAction:
     def test_trigger_action_not_found(self):
         app, handler = _make_app_and_handler()
@@ -586,6 +1464,17 @@ class TestHandleTriggerAction:
         assert result["success"] is False
         assert "saveAction" in result["error"]
 
+    def test_trigger_action_uses_index(self):
+        app, handler = _make_app_and_handler()
+        window = _make_widget("win")
+        action = _NamedAction("saveAction")
+        window.findChildren.return_value = [action]
+        app._top_levels = [window]
+
+        result = handler.handle({"cmd": "trigger_action", "action_name": "saveAction"})
+        assert result["success"] is True
+        assert action.triggered == 1
+
     def test_trigger_action_no_name(self):
         _, handler = _make_app_and_handler()
         result = handler.handle({"cmd": "trigger_action"})
@@ -620,6 +1509,204 @@ class TestHandleWaitIdle:
         handler.handle({"cmd": "wait_idle", "timeout": 0.05})
         assert call_count["n"] > 0
 
+    def test_wait_idle_returns_after_quiet_window_not_timeout(self):
+        _, handler = _make_app_and_handler()
+        result = handler.handle({"cmd": "wait_idle", "timeout": 5.0, "quiet_ms": 20})
+        assert result["idle"] is True
+        assert result["settle_time"] == 0
+        assert result["elapsed"] < 1.0
+
+    def test_wait_idle_settle_time_tracks_last_activity(self):
+        app, handler = _make_app_and_handler()
+        calls = {"n": 0}
+
+        def busy_then_quiet():
+            calls["n"] += 1
+            if calls["n"] <= 5:
+                handler.index.activity += 1
+        app.processEvents = busy_then_quiet
+
+        result = handler.handle({"cmd": "wait_idle", "timeout": 5.0, "quiet_ms": 30})
+        assert result["idle"] is True
+        assert 0 < result["settle_time"] < result["elapsed"]
+        assert result["elapsed"] - result["settle_time"] >= 0.03
+
+    def test_wait_idle_times_out_while_app_stays_busy(self):
+        app, handler = _make_app_and_handler()
+
+        def always_busy():
+            handler.index.activity += 1
+        app.processEvents = always_busy
+
+        result = handler.handle({"cmd": "wait_idle", "timeout": 0.1, "quiet_ms": 20})
+        assert result["success"] is True
+        assert result["idle"] is False
+        assert result["settle_time"] is None
+        assert result["elapsed"] >= 0.1
+
+    def test_events_to_dispatcher_are_not_app_activity(self):
+        _, handler = _make_app_and_handler()
+        dispatcher = CommandDispatcher(handler)
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        handler.index.eventFilter(dispatcher, QEvent(QEvent.Type.Paint))
+        assert handler.index.activity == 0
+        handler.index.eventFilter(object(), QEvent(QEvent.Type.Paint))
+        assert handler.index.activity == 1
+
+
+class TestHandleRunSequence:
+    def test_runs_steps_in_order_with_timings(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = [_make_widget("btn")]
+
+        with patch.object(_QTest, "mouseClick") as mock_click:
+            result = handler.handle({"cmd": "run_sequence", "steps": [
+                {"cmd": "ping"},
+                {"cmd": "click", "widget_name": "btn"},
+                {"cmd": "get_widget_info", "widget_name": "btn"},
+            ]})
+
+        assert result["success"] is True
+        assert result["completed"] == 3 and result["failed"] == 0
+        assert [s["cmd"] for s in result["steps"]] == ["ping", "click", "get_widget_info"]
+        assert all(s["elapsed_ms"] >= 0 for s in result["steps"])
+        assert result["steps"][2]["result"]["info"]["name"] == "btn"
+        mock_click.assert_called_once()
+
+    def test_stops_on_first_failure_by_default(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = []
+        result = handler.handle({"cmd": "run_sequence", "steps": [
+            {"cmd": "ping"},
+            {"cmd": "click", "widget_name": "ghost"},
+            {"cmd": "ping"},
+        ]})
+        assert result["success"] is False
+        assert result["completed"] == 2
+        assert "ghost" in result["steps"][1]["result"]["error"]
+
+    def test_continue_mode_runs_every_step(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = []
+        result = handler.handle({"cmd": "run_sequence", "stop_on_failure": False, "steps": [
+            {"cmd": "click", "widget_name": "ghost"},
+            {"cmd": "ping"},
+        ]})
+        assert result["success"] is False
+        assert result["completed"] == 2 and result["failed"] == 1
+        assert result["steps"][1]["success"] is True
+
+    def test_expect_asserts_on_widget_info(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = [_make_widget("label")]
+        result = handler.handle({"cmd": "run_sequence", "steps": [
+            {"cmd": "get_widget_info", "widget_name": "label", "expect": {"enabled": True}},
+            {"cmd": "get_widget_info", "widget_name": "label", "expect": {"width": 99}},
+        ]})
+        assert [s["success"] for s in result["steps"]] == [True, False]
+        assert "width is 100, expected 99" in result["steps"][1]["result"]["error"]
+
+    def test_rejects_nested_sequences_and_bad_steps(self):
+        _, handler = _make_app_and_handler()
+        assert handler.handle({"cmd": "run_sequence"})["success"] is False
+        result = handler.handle({"cmd": "run_sequence", "stop_on_failure": False,
+                                 "steps": [{"cmd": "run_sequence", "steps": []}, "ping"]})
+        assert result["failed"] == 2
+
+
+class TestConditionWaits:
+    def _appear_after(self, app, handler, widget, calls):
+        """processEvents that adds `widget` (with a ChildAdded) on call N."""
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        count = {"n": 0}
+
+        def process_events():
+            count["n"] += 1
+            handler.index.activity += 1
+            if count["n"] == calls:
+                app._top_levels = [widget]
+                handler.index.eventFilter(None, QEvent(QEvent.Type.ChildAdded, widget))
+        app.processEvents = process_events
+        return count
+
+    def test_wait_for_widget_already_visible(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = [_make_widget("dlg")]
+        result = handler.handle({"cmd": "wait_for_widget", "widget_name": "dlg"})
+        assert result["success"] is True
+        assert result["observed"] == {"exists": True, "visible": True, "enabled": True}
+        assert result["elapsed"] < 0.1
+
+    def test_wait_for_widget_returns_when_it_appears(self):
+        app, handler = _make_app_and_handler()
+        count = self._appear_after(app, handler, _make_widget("dlg"), calls=3)
+        result = handler.handle({"cmd": "wait_for_widget", "widget_name": "dlg",
+                                 "state": "exists", "timeout": 5})
+        assert result["success"] is True
+        assert count["n"] == 3
+        assert result["elapsed"] < 1.0
+
+    def test_wait_for_widget_timeout_reports_last_observed(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = [_make_widget("btn", enabled=False)]
+        result = handler.handle({"cmd": "wait_for_widget", "widget_name": "btn",
+                                 "state": "enabled", "timeout": 0.1})
+        assert result["success"] is False
+        assert "Timed out" in result["error"]
+        assert result["observed"] == {"exists": True, "visible": True, "enabled": False}
+        assert result["elapsed"] >= 0.1
+
+    def test_wait_for_widget_gone(self):
+        app, handler = _make_app_and_handler()
+        app._top_levels = []
+        result = handler.handle({"cmd": "wait_for_widget", "widget_name": "dlg",
+                                 "state": "gone"})
+        assert result["success"] is True
+        assert result["observed"]["exists"] is False
+
+    def test_wait_for_widget_rejects_unknown_state(self):
+        _, handler = _make_app_and_handler()
+        result = handler.handle({"cmd": "wait_for_widget", "widget_name": "x",
+                                 "state": "shiny"})
+        assert result["success"] is False
+        assert "Unknown state" in result["error"]
+
+    def test_wait_for_property_equals(self):
+        app, handler = _make_app_and_handler()
+        label = _make_widget("result")
+        values = iter(["", "", "42"])
+        label.property.side_effect = lambda name: next(values, "42")
+        app._top_levels = [label]
+        app.processEvents = lambda: setattr(handler.index, "activity",
+                                            handler.index.activity + 1)
+
+        result = handler.handle({"cmd": "wait_for_property", "widget_name": "result",
+                                 "property": "text", "equals": "42", "timeout": 5})
+        assert result["success"] is True
+        assert result["value"] == "42"
+        label.property.assert_called_with("text")
+
+    def test_wait_for_property_matches_and_timeout_value(self):
+        app, handler = _make_app_and_handler()
+        label = _make_widget("status")
+        label.property.return_value = "Loading 40%"
+        app._top_levels = [label]
+
+        ok = handler.handle({"cmd": "wait_for_property", "widget_name": "status",
+                             "property": "text", "matches": r"\d+%"})
+        late = handler.handle({"cmd": "wait_for_property", "widget_name": "status",
+                               "property": "text", "matches": "^Done", "timeout": 0.1})
+        assert ok["success"] is True
+        assert late["success"] is False
+        assert late["value"] == "Loading 40%"
+
+    def test_wait_for_property_needs_exactly_one_predicate(self):
+        _, handler = _make_app_and_handler()
+        base = {"cmd": "wait_for_property", "widget_name": "w", "property": "text"}
+        assert handler.handle(base)["success"] is False
+        both = handler.handle({**base, "equals": "a", "matches": "a"})
+        assert "exactly one" in both["error"]
+
 
 class TestHandleQuit:
     def test_quit_returns_success(self):
@@ -642,30 +1729,30 @@ class TestCommandDispatcher:
         dispatcher = CommandDispatcher(handler)
         return dispatcher, handler
 
-    def test_process_pending_processes_queued_command(self):
-        """_process_pending() dequeues one command and puts the result in response_queue."""
+    def test_drain_processes_queued_command(self):
+        """_drain() dequeues the command and puts the result in response_queue."""
         dispatcher, handler = self._make_dispatcher()
 
         # Pre-load the request queue directly
         import queue as q
         response_queue = q.Queue()
-        dispatcher._request_queue.put(({"cmd": "ping"}, response_queue))
+        dispatcher.submit({"cmd": "ping"}, response_queue.put)
 
-        # Simulate the main thread timer firing
-        dispatcher._process_pending()
+        # Simulate the queued wakeup being delivered on the main thread
+        dispatcher._drain()
 
         assert not response_queue.empty()
         result = response_queue.get_nowait()
         assert result == {"echo": {"cmd": "ping"}}
 
-    def test_process_pending_noop_when_empty(self):
-        """_process_pending() does nothing when no commands are queued."""
+    def test_drain_noop_when_empty(self):
+        """_drain() does nothing when no commands are queued."""
         dispatcher, handler = self._make_dispatcher()
-        dispatcher._process_pending()  # Must not raise
+        dispatcher._drain()  # Must not raise
         handler.handle.assert_not_called()
 
-    def test_dispatch_blocks_until_process_pending_called(self):
-        """dispatch() blocks until _process_pending() processes the command."""
+    def test_dispatch_blocks_until_drain_called(self):
+        """dispatch() blocks until _drain() processes the command."""
         dispatcher, _ = self._make_dispatcher()
 
         results = {}
@@ -678,14 +1765,14 @@ class TestCommandDispatcher:
         time.sleep(0.05)  # Let the background thread reach Queue.get()
 
         # Main thread: process the pending command
-        dispatcher._process_pending()
+        dispatcher._drain()
         t.join(timeout=1.0)
 
-        assert not t.is_alive(), "dispatch() did not unblock after _process_pending"
+        assert not t.is_alive(), "dispatch() did not unblock after _drain"
         assert results.get("r") == {"echo": {"cmd": "test"}}
 
     def test_dispatch_timeout_when_never_processed(self):
-        """dispatch() returns a timeout error if no one calls _process_pending."""
+        """dispatch() returns a timeout error if no one calls _drain."""
         dispatcher, _ = self._make_dispatcher()
         result = dispatcher.dispatch({"cmd": "ping"}, timeout=0.05)
         assert result["success"] is False
@@ -704,6 +1791,445 @@ class TestCommandDispatcher:
             t = threading.Thread(target=bg)
             t.start()
             time.sleep(0.02)
-            dispatcher._process_pending()
+            dispatcher._drain()
             t.join(timeout=0.5)
             assert not t.is_alive()
+
+    def test_pipeline_hook_runs_only_read_only_head(self):
+        """Mid-handler pipelining runs read-only head commands, never a mutating one."""
+        _, handler = _make_app_and_handler()
+        dispatcher = CommandDispatcher(handler)
+        order = []
+
+        def handle(cmd):
+            order.append(cmd["cmd"])
+            if cmd["cmd"] == "wait_idle":
+                # What the wait loop does between processEvents() calls
+                handler.pipeline_hook()
+                order.append("wait_idle:end")
+            return {"success": True}
+
+        handler.handle = handle
+        results = []
+        dispatcher.submit({"cmd": "wait_idle"}, results.append)
+        dispatcher.submit({"cmd": "get_widget_info"}, results.append)
+        dispatcher.submit({"cmd": "click"}, results.append)
+        dispatcher.submit({"cmd": "ping"}, results.append)
+
+        dispatcher._drain()
+        # get_widget_info pipelined inside wait_idle; click blocked the ping
+        # behind it so nothing overtook the mutating command.
+        assert order == ["wait_idle", "get_widget_info", "wait_idle:end", "click", "ping"]
+        assert len(results) == 4
+
+    def test_get_metrics_pipelines_only_without_mutating_options(self):
+        """get_metrics runs re-entrantly only when it neither resets nor redirects."""
+        assert harness._is_read_only({"cmd": "get_metrics", "histograms": True})
+        assert harness._is_read_only({"cmd": "get_metrics", "reset": False})
+        assert not harness._is_read_only({"cmd": "get_metrics", "reset": True})
+        assert not harness._is_read_only({"cmd": "get_metrics", "stream_to": ""})
+        assert not harness._is_read_only({"cmd": "click"})
+        assert not harness._is_read_only({"cmd": "responsiveness"})
+        assert not harness._is_read_only({"cmd": "get_model_data"})
+
+
+    def test_burst_posts_a_single_wakeup(self):
+        """Only one wakeup is outstanding however many commands are queued."""
+        dispatcher, handler = self._make_dispatcher()
+        for i in range(5):
+            dispatcher.submit({"cmd": "ping", "seq": i}, lambda r: None)
+        assert dispatcher._wakeup.emit_count == 1
+        dispatcher._drain()
+        assert handler.handle.call_count == 5
+        dispatcher.submit({"cmd": "ping"}, lambda r: None)
+        assert dispatcher._wakeup.emit_count == 2
+
+    def test_budget_bounds_each_wakeup_and_reposts_leftovers(self):
+        """A wakeup runs at most `budget` commands, then yields with a new wakeup."""
+        _, handler = _make_app_and_handler()
+        handler.handle = MagicMock(return_value={"success": True})
+        dispatcher = CommandDispatcher(handler, budget=2)
+        for i in range(5):
+            dispatcher.submit({"cmd": "ping", "seq": i}, lambda r: None)
+        dispatcher._drain()
+        assert handler.handle.call_count == 2
+        assert dispatcher._wakeup.emit_count == 2  # initial + repost
+        dispatcher._drain()
+        dispatcher._drain()
+        assert handler.handle.call_count == 5
+        assert dispatcher._wakeup.emit_count == 3  # nothing left after the last
+
+    def test_records_timings_keeping_reentrant_process_events_apart(self):
+        """Each command's processEvents time is its own, not a nested command's."""
+        _, handler = _make_app_and_handler()
+        dispatcher = CommandDispatcher(handler)
+
+        def handle(cmd):
+            handler.process_events_time += 0.002 if cmd["cmd"] == "wait_idle" else 0.005
+            if cmd["cmd"] == "wait_idle":
+                handler.pipeline_hook()
+            return {"success": cmd["cmd"] == "wait_idle"}
+
+        handler.handle = handle
+        dispatcher.submit({"cmd": "wait_idle"}, lambda r: None)
+        dispatcher.submit({"cmd": "get_widget_info"}, lambda r: None)
+        dispatcher._drain()
+        commands = handler.metrics.report()["commands"]
+        assert commands["wait_idle"]["process_events_ms"]["max"] == 2.0
+        assert commands["get_widget_info"]["process_events_ms"]["max"] == 5.0
+        assert commands["get_widget_info"]["errors"] == 1
+        assert set(commands["wait_idle"]) >= {"dispatch_ms", "queue_ms", "handler_ms"}
+        assert handler.process_events_time == 0.0
+
+
+class TestResponsivenessProfiler:
+    def _profiler(self, windows=()):
+        app = _QApplication()
+        app.topLevelWidgets = lambda: list(windows)
+        return harness._ResponsivenessProfiler(app, set())
+
+    def test_late_beats_are_lag_and_long_gaps_stalls_with_their_stack(self):
+        profiler = self._profiler()
+        profiler._last = time.perf_counter() - 0.003
+        profiler._beat()
+        profiler._last -= 0.25
+        profiler._sample = (profiler._last, ["app.py:8 in slow_handler"])
+        profiler._beat()
+        report = profiler.report()
+        assert report["beats"] == 2 and report["stall_count"] == 1
+        assert report["lag_ms"]["max"] >= 240 and report["lag_ms"]["p50"] <= 0.25
+        assert report["stalls"][0]["duration_ms"] >= 250
+        assert report["stalls"][0]["stack"] == ["app.py:8 in slow_handler"]
+
+    def test_watchdog_samples_the_stalled_threads_stack(self):
+        profiler = self._profiler()
+        profiler.stall_ms = 20
+        stalled, stop = threading.Event(), threading.Event()
+
+        def busy_in_slot():
+            stalled.set()
+            stop.wait(2)
+
+        worker = threading.Thread(target=busy_in_slot)
+        worker.start()
+        stalled.wait(1)
+        profiler._main_thread = worker.ident
+        profiler._last = time.perf_counter() - 1
+        watchdog_stop = threading.Event()
+        threading.Thread(target=profiler._watchdog, args=(watchdog_stop,), daemon=True).start()
+        deadline = time.monotonic() + 2
+        while profiler._sample is None and time.monotonic() < deadline:
+            time.sleep(0.005)
+        watchdog_stop.set()
+        stop.set()
+        worker.join()
+        assert profiler._sample[0] == profiler._last
+        assert any("busy_in_slot" in frame for frame in profiler._sample[1])
+
+    def test_window_repaints_are_timed_without_taking_delivery(self):
+        window = _make_widget("main")
+        profiler = self._profiler([window])
+        profiler._scan_windows()
+        profiler._scan_windows()
+        window.installEventFilter.assert_called_once_with(profiler)
+        QEvent = sys.modules["PySide6.QtCore"].QEvent
+        assert profiler.eventFilter(window, QEvent(QEvent.Type.Paint)) is False
+        assert profiler.eventFilter(window, QEvent(QEvent.Type.UpdateRequest)) is False
+        window.event.assert_not_called()
+        assert profiler._paint_done.emit_count == 1
+        assert profiler.report()["windows"] == {}
+        # The queued end runs once the UpdateRequest's delivery has returned
+        profiler._end_paints()
+        profiler._end_paints()
+        assert profiler.report()["windows"]["main"]["paints"] == 1
+
+    def test_command_starts_then_reports_and_stops(self):
+        _, handler = _make_app_and_handler()
+        first = handler.handle({"cmd": "responsiveness", "stall_ms": 50})
+        bad = handler.handle({"cmd": "responsiveness", "stall_ms": 1})
+        stopped = handler.handle({"cmd": "responsiveness", "stop": True})
+        assert first["started"] is True and first["running"] is True
+        assert first["stall_ms"] == 50 and first["stall_count"] == 0
+        assert bad["success"] is False and "heartbeat" in bad["error"]
+        assert stopped["started"] is False and handler.profiler.running is False
+        assert id(handler.profiler._timer) in handler.index.exempt
+
+
+class TestMemoryReport:
+    _QWidget = sys.modules["PySide6.QtWidgets"].QWidget
+
+    def _window(self, labels):
+        window = type("QMainWindow", (self._QWidget,), {})()
+        children = [type("QLabel", (self._QWidget,), {})() for _ in range(labels)]
+        window.findChildren = lambda typ, name="": list(children)
+        return window, children
+
+    def test_growth_by_class_against_a_baseline_with_limits(self):
+        app, handler = _make_app_and_handler()
+        window, children = self._window(labels=1)
+        app._top_levels = [window]
+        try:
+            with patch.object(harness._MemoryTracker, "_rss", side_effect=[1000, 5000]):
+                saved = handler.handle({"cmd": "memory", "baseline": "start"})
+                children.extend(type("QLabel", (self._QWidget,), {})() for _ in range(2))
+                grown = handler.handle({"cmd": "memory", "baseline": "start",
+                                        "max_growth": {"qobjects": 1, "rss_bytes": 10_000}})
+        finally:
+            tracemalloc.stop()
+        assert saved["baseline_saved"] == "start" and saved["qobjects"] == 3
+        assert saved["classes"] == {"QLabel": 1, "QMainWindow": 1, "_QApplication": 1}
+        assert grown["growth"]["qobjects"] == 2 and grown["growth"]["widgets"] == 2
+        assert grown["growth"]["rss_bytes"] == 4000
+        assert grown["classes_growth"] == {"QLabel": 2}
+        assert grown["bounded"] is False and grown["exceeded"] == {"qobjects": 2}
+        assert isinstance(grown["allocation_sites"], list)
+
+    def test_rejects_unknown_limits_and_limits_without_baseline(self):
+        _, handler = _make_app_and_handler()
+        unknown = handler.handle({"cmd": "memory", "baseline": "b", "max_growth": {"fds": 1}})
+        unanchored = handler.handle({"cmd": "memory", "max_growth": {"qobjects": 0}})
+        assert unknown["success"] is False and "fds" in unknown["error"]
+        assert unanchored == {"success": False, "error": "max_growth needs a baseline"}
+        assert not tracemalloc.is_tracing()
+
+    def test_background_rss_samples_come_back_once(self):
+        _, handler = _make_app_and_handler()
+        with patch.object(harness._MemoryTracker, "_rss", return_value=4096):
+            handler.handle({"cmd": "memory", "sample_ms": 5})
+            time.sleep(0.05)
+            stopped = handler.handle({"cmd": "memory", "sample_ms": 0})
+            after = handler.handle({"cmd": "memory"})
+        assert "rss_samples" not in after
+        assert len(stopped["rss_samples"]) >= 2
+        assert all(rss == 4096 for _, rss in stopped["rss_samples"])
+        assert handler.memory._sampler is None
+
+
+class TestCommandMetrics:
+    def test_summaries_use_histogram_bucket_bounds(self):
+        metrics = harness._CommandMetrics()
+        for handler_ms in [0.3] * 90 + [7.0] * 9 + [40.0]:
+            metrics.record({"cmd": "click", "handler_ms": handler_ms, "reply_bytes": 30})
+        click = metrics.report(histograms=True)["commands"]["click"]
+        assert click["count"] == 100 and click["errors"] == 0
+        handler_ms = click["handler_ms"]
+        assert (handler_ms["p50"], handler_ms["p95"], handler_ms["p99"]) == (0.5, 10, 10)
+        assert handler_ms["max"] == 40.0 and sum(handler_ms["histogram"]) == 100
+        assert click["reply_bytes"] == {"mean": 30.0, "max": 30, "total": 3000}
+
+    def test_get_metrics_streams_jsonl_and_resets(self, tmp_path):
+        _, handler = _make_app_and_handler()
+        path = tmp_path / "metrics.jsonl"
+        handler.handle({"cmd": "get_metrics", "stream_to": str(path)})
+        handler.metrics.record({"cmd": "ping", "handler_ms": 0.01, "success": True})
+        report = handler.handle({"cmd": "get_metrics", "stream_to": "", "reset": True})
+        handler.metrics.record({"cmd": "ping", "handler_ms": 0.01})
+        after = handler.handle({"cmd": "get_metrics"})
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["cmd"] for line in lines] == ["ping"] and "time" in lines[0]
+        assert report["commands"]["ping"]["count"] == 1 and report["stream_to"] is None
+        assert after["commands"]["ping"]["count"] == 1
+
+
+# ===========================================================================
+# Socket server tests
+# ===========================================================================
+
+class TestSocketServer:
+    def _start(self, tmp_path, handle):
+        """Real Unix socket server; a thread stands in for the Qt timer."""
+        _, handler = _make_app_and_handler()
+        handler.handle = handle
+        dispatcher = CommandDispatcher(handler)
+        server = harness.SocketServer(str(tmp_path / "qt.sock"), dispatcher)
+        server.start()
+        stop = threading.Event()
+
+        def pump():
+            while not stop.is_set():
+                dispatcher._drain()
+                time.sleep(0.001)
+
+        threading.Thread(target=pump, daemon=True).start()
+        return server, stop
+
+    def _read_lines(self, sock, n):
+        buf = b""
+        while buf.count(b"\n") < n:
+            buf += sock.recv(4096)
+        return [json.loads(line) for line in buf.splitlines()]
+
+    def test_persistent_connection_echoes_request_ids(self, tmp_path):
+        server, stop = self._start(tmp_path, lambda cmd: {"success": True, "seq": cmd["seq"]})
+        try:
+            with socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM) as sock:
+                sock.settimeout(2)
+                sock.connect(server.socket_path)
+                payload = b"".join(
+                    json.dumps({"id": i, "cmd": "ping", "seq": i}).encode() + b"\n"
+                    for i in range(1, 6)
+                )
+                sock.sendall(payload)
+                replies = self._read_lines(sock, 5)
+        finally:
+            stop.set()
+            server.stop()
+        assert sorted(r["id"] for r in replies) == [1, 2, 3, 4, 5]
+        assert all(r["seq"] == r["id"] for r in replies)
+
+    def test_reply_sizes_and_timings_are_recorded_once_sent(self, tmp_path):
+        server, stop = self._start(tmp_path, lambda cmd: {"success": True, "seq": cmd["seq"]})
+        metrics = server.dispatcher.metrics
+        try:
+            with socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM) as sock:
+                sock.settimeout(2)
+                sock.connect(server.socket_path)
+                sock.sendall(json.dumps({"id": 1, "cmd": "ping", "seq": 1}).encode() + b"\n")
+                reply = self._read_lines(sock, 1)[0]
+                deadline = time.monotonic() + 2
+                while "ping" not in metrics.report()["commands"] and time.monotonic() < deadline:
+                    time.sleep(0.005)
+        finally:
+            stop.set()
+            server.stop()
+        ping = metrics.report()["commands"]["ping"]
+        assert ping["reply_bytes"]["max"] == len(json.dumps(reply)) + 1
+        assert ping["request_bytes"]["max"] == len(json.dumps({"cmd": "ping", "id": 1, "seq": 1}))
+        assert {"decode_ms", "dispatch_ms", "handler_ms", "reply_ms"} <= set(ping)
+
+    def _read_frame(self, sock):
+        header = b""
+        while len(header) < 5:
+            header += sock.recv(5 - len(header))
+        length, flags = harness._FRAME_HEADER.unpack(header)
+        payload = b""
+        while len(payload) < length:
+            payload += sock.recv(length - len(payload))
+        return flags, payload
+
+    def _hello(self, sock, **extra):
+        hello = {"cmd": "hello", "protocol": 2, "id": 0, **extra}
+        sock.sendall(json.dumps(hello).encode() + b"\n")
+        return self._read_lines(sock, 1)[0]
+
+    def test_hello_switches_connection_to_compact_frames(self, tmp_path):
+        server, stop = self._start(tmp_path, lambda cmd: {"success": True, "seq": cmd["seq"]})
+        try:
+            with socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM) as sock:
+                sock.settimeout(2)
+                sock.connect(server.socket_path)
+                reply = self._hello(sock)
+                payload = json.dumps({"id": 1, "cmd": "ping", "seq": 7}).encode()
+                sock.sendall(harness._FRAME_HEADER.pack(len(payload), 0) + payload)
+                flags, body = self._read_frame(sock)
+        finally:
+            stop.set()
+            server.stop()
+        assert reply == {"success": True, "protocol": 2, "compression": "zlib", "id": 0}
+        assert flags == 0
+        assert body == b'{"success":true,"seq":7,"id":1}'
+
+    def test_hello_with_non_integer_protocol_gets_an_error_reply(self, tmp_path):
+        server, stop = self._start(tmp_path, lambda cmd: {"success": True, "seq": cmd["seq"]})
+        try:
+            for protocol in ("2", None):
+                with socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM) as sock:
+                    sock.settimeout(2)
+                    sock.connect(server.socket_path)
+                    reply = self._hello(sock, protocol=protocol)
+                    # The connection survives, still speaking newline JSON
+                    sock.sendall(json.dumps({"id": 1, "cmd": "ping", "seq": 3}).encode() + b"\n")
+                    after = self._read_lines(sock, 1)[0]
+                assert reply["success"] is False and "integer" in reply["error"]
+                assert reply["id"] == 0
+                assert after == {"success": True, "seq": 3, "id": 1}
+        finally:
+            stop.set()
+            server.stop()
+
+    def test_large_replies_are_compressed_above_requested_size(self, tmp_path):
+        big = {"success": True, "widgets": [{"name": f"w{i}"} for i in range(2000)]}
+        server, stop = self._start(tmp_path, lambda cmd: big)
+        try:
+            with socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM) as sock:
+                sock.settimeout(2)
+                sock.connect(server.socket_path)
+                self._hello(sock, compress_min=1024)
+                payload = b'{"id":1,"cmd":"list_all_widgets"}'
+                sock.sendall(harness._FRAME_HEADER.pack(len(payload), 0) + payload)
+                flags, body = self._read_frame(sock)
+        finally:
+            stop.set()
+            server.stop()
+        assert flags & harness._FRAME_COMPRESSED
+        assert json.loads(harness.zlib.decompress(body)) == {**big, "id": 1}
+
+    def test_client_negotiates_frames_with_current_harness(self, tmp_path):
+        rows = [{"name": f"widget_{i}", "type": "QPushButton"} for i in range(20000)]
+        server, stop = self._start(tmp_path, lambda cmd: {"success": True, "rows": rows})
+        try:
+            connection = qt_main.HarnessConnection(server.socket_path, 2.0)
+            try:
+                assert connection.protocol == 2
+                reply = connection.request({"cmd": "list_all_widgets"}, timeout=5)
+            finally:
+                connection.close()
+        finally:
+            stop.set()
+            server.stop()
+        assert reply == {"success": True, "rows": rows}
+
+    def test_legacy_id_less_request_gets_id_less_reply(self, tmp_path):
+        server, stop = self._start(tmp_path, lambda cmd: {"success": True})
+        try:
+            with socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM) as sock:
+                sock.settimeout(2)
+                sock.connect(server.socket_path)
+                sock.sendall(b'{"cmd": "ping"}\n')
+                replies = self._read_lines(sock, 1)
+        finally:
+            stop.set()
+            server.stop()
+        assert replies == [{"success": True}]
+
+
+class TestZygote:
+    def test_fork_is_safe_with_matching_env_and_no_app(self):
+        with patch.object(harness.threading, "active_count", return_value=1):
+            assert harness._fork_unsafe_reason(dict(os.environ)) is None
+
+    def test_fork_refused_when_interpreter_env_differs(self):
+        env = {**os.environ, "PYTHONHASHSEED": "123"}
+        with patch.object(harness.threading, "active_count", return_value=1):
+            reason = harness._fork_unsafe_reason(env)
+        assert reason is not None and "PYTHONHASHSEED" in reason
+
+    def test_fork_refused_with_extra_threads(self):
+        release = threading.Event()
+        worker = threading.Thread(target=release.wait)
+        worker.start()
+        try:
+            reason = harness._fork_unsafe_reason(dict(os.environ))
+        finally:
+            release.set()
+            worker.join()
+        assert reason is not None and "threads" in reason
+
+    def test_request_carries_json_and_passed_fds(self):
+        left, right = socket_mod.socketpair()
+        read_fd, write_fd = os.pipe()
+        try:
+            request = json.dumps({"argv": ["--socket", "/s"], "env": {}}).encode() + b"\n"
+            socket_mod.send_fds(left, [request], [write_fd, write_fd, write_fd])
+            parsed, fds = harness._read_zygote_request(right)
+            assert parsed["argv"] == ["--socket", "/s"]
+            assert len(fds) == 3
+            os.write(fds[0], b"x")
+            assert os.read(read_fd, 1) == b"x"
+            for fd in fds:
+                os.close(fd)
+        finally:
+            left.close()
+            right.close()
+            os.close(read_fd)
+            os.close(write_fd)
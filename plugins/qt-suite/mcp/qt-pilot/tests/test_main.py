@@ -1,13 +1,20 @@
 """Unit tests for main.py resource management."""
 import dataclasses
 import json
+import logging
 import os
 import socket as socket_mod
+import subprocess
 import sys
 import tempfile
+import threading
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import anyio
+from mcp.shared.memory import create_connected_server_and_client_session
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
 import main as qt_main
 
@@ -18,45 +25,436 @@ def _set_state(socket_path=None, process=None):
     qt_main._app_state.process = process
 
 
-def test_send_command_uses_context_manager():
-    """socket.socket must be used as a context manager (__enter__/__exit__ called)."""
-    _mock_proc = MagicMock()
-    _mock_proc.poll.return_value = None
-    _set_state(
-        socket_path="/tmp/fake.sock",
-        process=_mock_proc,
-    )
-    mock_sock = MagicMock()
-    mock_sock.__enter__ = MagicMock(return_value=mock_sock)
-    mock_sock.__exit__ = MagicMock(return_value=False)
-    mock_sock.recv.return_value = json.dumps({"success": True}).encode() + b"\n"
-
-    with patch("socket.socket", return_value=mock_sock):
-        qt_main._send_command({"action": "ping"})
-
-    mock_sock.__enter__.assert_called_once()
-    mock_sock.__exit__.assert_called_once()
-
-
-def test_send_command_timeout_returns_error():
-    """socket.timeout must map to the correct error dict."""
-    _mock_proc = MagicMock()
-    _mock_proc.poll.return_value = None
-    _set_state(
-        socket_path="/tmp/fake.sock",
-        process=_mock_proc,
-    )
-    mock_sock = MagicMock()
-    mock_sock.__enter__ = MagicMock(return_value=mock_sock)
-    mock_sock.__exit__ = MagicMock(return_value=False)
-    mock_sock.recv.side_effect = socket_mod.timeout
+class _FakeHarness:
+    """Unix socket server speaking the v1 (newline JSON) harness protocol.
 
-    with patch("socket.socket", return_value=mock_sock):
-        result = qt_main._send_command({"action": "ping"})
+    `reply(cmd)` returns the reply dict (or None to stay silent); replies for
+    commands carrying a "delay" are held back so ordering can be tested. The
+    connect-time protocol hello is answered the way a v1 harness does, so
+    clients stay on newline JSON.
+    """
 
+    def __init__(self, tmp_path, reply, name="h.sock"):
+        self.path = str(tmp_path / name)
+        self.accepts = 0
+        self._reply = reply
+        self._srv = socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM)
+        self._srv.bind(self.path)
+        self._srv.listen(5)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._srv.accept()
+            except OSError:
+                return
+            self.accepts += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        lock = threading.Lock()
+        buf = b""
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                cmd = json.loads(line)
+                threading.Thread(target=self._answer, args=(conn, lock, cmd), daemon=True).start()
+
+    def _answer(self, conn, lock, cmd):
+        if cmd["cmd"] == "hello":
+            with lock:
+                conn.sendall(json.dumps({"success": False, "error": "Unknown command: hello",
+                                         "id": cmd["id"]}).encode() + b"\n")
+            return
+        time.sleep(cmd.get("delay", 0))
+        reply = self._reply(cmd)
+        if reply is None:
+            return
+        with lock:
+            conn.sendall(json.dumps({**reply, "id": cmd["id"]}).encode() + b"\n")
+
+    def close(self):
+        self._srv.close()
+
+
+def _alive_process():
+    proc = MagicMock()
+    proc.poll.return_value = None
+    return proc
+
+
+def _call_tools_concurrently(*calls):
+    """Start every (tool, arguments) call at once through the MCP layer.
+
+    Returns (seconds until that call finished, structured result) per call.
+    """
+    finished = [None] * len(calls)
+
+    async def call(client, index, name, arguments):
+        result = await client.call_tool(name, arguments)
+        finished[index] = (time.monotonic() - start, result.structuredContent)
+
+    async def run():
+        async with create_connected_server_and_client_session(qt_main.mcp) as client:
+            async with anyio.create_task_group() as group:
+                for index, (name, arguments) in enumerate(calls):
+                    group.start_soon(call, client, index, name, arguments)
+
+    start = time.monotonic()
+    anyio.run(run)
+    return finished
+
+
+def test_send_command_reuses_one_persistent_connection(tmp_path):
+    """Consecutive commands share one socket instead of reconnecting per call."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True, "cmd": cmd["cmd"]})
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        for _ in range(3):
+            assert qt_main._send_command({"cmd": "ping"}) == {"success": True, "cmd": "ping"}
+        assert harness.accepts == 1
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+
+
+def test_send_command_falls_back_to_one_shot_harness(tmp_path):
+    """A pre-multiplexing harness (one id-less reply per connection) keeps working."""
+    path = str(tmp_path / "old.sock")
+    server = socket_mod.socket(socket_mod.AF_UNIX, socket_mod.SOCK_STREAM)
+    server.bind(path)
+    server.listen(5)
+    accepts = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                data = b""
+                while b"\n" not in data:
+                    data += conn.recv(4096)
+                cmd = json.loads(data)
+                accepts.append(cmd["cmd"])
+                reply = ({"success": False, "error": "Unknown command: hello"}
+                         if cmd["cmd"] == "hello" else {"success": True, "seq": cmd["seq"]})
+                conn.sendall(json.dumps(reply).encode() + b"\n")
+
+    threading.Thread(target=serve, daemon=True).start()
+    _set_state(socket_path=path, process=_alive_process())
+    try:
+        for seq in range(3):
+            assert qt_main._send_command({"cmd": "ping", "seq": seq}) == {"success": True,
+                                                                          "seq": seq}
+        assert qt_main._app_state.connection.one_shot is True
+        assert accepts == ["hello", "ping", "ping", "ping"]
+    finally:
+        qt_main._cleanup_app()
+        server.close()
+
+
+def test_send_command_multiplexes_out_of_order_replies(tmp_path):
+    """A fast query is answered while a slow one on the same socket is pending."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True, "cmd": cmd["cmd"]})
+    _set_state(socket_path=harness.path, process=_alive_process())
+    results = {}
+    try:
+        qt_main._send_command({"cmd": "ping"})  # open the connection
+        slow = threading.Thread(target=lambda: results.setdefault(
+            "slow", qt_main._send_command({"cmd": "wait_idle", "delay": 0.5})))
+        slow.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        results["fast"] = qt_main._send_command({"cmd": "get_widget_info"})
+        fast_elapsed = time.monotonic() - started
+        slow.join(timeout=2)
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert results["fast"] == {"success": True, "cmd": "get_widget_info"}
+    assert results["slow"] == {"success": True, "cmd": "wait_idle"}
+    assert fast_elapsed < 0.4, "fast reply waited behind the slow one"
+    assert harness.accepts == 1
+
+
+def test_connection_stays_on_newline_json_with_v1_harness(tmp_path):
+    """A harness that does not know the hello keeps the v1 protocol working."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True, "cmd": cmd["cmd"]})
+    try:
+        connection = qt_main.HarnessConnection(harness.path, 2.0)
+        try:
+            assert connection.protocol == 1
+            assert connection.request({"cmd": "ping"}, timeout=2)["cmd"] == "ping"
+        finally:
+            connection.close()
+    finally:
+        harness.close()
+
+
+def test_quick_tool_call_overlaps_a_long_wait(tmp_path):
+    """Tools run off the event loop: a query isn't queued behind wait_for_idle."""
+    def reply(cmd):
+        if cmd["cmd"] == "wait_idle":
+            time.sleep(1.0)
+            return {"success": True, "idle": True, "settle_time": 1.0, "elapsed": 1.0}
+        return {"success": True, "name": "ok_btn", "visible": True}
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        (wait_done, waited), (info_done, info) = _call_tools_concurrently(
+            ("wait_for_idle", {"timeout": 5.0}),
+            ("get_widget_info", {"widget_name": "ok_btn"}),
+        )
+        assert waited["success"] and info["success"]
+        assert info_done < 0.5 < wait_done
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+
+
+def test_send_command_timeout_returns_error(tmp_path):
+    """A reply that never arrives maps to the timeout error dict."""
+    harness = _FakeHarness(tmp_path, lambda cmd: None)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        result = qt_main._send_command({"cmd": "ping"}, timeout=0.1)
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
     assert result == {"success": False, "error": "Command timed out"}
 
 
+def test_send_command_reconnects_after_connection_drop(tmp_path):
+    """A dead connection is replaced transparently on the next command."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True})
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        qt_main._send_command({"cmd": "ping"})
+        qt_main._app_state.connection.close()
+        assert qt_main._send_command({"cmd": "ping"}) == {"success": True}
+        assert harness.accepts == 2
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+
+
+def test_run_sequence_sends_all_steps_in_one_command(tmp_path):
+    """The whole step list travels as a single harness request."""
+    seen = []
+
+    def reply(cmd):
+        seen.append(cmd)
+        return {"success": True, "steps": [{"index": i} for i, _ in enumerate(cmd["steps"])],
+                "completed": len(cmd["steps"]), "failed": 0, "elapsed_ms": 1.0}
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        fn = getattr(qt_main.run_sequence, "fn", qt_main.run_sequence)
+        result = fn([{"cmd": "ping"}, {"cmd": "click", "widget_name": "b"}],
+                    stop_on_failure=False)
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert len(seen) == 1
+    assert seen[0]["cmd"] == "run_sequence" and seen[0]["stop_on_failure"] is False
+    assert result["completed"] == 2
+
+
+def test_wait_for_idle_reports_settle_time_and_busy_apps(tmp_path):
+    """quiet_ms reaches the harness; a non-idle reply keeps success but says so."""
+    replies = iter([
+        {"success": True, "idle": True, "settle_time": 0.03, "elapsed": 0.13},
+        {"success": True, "idle": False, "settle_time": None, "elapsed": 1.0},
+    ])
+    seen = []
+    harness = _FakeHarness(tmp_path, lambda cmd: (seen.append(cmd), next(replies))[1])
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        fn = getattr(qt_main.wait_for_idle, "fn", qt_main.wait_for_idle)
+        settled = fn(timeout=1.0, quiet_ms=50)
+        busy = fn(timeout=1.0)
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0]["quiet_ms"] == 50
+    assert settled["idle"] is True and settled["settle_time"] == 0.03
+    assert busy["idle"] is False and "busy" in busy["message"]
+
+
+def test_condition_waits_forward_predicates_and_last_value(tmp_path):
+    """Only the given predicate is sent; a timeout keeps the observed value."""
+    seen = []
+
+    def reply(cmd):
+        seen.append(cmd)
+        if cmd["cmd"] == "wait_for_widget":
+            return {"success": True, "observed": {"exists": True}, "elapsed": 0.2}
+        return {"success": False, "error": "Timed out", "value": "Loading", "elapsed": 1.0}
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        widget_fn = getattr(qt_main.wait_for_widget, "fn", qt_main.wait_for_widget)
+        prop_fn = getattr(qt_main.wait_for_property, "fn", qt_main.wait_for_property)
+        appeared = widget_fn("dlg", state="exists", timeout=1.0)
+        timed_out = prop_fn("status", "text", matches="^Done", timeout=1.0)
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert appeared["success"] is True and appeared["elapsed"] == 0.2
+    assert seen[1]["matches"] == "^Done" and "equals" not in seen[1]
+    assert timed_out["success"] is False and timed_out["value"] == "Loading"
+
+
+
+
+
+def test_capture_screenshot_inline_and_shm_outputs(tmp_path):
+    """base64 sends no path and returns the data; shm picks a /dev/shm file."""
+    seen = []
+
+    def reply(cmd):
+        seen.append(cmd)
+        shot = {"success": True, "method": "grabWindow", "format": cmd.get("format", "png"),
+                "width": 400, "height": 300}
+        return {**shot, "data": "AAAA", "bytes": 3} if cmd.get("inline") else shot
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        fn = getattr(qt_main.capture_screenshot, "fn", qt_main.capture_screenshot)
+        inline = fn(widget_name="chart", max_size=400, format="jpeg", output="base64")
+        with patch("main._SHM_DIR", str(tmp_path)):
+            shm = fn(region={"x": 0, "y": 0, "width": 400, "height": 300}, output="shm")
+        bad = fn(output="clipboard")
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0]["inline"] is True and "path" not in seen[0]
+    assert seen[0]["widget_name"] == "chart" and seen[0]["max_size"] == 400
+    assert inline["data"] == "AAAA" and "path" not in inline
+    assert shm["path"].startswith(str(tmp_path)) and shm["path"].endswith(".png")
+    assert bad["success"] is False and len(seen) == 2
+
+def test_unchanged_screenshot_removes_generated_file_and_diff_forwards(tmp_path):
+    """An unchanged capture leaves no temp file behind; visual_diff sends its options."""
+    seen = []
+
+    def reply(cmd):
+        seen.append(cmd)
+        if cmd["cmd"] == "visual_diff":
+            return {"success": True, "changed": True, "diff_ratio": 0.1, "rects": []}
+        return {"success": True, "unchanged": True, "width": 400, "height": 300}
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        shot_fn = getattr(qt_main.capture_screenshot, "fn", qt_main.capture_screenshot)
+        diff_fn = getattr(qt_main.visual_diff, "fn", qt_main.visual_diff)
+        shot = shot_fn(if_changed=True)
+        diff = diff_fn(selector="#chart", baseline="start")
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0]["if_changed"] is True and not os.path.exists(seen[0]["path"])
+    assert shot["unchanged"] is True and "path" not in shot
+    assert seen[1] == {"cmd": "visual_diff", "selector": "#chart", "baseline": "start",
+                       "id": seen[1]["id"]}
+    assert diff["changed"] is True and diff["diff_ratio"] == 0.1
+
+def test_harness_metrics_stream_path_is_made_absolute(tmp_path):
+    """The harness runs in the app's working dir, so relative paths are resolved here."""
+    seen = []
+    harness = _FakeHarness(tmp_path, lambda cmd: (seen.append(cmd),
+                                                  {"success": True, "commands": {}})[1])
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        fn = getattr(qt_main.get_harness_metrics, "fn", qt_main.get_harness_metrics)
+        started = fn(jsonl_path="metrics.jsonl", reset=True)
+        fn(jsonl_path="")
+        fn()
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0]["stream_to"] == os.path.abspath("metrics.jsonl") and seen[0]["reset"] is True
+    assert seen[1]["stream_to"] == "" and "stream_to" not in seen[2]
+    assert started["success"] is True and started["commands"] == {}
+
+def test_memory_report_forwards_only_given_options(tmp_path):
+    """A leak check is a baseline call, the actions, then a bounded comparison."""
+    seen = []
+
+    def reply(cmd):
+        seen.append(cmd)
+        return {"success": True, "bounded": False, "exceeded": {"qobjects": 20}}
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        fn = getattr(qt_main.get_memory_report, "fn", qt_main.get_memory_report)
+        fn()
+        report = fn(baseline="start", max_growth={"qobjects": 0}, top=3)
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0] == {"cmd": "memory", "top": 10, "id": seen[0]["id"]}
+    assert seen[1]["baseline"] == "start" and seen[1]["max_growth"] == {"qobjects": 0}
+    assert seen[1]["top"] == 3 and "update_baseline" not in seen[1]
+    assert report["bounded"] is False and report["exceeded"] == {"qobjects": 20}
+
+def test_widget_tools_forward_selectors(tmp_path):
+    """A selector replaces widget_name in the command; the reply names it."""
+    seen = []
+    harness = _FakeHarness(tmp_path, lambda cmd: (seen.append(cmd),
+                                                  {"success": True, "value": "Saved"})[1])
+    _set_state(socket_path=harness.path, process=_alive_process())
+    selector = 'QDialog#save > QPushButton[text="OK"]'
+    try:
+        click_fn = getattr(qt_main.click_widget, "fn", qt_main.click_widget)
+        prop_fn = getattr(qt_main.wait_for_property, "fn", qt_main.wait_for_property)
+        clicked = click_fn(selector=selector)
+        waited = prop_fn(property_name="text", equals="Saved", selector="#status")
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0]["selector"] == selector and "widget_name" not in seen[0]
+    assert selector in clicked["message"]
+    assert seen[1]["selector"] == "#status" and seen[1]["property"] == "text"
+    assert waited["message"] == "#status.text is 'Saved'"
+
+def test_widget_listings_forward_only_given_filters(tmp_path):
+    """Filters and paging reach the harness; unset ones aren't sent."""
+    seen = []
+
+    def reply(cmd):
+        seen.append(cmd)
+        return {"success": True, "widgets": [{"name": "ok"}], "count": 1, "next_cursor": "1:4"}
+
+    harness = _FakeHarness(tmp_path, reply)
+    _set_state(socket_path=harness.path, process=_alive_process())
+    try:
+        find_fn = getattr(qt_main.find_widgets, "fn", qt_main.find_widgets)
+        list_fn = getattr(qt_main.list_all_widgets, "fn", qt_main.list_all_widgets)
+        found = find_fn("o*", types=["QPushButton"], limit=1)
+        listed = list_fn(region={"x": 0, "y": 0, "width": 10, "height": 10}, fields=["name"])
+    finally:
+        qt_main._cleanup_app()
+        harness.close()
+    assert seen[0] == {"cmd": "find_widgets", "pattern": "o*", "types": ["QPushButton"],
+                       "limit": 1, "id": seen[0]["id"]}
+    assert found["next_cursor"] == "1:4" and found["count"] == 1
+    assert seen[1]["fields"] == ["name"] and "max_depth" not in seen[1]
+    assert listed["widgets"] == [{"name": "ok"}]
+
 def _make_exists_side_effect(script_path: str):
     """Return True for the script existence check, False for the socket path.
 
@@ -133,9 +531,10 @@ def test_app_state_is_dataclass():
 
 
 def test_app_state_has_expected_fields():
-    """AppState must have exactly the five expected fields."""
+    """AppState must have exactly the expected fields."""
     field_names = {f.name for f in dataclasses.fields(qt_main._app_state)}
-    expected = {"process", "socket_path", "socket_dir", "display", "xvfb_process"}
+    expected = {"process", "socket_path", "socket_dir", "display", "xvfb_process", "connection",
+                "logs"}
     assert expected == field_names, f"AppState fields mismatch: {field_names}"
 
 
@@ -149,6 +548,20 @@ def test_constants_defined():
     )
 
 
+def test_env_int_falls_back_on_bad_values(monkeypatch, caplog):
+    """A malformed integer env var is logged and replaced by the default."""
+    monkeypatch.setenv("QT_PILOT_TEST_INT", "12")
+    assert qt_main._env_int("QT_PILOT_TEST_INT", 4) == 12
+    monkeypatch.setenv("QT_PILOT_TEST_INT", "")
+    assert qt_main._env_int("QT_PILOT_TEST_INT", 4) == 4
+    monkeypatch.delenv("QT_PILOT_TEST_INT")
+    assert qt_main._env_int("QT_PILOT_TEST_INT", None) is None
+    monkeypatch.setenv("QT_PILOT_TEST_INT", "four")
+    with caplog.at_level(logging.WARNING, logger="qt-pilot"):
+        assert qt_main._env_int("QT_PILOT_TEST_INT", 4) == 4
+    assert "QT_PILOT_TEST_INT" in caplog.text
+
+
 def test_launch_app_uses_display_start_constant():
     """launch_app must read display start from the constant, not a literal."""
     display_nums_seen = []
@@ -180,3 +593,369 @@ def test_launch_app_uses_display_start_constant():
     assert 150 in display_nums_seen, (
         f"launch_app did not check display 150 — constant not used (saw: {display_nums_seen})"
     )
+
+
+def test_sessions_are_independent(tmp_path):
+    """Tools address sessions by name; closing one leaves the other running."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    first = _FakeHarness(tmp_path / "a", lambda cmd: {"success": True, "info": {"name": "a"}})
+    second = _FakeHarness(tmp_path / "b", lambda cmd: {"success": True, "info": {"name": "b"}})
+    _set_state(socket_path=first.path, process=_alive_process())
+    qt_main._sessions["server"] = qt_main.AppState(socket_path=second.path,
+                                                   process=_alive_process())
+    try:
+        assert qt_main.get_widget_info("w")["info"]["name"] == "a"
+        assert qt_main.get_widget_info("w", session="server")["info"]["name"] == "b"
+        listed = qt_main.list_sessions()
+        assert {s["session"] for s in listed["sessions"]} == {"default", "server"}
+
+        assert qt_main.close_app(session="server")["success"] is True
+        assert "server" not in qt_main._sessions
+        assert qt_main.get_widget_info("w")["success"] is True
+        missing = qt_main.get_widget_info("w", session="server")
+        assert missing == {"success": False,
+                           "message": "No app is running in session 'server'"}
+    finally:
+        qt_main._sessions.pop("server", None)
+        qt_main._cleanup_app()
+        first.close()
+        second.close()
+
+
+def test_quick_query_in_one_session_overlaps_a_wait_in_another(tmp_path):
+    """A long wait_for_idle in one session doesn't hold up another session."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    def slow(cmd):
+        time.sleep(1.0)
+        return {"success": True, "idle": True, "settle_time": 1.0, "elapsed": 1.0}
+
+    first = _FakeHarness(tmp_path / "a", slow)
+    second = _FakeHarness(tmp_path / "b", lambda cmd: {"success": True, "info": {"name": "b"}})
+    _set_state(socket_path=first.path, process=_alive_process())
+    qt_main._sessions["server"] = qt_main.AppState(socket_path=second.path,
+                                                   process=_alive_process())
+    try:
+        (wait_done, waited), (info_done, info) = _call_tools_concurrently(
+            ("wait_for_idle", {"timeout": 5.0}),
+            ("get_widget_info", {"widget_name": "w", "session": "server"}),
+        )
+        assert waited["success"] and info["info"]["name"] == "b"
+        assert info_done < 0.5 < wait_done
+    finally:
+        qt_main._cleanup_app(qt_main._sessions.pop("server"))
+        qt_main._cleanup_app()
+        first.close()
+        second.close()
+
+
+def test_launch_app_enforces_session_cap():
+    """A new session beyond the cap is refused without touching running ones."""
+    _set_state(process=_alive_process())
+    try:
+        with patch.object(qt_main, "_MAX_SESSIONS", 1), \
+             patch("os.path.exists", return_value=True), \
+             patch("subprocess.Popen") as mock_popen:
+            result = qt_main.launch_app(script_path="/fake/app.py", session="second")
+        assert result["success"] is False
+        assert "Session limit" in result["message"]
+        mock_popen.assert_not_called()
+        assert "second" not in qt_main._sessions
+    finally:
+        _set_state()
+
+
+def test_launch_app_skips_displays_held_by_other_sessions():
+    """A display reserved by another session is not reused before its lock file exists."""
+    other = qt_main.AppState(display=f":{qt_main._XVFB_DISPLAY_START}",
+                             xvfb_process=MagicMock(), process=_alive_process())
+    qt_main._sessions["other"] = other
+
+    def mock_exists(path):
+        return path == "/fake/app.py"
+
+    try:
+        with patch.object(tempfile, "mkdtemp", return_value="/tmp/fake_dir_abc"), \
+             patch("os.path.exists", side_effect=mock_exists), \
+             patch("subprocess.Popen", return_value=_alive_process()), \
+             patch("time.sleep"), \
+             patch.object(qt_main, "_cleanup_app"):
+            result = qt_main.launch_app(script_path="/fake/app.py", timeout=0, session="new")
+        assert result["success"] is False  # no harness socket ever appears
+        assert qt_main._sessions["new"].display == f":{qt_main._XVFB_DISPLAY_START + 1}"
+    finally:
+        qt_main._sessions.pop("other", None)
+        qt_main._sessions.pop("new", None)
+
+
+def test_launch_app_cleans_up_previous_app_outside_sessions_lock():
+    """Relaunching a session stops its old app without blocking other sessions."""
+    old_process = _alive_process()
+    qt_main._sessions["relaunch"] = qt_main.AppState(process=old_process, display=":150")
+    cleaned = []
+
+    def fake_cleanup(state=None):
+        cleaned.append((state.process, qt_main._sessions_lock.locked()))
+
+    try:
+        with patch.object(tempfile, "mkdtemp", return_value="/tmp/fake_dir_abc"), \
+             patch("os.path.exists", side_effect=lambda path: path == "/fake/app.py"), \
+             patch("subprocess.Popen", return_value=_alive_process()), \
+             patch("time.sleep"), \
+             patch.object(qt_main, "_cleanup_app", side_effect=fake_cleanup):
+            qt_main.launch_app(script_path="/fake/app.py", timeout=0, session="relaunch",
+                               backend="offscreen")
+        assert cleaned[0] == (old_process, False)
+        assert qt_main._sessions["relaunch"].process is not old_process
+    finally:
+        qt_main._sessions.pop("relaunch", None)
+
+
+def test_read_ready_returns_line_or_empty_on_eof():
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"99\n")
+    assert qt_main._read_ready(read_fd, 1.0) == b"99"
+    os.close(write_fd)
+    assert qt_main._read_ready(read_fd, 1.0) == b""  # writer gone, no line
+    os.close(read_fd)
+
+
+def test_launch_app_waits_on_harness_ready_pipe(tmp_path):
+    """launch_app returns once the harness writes to --ready-fd, with timings."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True}, name="qt.sock")
+    launched = []
+
+    def fake_popen(cmd, **kwargs):
+        launched.append(cmd)
+        ready_fd = int(cmd[cmd.index("--ready-fd") + 1])
+        assert kwargs["pass_fds"] == (ready_fd,)
+        os.write(ready_fd, b"ready\n")
+        return _alive_process()
+
+    try:
+        with patch.object(tempfile, "mkdtemp", return_value=str(tmp_path)), \
+             patch.object(qt_main, "_start_xvfb", return_value=_alive_process()), \
+             patch("subprocess.Popen", side_effect=fake_popen):
+            result = qt_main.launch_app(script_path=__file__, timeout=5)
+        assert result["success"] is True
+        assert result["xvfb_pooled"] is False
+        assert set(result["timings"]) == {"xvfb_ms", "harness_ms", "connect_ms"}
+        assert result["launch_ms"] >= result["timings"]["harness_ms"]
+        assert len(launched) == 1
+    finally:
+        qt_main._app_state.socket_dir = None  # tmp_path is pytest's to remove
+        qt_main._cleanup_app()
+        harness.close()
+
+
+def test_xvfb_pool_recycles_displays_through_cleanup():
+    """_cleanup_app hands a healthy display back; launch takes it instead of starting one."""
+    pool = qt_main.XvfbPool(1)
+    xvfb = _alive_process()
+    with patch.object(qt_main, "_xvfb_pool", pool):
+        qt_main._app_state.display = ":120"
+        qt_main._app_state.xvfb_process = xvfb
+        _set_state(process=MagicMock())
+        qt_main._cleanup_app()
+        xvfb.terminate.assert_not_called()
+        assert pool.displays() == {":120"}
+        assert pool.release(":121", _alive_process()) is False  # pool is full
+
+        def mock_exists(path):
+            return path == "/fake/app.py"
+
+        with patch.object(tempfile, "mkdtemp", return_value="/tmp/fake_dir_abc"), \
+             patch("os.path.exists", side_effect=mock_exists), \
+             patch.object(qt_main, "_start_xvfb") as start_xvfb, \
+             patch.object(pool, "fill_async"), \
+             patch("subprocess.Popen", return_value=_alive_process()), \
+             patch.object(qt_main, "_cleanup_app"):
+            qt_main.launch_app(script_path="/fake/app.py", timeout=0)
+        start_xvfb.assert_not_called()
+        assert qt_main._app_state.display == ":120"
+        assert qt_main._app_state.xvfb_process is xvfb
+        assert pool.displays() == set()
+    qt_main._app_state.xvfb_process = None
+    qt_main._app_state.display = None
+    _set_state()
+
+
+def test_launch_app_cold_spawns_when_zygote_declines(tmp_path):
+    """If the zygote cannot fork, launch_app falls back to a fresh interpreter."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True}, name="qt.sock")
+    spawned = []
+
+    def fake_popen(cmd, **kwargs):
+        spawned.append(cmd)
+        os.write(kwargs["pass_fds"][0], b"ready\n")
+        return _alive_process()
+
+    try:
+        with patch.object(tempfile, "mkdtemp", return_value=str(tmp_path)), \
+             patch.object(qt_main, "_start_xvfb", return_value=_alive_process()), \
+             patch.object(qt_main, "_ZYGOTE_ENABLED", True), \
+             patch.object(qt_main._zygote, "fork", return_value=None) as fork, \
+             patch("subprocess.Popen", side_effect=fake_popen):
+            result = qt_main.launch_app(script_path=__file__, timeout=5)
+        assert result["success"] is True and result["forked"] is False
+        fork.assert_called_once()
+        assert spawned[0][:2] == [sys.executable, str(qt_main.HARNESS_PATH)]
+    finally:
+        qt_main._app_state.socket_dir = None
+        qt_main._cleanup_app()
+        harness.close()
+
+
+def test_zygote_process_reports_exit_status():
+    """A forked harness's exit code arrives over the zygote connection."""
+    ours, zygote_side = socket_mod.socketpair()
+    out_read, out_write = os.pipe()
+    err_read, err_write = os.pipe()
+    process = qt_main.ZygoteProcess(ours, out_read, err_read)
+    process.pid = 4242
+    try:
+        assert process.poll() is None
+        os.close(out_write)
+        os.close(err_write)
+        zygote_side.sendall(b'{"exit": 3}\n')
+        assert process.wait(timeout=1) == 3
+        with patch("os.kill") as kill:
+            process.terminate()
+        kill.assert_not_called()  # already exited: never signal a reused pid
+    finally:
+        zygote_side.close()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def test_zygote_process_kills_orphan_when_zygote_dies():
+    ours, zygote_side = socket_mod.socketpair()
+    out_read, out_write = os.pipe()
+    err_read, err_write = os.pipe()
+    process = qt_main.ZygoteProcess(ours, out_read, err_read)
+    process.pid = 4242
+    zygote_side.close()
+    with patch("os.kill") as kill:
+        assert process.poll() == -qt_main.signal.SIGKILL
+    kill.assert_called_once_with(4242, qt_main.signal.SIGKILL)
+    for fd in (out_write, err_write):
+        os.close(fd)
+    process.stdout.close()
+    process.stderr.close()
+
+
+def test_app_logs_drain_a_chatty_process_without_blocking(tmp_path):
+    """Output far beyond the pipe buffer is drained while the app runs."""
+    code = ("import sys\n"
+            "for i in range(4000): print('line', i, 'x' * 60)\n"
+            "print('done', file=sys.stderr)\n")
+    process = subprocess.Popen([sys.executable, "-c", code],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    logs = qt_main.AppLogs(process, limit=4096, spill_dir=str(tmp_path), session="s")
+    assert process.wait(timeout=10) == 0  # would hang on a full 64 KiB pipe
+    logs.join(timeout=5)
+
+    tail = logs.read(0, ("stdout",))
+    assert tail["dropped_bytes"] > 250_000
+    assert tail["text"].rstrip().endswith("line 3999 " + "x" * 60)
+    assert len(tail["text"]) <= 4096
+    assert logs.read(tail["next_offset"])["text"] == ""
+    # the ring is shared by both streams; the spill files keep everything
+    assert (tmp_path / "s.stdout.log").read_text().count("\n") == 4000
+    assert (tmp_path / "s.stderr.log").read_text() == "done\n"
+
+
+def test_app_logs_read_is_incremental_across_streams():
+    logs = qt_main.AppLogs(MagicMock(stdout=None, stderr=None), limit=1024)
+    logs._append("stdout", b"hello ")
+    logs._append("stderr", b"oops\n")
+    logs._append("stdout", b"world\n")
+    first = logs.read(0, ("stdout",), max_bytes=3)
+    assert first["text"] == "hel" and first["next_offset"] == 3
+    rest = logs.read(first["next_offset"], ("stdout",))
+    assert rest["text"] == "lo world\n" and rest["next_offset"] == 17
+    assert logs.read(0)["text"] == "hello oops\nworld\n"
+    assert logs.read(6, ("stderr",)) == {"text": "oops\n", "next_offset": 17,
+                                         "dropped_bytes": 0}
+
+
+def test_get_app_logs_tool():
+    logs = qt_main.AppLogs(MagicMock(stdout=None, stderr=None), limit=1024)
+    logs._append("stderr", b"warning: x\n")
+    _set_state(socket_path="/tmp/none.sock", process=_alive_process())
+    qt_main._app_state.logs = logs
+    try:
+        result = qt_main.get_app_logs(stream="stderr")
+        assert result["success"] is True and result["text"] == "warning: x\n"
+        assert result["running"] is True
+        assert qt_main.get_app_logs(since=result["next_offset"])["text"] == ""
+        assert qt_main.get_app_logs(stream="bogus")["success"] is False
+    finally:
+        qt_main._app_state.logs = None
+        _set_state()
+
+
+def test_launch_app_offscreen_backend_skips_xvfb(tmp_path):
+    """Non-xvfb backends run the harness on a Qt platform plugin, with no X server."""
+    harness = _FakeHarness(tmp_path, lambda cmd: {"success": True}, name="qt.sock")
+    envs = []
+
+    def fake_popen(cmd, **kwargs):
+        envs.append(kwargs["env"])
+        os.write(kwargs["pass_fds"][0], b"ready\n")
+        return _alive_process()
+
+    try:
+        with patch.object(tempfile, "mkdtemp", return_value=str(tmp_path)), \
+             patch.object(qt_main, "_start_xvfb") as start_xvfb, \
+             patch.dict(os.environ, {"DISPLAY": ":0"}), \
+             patch("subprocess.Popen", side_effect=fake_popen):
+            result = qt_main.launch_app(script_path=__file__, timeout=5, backend="offscreen")
+        assert result["success"] is True
+        assert result["backend"] == "offscreen" and result["display"] == ""
+        start_xvfb.assert_not_called()
+        assert envs[0]["QT_QPA_PLATFORM"] == "offscreen"
+        assert "DISPLAY" not in envs[0]
+    finally:
+        qt_main._app_state.socket_dir = None
+        qt_main._cleanup_app()
+        harness.close()
+
+
+def test_launch_app_profile_flag_and_responsiveness_report(tmp_path):
+    """profile=True starts the harness profiler; the report tool forwards its options."""
+    seen = []
+    harness = _FakeHarness(tmp_path, lambda cmd: (seen.append(cmd),
+                                                  {"success": True, "stall_count": 0})[1],
+                           name="qt.sock")
+    commands = []
+
+    def fake_popen(cmd, **kwargs):
+        commands.append(cmd)
+        os.write(kwargs["pass_fds"][0], b"ready\n")
+        return _alive_process()
+
+    try:
+        with patch.object(tempfile, "mkdtemp", return_value=str(tmp_path)), \
+             patch("subprocess.Popen", side_effect=fake_popen):
+            launched = qt_main.launch_app(script_path=__file__, timeout=5,
+                                          backend="offscreen", profile=True)
+        fn = getattr(qt_main.get_responsiveness_report, "fn", qt_main.get_responsiveness_report)
+        report = fn(stall_ms=50, reset=True)
+    finally:
+        qt_main._app_state.socket_dir = None
+        qt_main._cleanup_app()
+        harness.close()
+    assert launched["success"] is True and "--profile" in commands[0]
+    assert seen[-1]["cmd"] == "responsiveness" and seen[-1]["stall_ms"] == 50
+    assert seen[-1]["reset"] is True and report["stall_count"] == 0
+
+
+def test_launch_app_rejects_unknown_backend():
+    with patch("os.path.exists", return_value=True), \
+         patch("subprocess.Popen") as mock_popen:
+        result = qt_main.launch_app(script_path="/fake/app.py", backend="wayland")
+    assert result["success"] is False and "Unknown backend" in result["message"]
+    mock_popen.assert_not_called()